@@ -0,0 +1,115 @@
+import logging
+import time
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+
+KEY_PREFIX = 'custom_backup'
+# a stale copy outlives the fresh value, so that followers have something to return while the leader reloads it
+STALE_TTL_FACTOR = 10
+LOCK_SUFFIX = 'lock'
+STALE_SUFFIX = 'stale'
+VERSION_SUFFIX = 'version'
+POLL_INTERVAL = 0.05
+
+
+def make_key(*parts):
+    return ':'.join([KEY_PREFIX] + [str(p) for p in parts])
+
+
+def coalesced_get(key, loader, ttl, lock_timeout=10, wait=2):
+    """
+    Read-through cache with request coalescing, shared among all the Horizon workers through the configured CACHES.
+
+    On a miss only one caller (the leader, who wins cache.add() on the lock key) executes loader(), the others
+    (followers) return the stale copy if there is one, otherwise they poll the cache for at most `wait` seconds.
+    In the worst case, i.e. the leader is too slow or died, a follower falls back to run loader() itself.
+
+    :param loader: callable without arguments, its result must be picklable and not None
+    :param ttl: seconds the loaded value is considered fresh
+    :param lock_timeout: seconds after which the lock of a crashed leader expires
+    :param wait: seconds a follower without stale copy waits for the leader
+    :return: the cached or loaded value
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key, stale_key = '{}:{}'.format(key, LOCK_SUFFIX), '{}:{}'.format(key, STALE_SUFFIX)
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = loader()
+            cache.set(key, value, ttl)
+            cache.set(stale_key, value, ttl * STALE_TTL_FACTOR)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    value = cache.get(stale_key)
+    if value is not None:
+        return value
+
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    logger.warning("Cache key {} not filled by the leader within {}s, loading it".format(key, wait))
+    return loader()
+
+
+def _version_key(scope):
+    return make_key(*(tuple(scope) + (VERSION_SUFFIX, )))
+
+
+def _initial_version():
+    # time based, so that a version lost by the cache (eviction, restart) does not resurrect the entries written
+    # under an older value of it
+    return int(time.time() * 1000000)
+
+
+def get_versions(*scopes):
+    """
+    Current version of each scope, e.g. ('notifications', project_id). A scope never seen before gets one.
+    Version keys never expire: the entries they invalidate are the ones with a TTL
+    :param scopes: tuples of key parts
+    :return: list of versions, in the order of scopes
+    """
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_version(), None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return versions
+
+
+def bump_version(*scope):
+    """
+    Invalidate all the entries read through versioned_get() which depend on the scope
+    """
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # the version is not in the cache: any new value invalidates the entries written under the lost one
+        cache.add(key, _initial_version(), None)
+
+
+def versioned_get(key_parts, scopes, loader, ttl):
+    """
+    coalesced_get() of a value which is invalidated as soon as the version of one of its scopes is bumped, see
+    bump_version(): the versions are part of the key, so a stale entry is never read again and expires on its own.
+    Unlike coalesced_get() the loader can return None.
+
+    :param key_parts: parts of the key, see make_key()
+    :param scopes: list of scopes the value depends on, see get_versions()
+    :param ttl: seconds after which an entry is dropped even if still valid
+    """
+    key = make_key(*(tuple(key_parts) + tuple(get_versions(*scopes))))
+    return coalesced_get(key, lambda: (loader(), ), ttl)[0]
@@ -7,6 +7,15 @@ class ConstantsWrapper(object):
 
     DEFAULT_WORKFLOW_ID = 'custom_instance_backup.custom_instance_backup'
 
+    # per_job: one cron-trigger per BackupJob, running DEFAULT_WORKFLOW_ID. consolidated: the BackupJobs of a project
+    # sharing a schedule_pattern share one cron-trigger, named after the pattern, which runs the fan-out workflow
+    # with input {'backup_jobs': [workflow_input, ..]}, see db_api.enqueue_trigger_sync
+    TRIGGER_MODE_PER_JOB = 'per_job'
+    TRIGGER_MODE_CONSOLIDATED = 'consolidated'
+    DEFAULT_TRIGGER_MODE = TRIGGER_MODE_PER_JOB
+    SHARED_NAME_PREFIX = "Shared Cron Trigger for Backups {}"
+    DEFAULT_FANOUT_WORKFLOW_ID = 'custom_instance_backup.custom_instance_backup_batch'
+
     STRING_XXS = 10
     STRING_XS = 25
     STRING_S = 50
@@ -18,6 +27,8 @@ class ConstantsWrapper(object):
 
     UUID_MAX_LEN = 36
     PROJECT_ID_LEN = 32
+    # hex digest, see utils.workflow_input_fingerprint
+    SHA256_LEN = 64
 
     # the following constant values are used to populate options lists inside CreateBackupScheduleStep
     MINUTES_PER_HOUR = 60
@@ -88,5 +99,68 @@ class ConstantsWrapper(object):
 
     BACKUP_CLONE_DEFAULT_NAME_PATTERN = "Clone of {}"
 
+    # state of the Mistral cron-trigger of a BackupJob, displayed inside JobsTable
+    TRIGGER_STATE_ACTIVE = 'active'
+    TRIGGER_STATE_MISSING = 'missing'
+    TRIGGER_STATE_UNKNOWN = 'unknown'
+    # a change of the cron-trigger is waiting inside the outbox, see outbox.py
+    TRIGGER_STATE_PENDING = 'pending'
+    TRIGGER_STATE_CHOICES = (
+        (TRIGGER_STATE_ACTIVE, _("Active")),
+        (TRIGGER_STATE_MISSING, _("Missing")),
+        (TRIGGER_STATE_PENDING, _("Pending")),
+        (TRIGGER_STATE_UNKNOWN, _("Unknown")),
+    )
+    # seconds the cron-trigger list fetched from Mistral is reused, see db_api.cron_triggers_of_project
+    DEFAULT_TRIGGER_CACHE_TTL = 30
+    # seconds a page of the instance picker is reused, see db_api.search_instances
+    DEFAULT_INSTANCE_CACHE_TTL = 60
+    # Nova calls executed in parallel to check the instances picked in the wizards, see db_api.instance_names
+    DEFAULT_NOVA_CONCURRENCY = 8
+    # seconds a cached notification or BackupJob lookup is kept: the entries are invalidated on change, the TTL only
+    # bounds the memory they use, see db_api.notification_choices
+    DEFAULT_LOOKUP_CACHE_TTL = 3600
+    # BackupJobs of the same source whose schedules fire within WINDOW minutes of each other, in the next
+    # HORIZON_DAYS days, are reported as overlapping, see db_api.find_schedule_conflicts
+    DEFAULT_OVERLAP_WINDOW = 15
+    DEFAULT_OVERLAP_HORIZON_DAYS = 366
+    # compiled cron patterns kept by every Horizon process, see cron.schedule
+    DEFAULT_CRON_CACHE_SIZE = 1024
+    # upcoming fire times listed by the BackupJob detail page
+    NEXT_FIRE_TIMES_SHOWN = 5
+    # schedule staggering of the create wizard, see schedule_load.suggest_schedule: seconds the occupancy of the
+    # next week is reused before being rebuilt, minutes a schedule can be moved, whether the suggestion is applied
+    # without asking
+    DEFAULT_OCCUPANCY_TTL = 3600
+    DEFAULT_STAGGER_RANGE = 30
+    DEFAULT_STAGGER_AUTO_APPLY = False
+    # minutes ahead listed by the upcoming BackupJobs page, and rows advanced per query by db_api.advance_next_runs
+    DEFAULT_UPCOMING_WINDOW = 60
+    NEXT_RUN_BATCH_SIZE = 500
+    # instances a BackupJob can back up, and instances its execution backs up at the same time
+    DEFAULT_MAX_INSTANCES_PER_JOB = 200
+    DEFAULT_INSTANCE_CONCURRENCY = 10
+    # maximum number of Mistral calls executed in parallel by bulk operations
+    DEFAULT_MISTRAL_CONCURRENCY = 8
+    # endpoint of the Mistral service when OPENSTACK_ENDPOINT_TYPE is not set, see mistral_api.service_client
+    DEFAULT_ENDPOINT_TYPE = 'internalURL'
+    # Mistral clients kept alive by every process, one per project, see mistral_api.service_client
+    DEFAULT_MISTRAL_CLIENT_CACHE_SIZE = 64
+    # protection of the Horizon workers from a slow or unavailable Mistral, see mistral_api.GuardedSession:
+    # seconds a call may wait for Mistral, consecutive failures opening the circuit breaker, seconds before a
+    # trial call, calls in flight per process and seconds a call waits for a free slot
+    DEFAULT_MISTRAL_TIMEOUT = 10
+    DEFAULT_MISTRAL_BREAKER_THRESHOLD = 5
+    DEFAULT_MISTRAL_BREAKER_RESET = 30
+    DEFAULT_MISTRAL_BULKHEAD_SIZE = 10
+    DEFAULT_MISTRAL_BULKHEAD_WAIT = 0.5
+    # trigger outbox worker: an operation is retried after BASE, 2*BASE, 4*BASE, .. seconds (at most MAX) and it is
+    # marked as failed after MAX_ATTEMPTS attempts
+    DEFAULT_OUTBOX_BACKOFF_BASE = 5
+    DEFAULT_OUTBOX_BACKOFF_MAX = 3600
+    DEFAULT_OUTBOX_MAX_ATTEMPTS = 10
+    DEFAULT_OUTBOX_BATCH_SIZE = 500
+    DEFAULT_OUTBOX_LOCK_TIMEOUT = 300
+
 
 constants = ConstantsWrapper()
\ No newline at end of file
@@ -0,0 +1,286 @@
+"""
+Compiled evaluation of the five-field cron patterns of the BackupJobs (minute hour day month weekday).
+
+A pattern is parsed once into one bitmask per field, bit i set when the value i matches, so that matching a
+date is a handful of bit tests and the fire times of a whole day are a single integer, see day_minutes().
+Every field supports `*`, values, ranges `a-b`, lists `a,b` and steps `*/n`, `a-b/n`, `a/n`; weekdays go from 0
+(Sunday) to 7 (Sunday again), as in the Mistral cron-triggers.
+
+The compiled patterns are kept in a per-process LRU cache, see schedule(), and the next fire times are found
+jumping from set bit to set bit of each field, see next_fire(), instead of testing one minute after the other.
+"""
+import calendar
+import threading
+from collections import namedtuple, OrderedDict
+from datetime import datetime, timedelta
+from django.conf import settings
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+
+
+MINUTES_PER_DAY = 24 * 60
+FIELD_NAMES = ('minute', 'hour', 'day', 'month', 'weekday')
+# next_fire() gives up after this many years without a fire time, e.g. '0 0 30 2 *'; a leap day needs four
+SEARCH_YEARS = 5
+
+# LRU cache {pattern: CronSchedule}, see schedule()
+_schedules = OrderedDict()
+_schedules_lock = threading.Lock()
+
+# name, lowest and highest value of each field, in pattern order
+FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 7),
+)
+
+# day and weekday restricted tell whether the field is not `*`: cron matches a date when both the day and the
+# weekday match, unless both are restricted, in which case either of them is enough
+CronSchedule = namedtuple('CronSchedule', ['minutes', 'hours', 'days', 'months', 'weekdays',
+                                           'day_restricted', 'weekday_restricted'])
+
+
+class CronError(ValueError):
+    """The pattern is not a valid five-field cron pattern"""
+
+
+def _value(text, name, low, high):
+    try:
+        value = int(text)
+    except ValueError:
+        raise CronError("Invalid {} value: {}".format(name, text))
+    if not low <= value <= high:
+        raise CronError("{} value {} out of range {}-{}".format(name.capitalize(), value, low, high))
+    return value
+
+
+def parse_field(expr, name, low, high):
+    """
+    :return: bitmask of the values matched by the field expression
+    :raise CronError: invalid expression
+    """
+    mask = 0
+    for item in expr.split(','):
+        body, _slash, step = item.partition('/')
+        step = _value(step, name, 1, high - low + 1) if _slash else 1
+        if body == '*':
+            first, last = low, high
+        elif '-' in body:
+            first, last = [_value(part, name, low, high) for part in body.split('-', 1)]
+            if first > last:
+                raise CronError("Invalid {} range: {}".format(name, body))
+        else:
+            first = _value(body, name, low, high)
+            # `a/n` means from a to the end of the range every n
+            last = high if _slash else first
+        for value in range(first, last + 1, step):
+            mask |= 1 << value
+    return mask
+
+
+def compile_pattern(pattern):
+    """
+    :param pattern: five-field cron pattern, e.g. '30 2 * * 1-5'
+    :return: CronSchedule
+    :raise CronError: invalid pattern
+    """
+    exprs = (pattern or '').split()
+    if len(exprs) != len(FIELDS):
+        raise CronError("A cron pattern has {} fields: {}".format(len(FIELDS), pattern))
+    masks = [parse_field(expr, name, low, high) for expr, (name, low, high) in zip(exprs, FIELDS)]
+    weekdays = masks[4]
+    if weekdays & (1 << 7):
+        weekdays = (weekdays | 1) & ~(1 << 7)
+    return CronSchedule(masks[0], masks[1], masks[2], masks[3], weekdays, exprs[2] != '*', exprs[4] != '*')
+
+
+def schedule(pattern):
+    """
+    compile_pattern() through a per-process LRU cache of CUSTOM_BACKUP_CRON_CACHE_SIZE patterns: the BackupJobs
+    share a small number of distinct patterns. Invalid patterns are not cached
+    :raise CronError: invalid pattern
+    """
+    with _schedules_lock:
+        compiled = _schedules.pop(pattern, None)
+        if compiled is not None:
+            _schedules[pattern] = compiled
+            return compiled
+    compiled = compile_pattern(pattern)
+    size = getattr(settings, 'CUSTOM_BACKUP_CRON_CACHE_SIZE', constants.DEFAULT_CRON_CACHE_SIZE)
+    with _schedules_lock:
+        _schedules[pattern] = compiled
+        while len(_schedules) > size:
+            _schedules.popitem(last=False)
+    return compiled
+
+
+def split_pattern(pattern):
+    """
+    :return: dictionary {field name: expression}, e.g. to fill the schedule step of the update wizard
+    :raise CronError: invalid pattern
+    """
+    schedule(pattern)
+    return dict(zip(FIELD_NAMES, pattern.split()))
+
+
+def join_pattern(**fields):
+    """
+    Build a pattern from its fields, missing or empty ones are `*`, e.g. join_pattern(minute='0', hour='2'); the
+    values may be integers, 0 included
+    :raise CronError: the resulting pattern is not valid
+    """
+    pattern = ' '.join('*' if fields.get(name) in (None, '') else str(fields[name]) for name in FIELD_NAMES)
+    schedule(pattern)
+    return pattern
+
+
+def fires_on(schedule, day):
+    """
+    :param day: date
+    :return: True if the schedule fires at least once during the day
+    """
+    if not schedule.months & (1 << day.month):
+        return False
+    day_match = bool(schedule.days & (1 << day.day))
+    # date.weekday() counts from Monday = 0, cron from Sunday = 0
+    weekday_match = bool(schedule.weekdays & (1 << (day.weekday() + 1) % 7))
+    if schedule.day_restricted and schedule.weekday_restricted:
+        return day_match or weekday_match
+    return day_match and weekday_match
+
+
+def day_minutes(schedule):
+    """
+    :return: bitmask of the minutes of the day (0 - 1439) the schedule fires at, on the days it fires
+    """
+    mask = 0
+    for hour in range(24):
+        if schedule.hours & (1 << hour):
+            mask |= schedule.minutes << (hour * 60)
+    return mask
+
+
+def fire_days(schedule, start, days):
+    """
+    :param start: first date of the period
+    :param days: length of the period
+    :return: bitmask of the days of the period the schedule fires on, bit i is start + i days
+    """
+    mask = 0
+    for offset in range(days):
+        if fires_on(schedule, start + timedelta(days=offset)):
+            mask |= 1 << offset
+    return mask
+
+
+def _widen(mask, window):
+    # every set bit t becomes the bits t - window .. t + window
+    widened = 0
+    for shift in range(2 * window + 1):
+        widened |= mask << shift
+    return widened >> window
+
+
+def collide(first, second, window, start, days, first_days=None, second_days=None):
+    """
+    Tell whether two schedules fire within `window` minutes of each other during a period, midnight included.
+    The fire times of a day are compared as bitmasks: the ones of `first` are widened by the window and
+    intersected with the ones of `second` on the same day, the day before and the day after.
+
+    :param window: minutes, less than a day
+    :param first_days: fire_days() of first, when already computed; the same for second_days
+    :return: True if the schedules collide
+    """
+    first_days = fire_days(first, start, days) if first_days is None else first_days
+    second_days = fire_days(second, start, days) if second_days is None else second_days
+    # first is placed on the middle day of three
+    widened = _widen(day_minutes(first) << MINUTES_PER_DAY, window)
+    minutes = day_minutes(second)
+    for day_shift, overlapping_days in ((0, first_days & second_days << 1),
+                                        (1, first_days & second_days),
+                                        (2, first_days << 1 & second_days)):
+        if overlapping_days and widened & (minutes << day_shift * MINUTES_PER_DAY):
+            return True
+    return False
+
+
+def _next_bit(mask, value):
+    # smallest set bit of mask >= value, None if there is none
+    mask >>= value
+    if not mask:
+        return None
+    return value + (mask & -mask).bit_length() - 1
+
+
+def _month_days(compiled, year, month):
+    # bitmask of the days of the month the schedule fires on, bit d is day d
+    first_weekday, length = calendar.monthrange(year, month)
+    valid = ((1 << length) - 1) << 1
+    # the weekday bits rotated so that bit 0 is the weekday of day 1 (cron counts from Sunday), then repeated
+    # over the five weeks a month spans
+    start = (first_weekday + 1) % 7
+    week = ((compiled.weekdays >> start) | (compiled.weekdays << (7 - start))) & 0x7f
+    weekdays = 0
+    for shift in range(0, 35, 7):
+        weekdays |= week << shift
+    weekdays <<= 1
+    if compiled.day_restricted and compiled.weekday_restricted:
+        return (compiled.days | weekdays) & valid
+    return compiled.days & weekdays & valid
+
+
+def next_fire(compiled, after):
+    """
+    First fire time strictly after `after`. Every field is advanced to its next set bit, a field without one
+    carries into the following field, so the cost depends on the number of fields and not on the distance
+    from the fire time.
+    :param compiled: CronSchedule, see schedule()
+    :param after: datetime, its tzinfo is kept
+    :return: datetime, None if the schedule does not fire within SEARCH_YEARS years
+    """
+    start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    year, month, day, hour, minute = start.year, start.month, start.day, start.hour, start.minute
+    while year <= start.year + SEARCH_YEARS:
+        next_month = _next_bit(compiled.months, month)
+        if next_month is None:
+            year, month, day, hour, minute = year + 1, 1, 1, 0, 0
+            continue
+        if next_month != month:
+            month, day, hour, minute = next_month, 1, 0, 0
+        next_day = _next_bit(_month_days(compiled, year, month), day)
+        if next_day is None:
+            year, month, day, hour, minute = (year + 1, 1, 1, 0, 0) if month == 12 else (year, month + 1, 1, 0, 0)
+            continue
+        if next_day != day:
+            day, hour, minute = next_day, 0, 0
+        next_hour = _next_bit(compiled.hours, hour)
+        if next_hour is None:
+            moved = datetime(year, month, day) + timedelta(days=1)
+            year, month, day, hour, minute = moved.year, moved.month, moved.day, 0, 0
+            continue
+        if next_hour != hour:
+            hour, minute = next_hour, 0
+        next_minute = _next_bit(compiled.minutes, minute)
+        if next_minute is None:
+            moved = datetime(year, month, day, hour) + timedelta(hours=1)
+            year, month, day, hour, minute = moved.year, moved.month, moved.day, moved.hour, 0
+            continue
+        return datetime(year, month, day, hour, next_minute, tzinfo=after.tzinfo)
+    return None
+
+
+def next_fires(pattern, after, count):
+    """
+    :param pattern: cron pattern or CronSchedule
+    :return: list of at most `count` fire times after `after`, see next_fire()
+    :raise CronError: invalid pattern
+    """
+    compiled = pattern if isinstance(pattern, CronSchedule) else schedule(pattern)
+    fires = []
+    while len(fires) < count:
+        after = next_fire(compiled, after)
+        if after is None:
+            break
+        fires.append(after)
+    return fires
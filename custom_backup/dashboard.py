@@ -6,7 +6,7 @@ import horizon
 class Custom_Backup(horizon.Dashboard):
     name = _("Custom_Backup")
     slug = "custom_backup"
-    panels = ('jobs', 'notifications')
+    panels = ('jobs', 'notifications', 'load')
     # Specify the slug of the dashboard's default panel.
     default_panel = 'jobs'
 
@@ -1,21 +1,38 @@
 import logging
-from uuid import uuid1
+import re
+from collections import OrderedDict, namedtuple
+from itertools import groupby
+from operator import itemgetter
+from datetime import datetime, timedelta
+from hashlib import sha256
+from uuid import uuid1, uuid5, NAMESPACE_URL
 from json import loads, dumps
+from multiprocessing.pool import ThreadPool
+from django.conf import settings
 from django.core.exceptions import MultipleObjectsReturned
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
 from django.utils import timezone
 from horizon.exceptions import HandledException, NotFound
-from mistraldashboard import api
-from mistralclient.api.base import APIException
-from openstack_dashboard.dashboards.custom_backup.models import BackupJob, Notification
+from novaclient import exceptions as nova_exceptions
+from openstack_dashboard.api.nova import server_get as nova_server_get, \
+    server_list as nova_server_list
+from openstack_dashboard.dashboards.custom_backup.models import BackupJob, BackupJobSummary, Notification, \
+    BackupJobInstance, TriggerOperation
+from openstack_dashboard.dashboards.custom_backup.models.backup_job import next_run
+from openstack_dashboard.dashboards.custom_backup import cron, mistral_api
+from openstack_dashboard.dashboards.custom_backup.cache import coalesced_get, make_key, versioned_get
 from openstack_dashboard.dashboards.custom_backup.constants import constants
+from openstack_dashboard.dashboards.custom_backup.signals import invalidate, notifications_scope, object_scope
+from openstack_dashboard.dashboards.custom_backup.utils import workflow_input_fingerprint, extract_object_id, \
+    request_project_id, JOBS_TABLE
 
 
 logger = logging.getLogger(__name__)
 
 
-# TODO can it be used?
-# @memoized.memoized_method
+# NOTE: the lookups of the BackupJob edited by the update/clone workflows are memoized per request by
+# request_backup_job, use it instead of get_or_none there
 def get_or_none(model, **kwargs):
     try:
         return model.objects.get(**kwargs)
@@ -27,132 +44,1126 @@ def get_or_none(model, **kwargs):
         raise e
 
 
-def create_cron_trigger(request, name, workflow_input, schedule_pattern):
-    trigger_params = ''
-    trigger_first_time = None
-    default_count = None
-    default_workflow_id = constants.DEFAULT_WORKFLOW_ID
-    trigger_name = constants.NAME_PREFIX.format(name)
-    try:
-        logger.info("Creating cron-trigger {}".format(trigger_name))
-        new_trigger = api.cron_trigger_create(
-            request,
-            trigger_name,
-            default_workflow_id,
-            workflow_input,
-            trigger_params,
-            schedule_pattern,
-            trigger_first_time,
-            default_count,
-        )
-        return new_trigger
-    except APIException as e:
-        logger.error(e)
-        raise e
+def search_instances(request, query='', marker=None):
+    """
+    One page of the instances of the current project whose name contains query, for the instance picker of the
+    BackupJob wizards. Nova filters the names (its name filter is a regular expression) and pages the result, so the
+    cost does not depend on the size of the fleet; the pages are cached per project for
+    CUSTOM_BACKUP_INSTANCE_CACHE_TTL seconds.
 
+    :param marker: id of the last instance of the previous page
+    :return: dictionary {'instances': [(id, name), ..], 'more': True if there is a next page}
+    """
+    def _load():
+        search_opts = {'paginate': True}
+        if query:
+            search_opts['name'] = re.escape(query)
+        if marker:
+            search_opts['marker'] = marker
+        servers, more = nova_server_list(request, search_opts=search_opts, detailed=False)
+        return {'instances': [(server.id, server.name) for server in servers], 'more': more}
 
-def delete_cron_trigger(request, backup_job_name):
-    trigger_name = constants.NAME_PREFIX.format(backup_job_name)
-    try:
-        logger.info("Deleting cron-trigger {}".format(trigger_name))
-        api.cron_trigger_delete(request, trigger_name)
-        return True
-    except APIException as e:
-        logger.error(e)
-        raise
+    # the query is hashed, since cache keys cannot contain every character
+    key = make_key('instances', request.user.tenant_id, sha256(query.encode('utf-8')).hexdigest(), marker or '')
+    ttl = getattr(settings, 'CUSTOM_BACKUP_INSTANCE_CACHE_TTL', constants.DEFAULT_INSTANCE_CACHE_TTL)
+    return coalesced_get(key, _load, ttl)
+
+
+def instance_names(request, instance_ids, project_id):
+    """
+    Names of the given instances which belong to project_id, the project of the BackupJob: it differs from the one of
+    the user when an admin edits the BackupJob of another project. Used to validate the instances picked in the
+    wizards and to label the ones already selected. Only the instances asked for are read, one server get each,
+    CUSTOM_BACKUP_NOVA_CONCURRENCY at a time, and cached like the pages of search_instances, so the cost does not
+    depend on the size of the project.
+
+    :return: dictionary {instance id: name}, without the instances not found or belonging to another project
+    """
+    ttl = getattr(settings, 'CUSTOM_BACKUP_INSTANCE_CACHE_TTL', constants.DEFAULT_INSTANCE_CACHE_TTL)
+
+    def _lookup(instance_id):
+        def _load():
+            try:
+                server = nova_server_get(request, instance_id)
+            except nova_exceptions.NotFound:
+                return ()
+            return getattr(server, 'tenant_id', None), server.name
+        # the cached value is () for the instances not found, since None cannot be cached
+        return instance_id, coalesced_get(make_key('instance', instance_id), _load, ttl)
+
+    instance_ids = list(instance_ids)
+    concurrency = getattr(settings, 'CUSTOM_BACKUP_NOVA_CONCURRENCY', constants.DEFAULT_NOVA_CONCURRENCY)
+    if len(instance_ids) > 1 and concurrency > 1:
+        pool = ThreadPool(processes=min(concurrency, len(instance_ids)))
+        try:
+            servers = pool.map(_lookup, instance_ids)
+        finally:
+            pool.close()
+    else:
+        servers = [_lookup(instance_id) for instance_id in instance_ids]
+    return dict((instance_id, server[1]) for instance_id, server in servers if server and server[0] == project_id)
+
+
+def consolidated_triggers():
+    """
+    :return: True if the new BackupJobs share the cron-trigger of their schedule, see constants.TRIGGER_MODE_*
+    """
+    mode = getattr(settings, 'CUSTOM_BACKUP_TRIGGER_MODE', constants.DEFAULT_TRIGGER_MODE)
+    return mode == constants.TRIGGER_MODE_CONSOLIDATED
+
+
+def shared_trigger_key(project_id, schedule_pattern):
+    """
+    Stable UUID of the cron-trigger shared by the BackupJobs of a project with the same schedule_pattern: it takes
+    the place of the BackupJob id in the outbox, so the sync operations of a shared trigger form one chain
+    """
+    return str(uuid5(NAMESPACE_URL, 'custom_backup:{}:{}'.format(project_id, schedule_pattern)))
+
+
+def backup_job_trigger_name(backup_job):
+    if backup_job.shared_trigger:
+        return constants.SHARED_NAME_PREFIX.format(backup_job.schedule_pattern)
+    return constants.NAME_PREFIX.format(backup_job.name)
+
+
+def _trigger_operation(backup_job, operation, trigger_name=None, **kwargs):
+    return TriggerOperation(
+        id=str(uuid1()),
+        backup_job_id=backup_job.id,
+        project_id=backup_job.project_id,
+        operation=operation,
+        trigger_name=trigger_name or constants.NAME_PREFIX.format(backup_job.name),
+        next_attempt_time=timezone.now(),
+        **kwargs
+    )
+
+
+def _sync_operation(project_id, schedule_pattern):
+    return TriggerOperation(
+        id=str(uuid1()),
+        backup_job_id=shared_trigger_key(project_id, schedule_pattern),
+        project_id=project_id,
+        operation=TriggerOperation.OPERATION_SYNC,
+        trigger_name=constants.SHARED_NAME_PREFIX.format(schedule_pattern),
+        schedule_pattern=schedule_pattern,
+        next_attempt_time=timezone.now(),
+    )
 
 
-def update_cron_trigger(request, current_backup_job, new_name='', schedule_pattern=None, workflow_input=None):
+def _summaries_of(operations):
     """
-    A cron-trigger is always deleted, because it cannot be modified, even if we are changing its name only.
+    :return: the BackupJobSummary rows of the BackupJobs affected by the operations, the members of the shared
+        trigger for the sync operations
+    """
+    condition = Q(backup_job_id__in=[operation.backup_job_id for operation in operations
+                                     if operation.operation != TriggerOperation.OPERATION_SYNC])
+    for operation in operations:
+        if operation.operation == TriggerOperation.OPERATION_SYNC:
+            condition |= Q(project_id=operation.project_id, schedule_pattern=operation.schedule_pattern,
+                           backup_job__shared_trigger=True)
+    return BackupJobSummary.objects.filter(condition)
+
+
+def _enqueue(operations):
+    # one INSERT for the operations and one UPDATE for the trigger_state of the BackupJobs waiting for them
+    operations = TriggerOperation.objects.bulk_create(operations)
+    if operations:
+        _summaries_of(operations).update(trigger_state=constants.TRIGGER_STATE_PENDING)
+    return operations
+
+
+def update_trigger_state(operation):
+    """
+    Called by the outbox once an operation is done or has failed for good: the BackupJobs it affects get the
+    active, or missing, trigger_state, unless another operation is waiting for them. The deletions leave the state
+    to the operation creating the new trigger, if any
+    """
+    if operation.status == TriggerOperation.STATUS_PENDING or \
+            operation.operation == TriggerOperation.OPERATION_DELETE:
+        return
+    if TriggerOperation.objects.filter(backup_job_id=operation.backup_job_id,
+                                       status=TriggerOperation.STATUS_PENDING).exists():
+        return
+    state = constants.TRIGGER_STATE_MISSING if operation.status == TriggerOperation.STATUS_FAILED else \
+        constants.TRIGGER_STATE_ACTIVE
+    _summaries_of([operation]).update(trigger_state=state)
+
+
+def enqueue_trigger_creation(backup_job):
+    """
+    The enqueue_trigger_* functions write into the outbox the cron-trigger change required by a BackupJob write,
+    they must be called inside the same transaction of that write. The change is applied by the
+    drain_trigger_outbox command, see outbox.py
+    """
+    operation = _trigger_operation(backup_job, TriggerOperation.OPERATION_CREATE,
+                                   workflow_input=backup_job.workflow_input,
+                                   schedule_pattern=backup_job.schedule_pattern)
+    return _enqueue([operation])[0]
+
+
+def enqueue_trigger_replacement(backup_job, old_name):
+    """
+    :param backup_job: the BackupJob with the new name, schedule_pattern and workflow_input
+    :param old_name: the name of the BackupJob before the update, it identifies the trigger to delete
+    """
+    operation = _trigger_operation(backup_job, TriggerOperation.OPERATION_REPLACE,
+                                   old_trigger_name=constants.NAME_PREFIX.format(old_name),
+                                   workflow_input=backup_job.workflow_input,
+                                   schedule_pattern=backup_job.schedule_pattern)
+    return _enqueue([operation])[0]
+
 
-    :param current_backup_job: triggers are identified using the backup_job_name
-    :param new_name: triggers are identified using the backup_job_name
-    :param schedule_pattern: this is a string
-    :param workflow_input: it must be a dictionary, not a string. Mistral stores this information as JSON type
-    TODO: if loads raises Exception then it should be handled (check usage of @handle_error decorator in api)
+def enqueue_trigger_sync(project_id, schedule_pattern):
     """
-    if not workflow_input:
-        workflow_input = current_backup_job.workflow_input
-    if not schedule_pattern:
-        schedule_pattern = current_backup_job.schedule_pattern
+    Consolidated mode: a BackupJob joined or left the shared trigger of (project_id, schedule_pattern), or changed
+    its input. Only the membership is recorded here, the outbox worker rebuilds the trigger from the BackupJobs
+    using it when the operation is applied, and the sync operations waiting for the same trigger collapse into one
+    Mistral call, see outbox.coalesce_syncs
+    """
+    operation = _sync_operation(project_id, schedule_pattern)
+    return _enqueue([operation])[0]
+
+
+def enqueue_trigger_update(backup_job, old_name, old_schedule_pattern, was_shared, input_changed=True):
+    """
+    Enqueue the cron-trigger changes of an updated BackupJob, including the moves between a trigger of its own and
+    a shared one when CUSTOM_BACKUP_TRIGGER_MODE has changed since the BackupJob was saved
+    :param backup_job: the BackupJob with the new name, schedule_pattern, workflow_input and shared_trigger
+    :param old_name: name, schedule_pattern and shared_trigger before the update
+    :param input_changed: False if the update kept the workflow_input
+    """
+    if not was_shared and not backup_job.shared_trigger:
+        return [enqueue_trigger_replacement(backup_job, old_name)]
+    if was_shared and backup_job.shared_trigger and old_schedule_pattern == backup_job.schedule_pattern and \
+            not input_changed:
+        # the shared trigger holds the inputs of its BackupJobs, not their names
+        return []
+    if was_shared:
+        operations = [_sync_operation(backup_job.project_id, old_schedule_pattern)]
+    else:
+        operations = [_trigger_operation(backup_job, TriggerOperation.OPERATION_DELETE,
+                                         trigger_name=constants.NAME_PREFIX.format(old_name))]
+    if not backup_job.shared_trigger:
+        operations.append(_trigger_operation(backup_job, TriggerOperation.OPERATION_CREATE,
+                                             workflow_input=backup_job.workflow_input,
+                                             schedule_pattern=backup_job.schedule_pattern))
+    elif not was_shared or old_schedule_pattern != backup_job.schedule_pattern:
+        operations.append(_sync_operation(backup_job.project_id, backup_job.schedule_pattern))
+    return _enqueue(operations)
+
+
+def enqueue_trigger_deletions(backup_jobs):
+    """
+    The BackupJobs sharing a trigger leave it: one sync operation per shared trigger
+    """
+    backup_jobs = list(backup_jobs)
+    shared = set((backup_job.project_id, backup_job.schedule_pattern)
+                 for backup_job in backup_jobs if backup_job.shared_trigger)
+    return _enqueue(
+        [_trigger_operation(backup_job, TriggerOperation.OPERATION_DELETE)
+         for backup_job in backup_jobs if not backup_job.shared_trigger] +
+        [_sync_operation(project_id, schedule_pattern) for project_id, schedule_pattern in sorted(shared)]
+    )
+
+
+def shared_trigger_batch(project_id, schedule_pattern):
+    """
+    :return: list of the workflow inputs (dictionaries) of the BackupJobs sharing the trigger, in id order
+    """
+    batch = []
+    for backup_job_id, workflow_input in BackupJob.objects.filter(
+            project_id=project_id, schedule_pattern=schedule_pattern, shared_trigger=True) \
+            .order_by('id').values_list('id', 'workflow_input'):
+        try:
+            batch.append(loads(workflow_input))
+        except ValueError as e:
+            logger.error("Skipping BackupJob {} from the shared trigger: {}".format(backup_job_id, e))
+    return batch
 
-    if isinstance(workflow_input, str) or isinstance(workflow_input, unicode):
-        workflow_input = loads(workflow_input)
 
-    current_name = current_backup_job.name
-    if delete_cron_trigger(request, current_name):
-        trigger_name = new_name or current_name
-        return create_cron_trigger(request=request,
-                                   name=trigger_name,
-                                   workflow_input=workflow_input,
-                                   schedule_pattern=schedule_pattern)
-    return None
+def set_shared_trigger_id(project_id, schedule_pattern, cron_trigger_id):
+    """
+    Record the id of a shared trigger on all the BackupJobs using it
+    """
+    qs = BackupJob.objects.filter(project_id=project_id, schedule_pattern=schedule_pattern, shared_trigger=True)
+    backup_job_ids = list(qs.values_list('id', flat=True))
+    updated = qs.update(cron_trigger_id=cron_trigger_id)
+    BackupJobSummary.objects.filter(backup_job_id__in=backup_job_ids).update(cron_trigger_id=cron_trigger_id)
+    # update() does not send post_save
+    invalidate([object_scope(BackupJob, backup_job_id) for backup_job_id in backup_job_ids])
+    return updated
+
+
+# kind of difference between a BackupJob and the Mistral cron-triggers, see find_drifts
+DRIFT_MISSING = 'missing'
+DRIFT_ORPHANED = 'orphaned'
+DRIFT_STALE = 'stale'
+DRIFT_UNTRACKED = 'untracked'
+# the trigger matches the BackupJob, but the trigger_state of its BackupJobSummary is not active
+DRIFT_STATE = 'state'
+
+# backup_job is None for orphaned triggers, trigger_* are None for missing triggers
+Drift = namedtuple('Drift', ['kind', 'backup_job', 'trigger_name', 'trigger_id', 'project_id'])
+
+
+def _index_key(trigger, shared_prefix):
+    # the shared triggers of the projects have the same name, see shared_trigger_key
+    if trigger.name.startswith(shared_prefix):
+        return shared_trigger_key(getattr(trigger, 'project_id', None), trigger.name[len(shared_prefix):])
+    return trigger.name
+
+
+def index_triggers(triggers):
+    """
+    Keep, for every cron-trigger created by this dashboard, only what is needed to diff it against its BackupJobs
+    :param triggers: iterable of Mistral cron-triggers, e.g. mistral_api.iter_triggers
+    :return: dictionary {trigger name, or shared_trigger_key for the shared triggers:
+        (id, project_id, pattern, workflow input fingerprint, name)}
+    """
+    prefix = constants.NAME_PREFIX.format('')
+    shared_prefix = constants.SHARED_NAME_PREFIX.format('')
+    return dict(
+        (_index_key(trigger, shared_prefix),
+         (trigger.id, getattr(trigger, 'project_id', None), trigger.pattern,
+          workflow_input_fingerprint(trigger.workflow_input), trigger.name))
+        for trigger in triggers if trigger.name.startswith(prefix) or trigger.name.startswith(shared_prefix)
+    )
+
+
+def _shared_drifts(backup_jobs, trigger_index, pending_jobs):
+    """
+    Diff every shared trigger against the BackupJobs using it, see find_drifts. The Drift holds an unsaved BackupJob
+    with only the project_id, schedule_pattern and shared_trigger of the group set.
+    """
+    fields = ('project_id', 'schedule_pattern', 'cron_trigger_id', 'summary__trigger_state')
+    rows = backup_jobs.order_by('project_id', 'schedule_pattern').values_list(*fields).iterator()
+    for (project_id, pattern), members in groupby(rows, key=itemgetter(0, 1)):
+        members = list(members)
+        key = shared_trigger_key(project_id, pattern)
+        trigger = trigger_index.pop(key, None)
+        if key in pending_jobs:
+            continue
+        backup_job = BackupJob(project_id=project_id, schedule_pattern=pattern, shared_trigger=True)
+        if trigger is None:
+            yield Drift(DRIFT_MISSING, backup_job, None, None, None)
+            continue
+        trigger_id, trigger_project_id, trigger_pattern, fingerprint, name = trigger
+        batch = shared_trigger_batch(project_id, pattern)
+        if trigger_pattern != pattern or fingerprint != workflow_input_fingerprint({'backup_jobs': batch}):
+            yield Drift(DRIFT_STALE, backup_job, name, trigger_id, trigger_project_id)
+        elif any(member[2] != trigger_id for member in members):
+            yield Drift(DRIFT_UNTRACKED, backup_job, name, trigger_id, trigger_project_id)
+        elif any(member[3] != constants.TRIGGER_STATE_ACTIVE for member in members):
+            yield Drift(DRIFT_STATE, backup_job, name, trigger_id, trigger_project_id)
+
+
+def find_drifts(trigger_index, project_id=None):
+    """
+    Diff the BackupJobs against the cron-triggers. The jobs are streamed with .iterator() and every matched trigger
+    is popped from trigger_index, so the memory used does not grow with the number of jobs and the triggers left
+    at the end are the orphaned ones. A trigger is matched by cron_trigger_id first and then by name.
+    BackupJobs and triggers with a change waiting inside the outbox are skipped, the outbox will fix them.
+    The BackupJobs using a shared trigger are diffed by group, against the batch enqueue_trigger_sync would build.
+    The trigger_state shown by the jobs index is only updated by the outbox, so it is checked as well against the
+    triggers found.
+
+    :param trigger_index: see index_triggers, it is consumed
+    :param project_id: restrict the diff to the BackupJobs of a project, None for all of them
+    :return: generator of Drift
+    """
+    pending = TriggerOperation.objects.filter(status=TriggerOperation.STATUS_PENDING)
+    pending_jobs = set(pending.values_list('backup_job_id', flat=True))
+    pending_names = set(pending.values_list('trigger_name', flat=True)) | \
+        set(pending.exclude(old_trigger_name=None).values_list('old_trigger_name', flat=True))
+    names_by_id = dict((values[0], key) for key, values in trigger_index.items())
+
+    fields = ('id', 'name', 'project_id', 'schedule_pattern', 'workflow_input', 'workflow_input_hash',
+              'cron_trigger_id')
+    backup_jobs = BackupJob.objects.filter(shared_trigger=False).order_by()
+    shared_backup_jobs = BackupJob.objects.filter(shared_trigger=True).order_by()
+    if project_id is not None:
+        backup_jobs = backup_jobs.filter(project_id=project_id)
+        shared_backup_jobs = shared_backup_jobs.filter(project_id=project_id)
+    for drift in _shared_drifts(shared_backup_jobs, trigger_index, pending_jobs):
+        yield drift
+    for values in backup_jobs.values_list(*(fields + ('summary__trigger_state', ))).iterator():
+        backup_job = BackupJob(**dict(zip(fields, values)))
+        trigger_state = values[-1]
+        expected_name = constants.NAME_PREFIX.format(backup_job.name)
+        trigger = trigger_index.pop(names_by_id.pop(backup_job.cron_trigger_id, None) or expected_name, None)
+        if backup_job.id in pending_jobs:
+            continue
+        if trigger is None:
+            yield Drift(DRIFT_MISSING, backup_job, None, None, None)
+            continue
+        trigger_id, trigger_project_id, pattern, fingerprint, name = trigger
+        if name != expected_name or pattern != backup_job.schedule_pattern or \
+                fingerprint != backup_job.workflow_input_hash:
+            yield Drift(DRIFT_STALE, backup_job, name, trigger_id, trigger_project_id)
+        elif trigger_id != backup_job.cron_trigger_id:
+            yield Drift(DRIFT_UNTRACKED, backup_job, name, trigger_id, trigger_project_id)
+        elif trigger_state != constants.TRIGGER_STATE_ACTIVE:
+            yield Drift(DRIFT_STATE, backup_job, name, trigger_id, trigger_project_id)
+    for trigger_id, trigger_project_id, _pattern, _fingerprint, name in trigger_index.values():
+        if name not in pending_names:
+            yield Drift(DRIFT_ORPHANED, None, name, trigger_id, trigger_project_id)
+
+
+def _mark_active(backup_job_ids):
+    if backup_job_ids:
+        BackupJobSummary.objects.filter(backup_job_id__in=backup_job_ids) \
+            .update(trigger_state=constants.TRIGGER_STATE_ACTIVE)
+
+
+def _repair_shared_drift(drift, operations):
+    project_id, schedule_pattern = drift.backup_job.project_id, drift.backup_job.schedule_pattern
+    if drift.kind in (DRIFT_MISSING, DRIFT_STALE):
+        operations.append(_sync_operation(project_id, schedule_pattern))
+        return
+    if drift.kind == DRIFT_UNTRACKED:
+        set_shared_trigger_id(project_id, schedule_pattern, drift.trigger_id)
+    BackupJobSummary.objects.filter(project_id=project_id, schedule_pattern=schedule_pattern,
+                                    backup_job__shared_trigger=True) \
+        .update(trigger_state=constants.TRIGGER_STATE_ACTIVE)
+
+
+def repair_drifts(drifts, batch_size=500):
+    """
+    Enqueue into the outbox the operations fixing the drifts, batch_size rows per INSERT. The Mistral calls are then
+    executed in parallel, with the CUSTOM_BACKUP_MISTRAL_CONCURRENCY limit, by outbox.drain. Untracked triggers
+    only need their id to be recorded, and existing triggers the active trigger_state: no Mistral call is involved.
+    The drifts of a shared trigger are fixed for all the BackupJobs using it, with a sync operation if needed.
+    :return: dictionary {drift kind: number of drifts}
+    """
+    counts = OrderedDict((kind, 0) for kind in (DRIFT_MISSING, DRIFT_STALE, DRIFT_UNTRACKED, DRIFT_ORPHANED,
+                                                DRIFT_STATE))
+    operations = []
+    active = []
+    for drift in drifts:
+        counts[drift.kind] += 1
+        if drift.backup_job is not None and drift.backup_job.shared_trigger:
+            _repair_shared_drift(drift, operations)
+        elif drift.kind == DRIFT_STATE:
+            active.append(drift.backup_job.id)
+        elif drift.kind == DRIFT_MISSING:
+            operations.append(_trigger_operation(
+                drift.backup_job, TriggerOperation.OPERATION_CREATE,
+                workflow_input=drift.backup_job.workflow_input, schedule_pattern=drift.backup_job.schedule_pattern))
+        elif drift.kind == DRIFT_STALE:
+            operations.append(_trigger_operation(
+                drift.backup_job, TriggerOperation.OPERATION_REPLACE, old_trigger_name=drift.trigger_name,
+                workflow_input=drift.backup_job.workflow_input, schedule_pattern=drift.backup_job.schedule_pattern))
+        elif drift.kind == DRIFT_UNTRACKED:
+            set_cron_trigger_id(drift.backup_job.id, drift.trigger_id)
+            active.append(drift.backup_job.id)
+        elif drift.kind == DRIFT_ORPHANED:
+            # there is no BackupJob: the trigger id keys the chain of the operation, see outbox.due_chains
+            operations.append(TriggerOperation(
+                id=str(uuid1()), backup_job_id=drift.trigger_id, project_id=drift.project_id,
+                operation=TriggerOperation.OPERATION_DELETE, trigger_name=drift.trigger_name,
+                next_attempt_time=timezone.now()))
+        if len(operations) >= batch_size:
+            _enqueue(operations)
+            operations = []
+        if len(active) >= batch_size:
+            _mark_active(active)
+            active = []
+    _enqueue(operations)
+    _mark_active(active)
+    logger.info("Repaired cron-trigger drifts: {}".format(dict(counts)))
+    return counts
+
+
+CONFLICT_DUPLICATE = 'duplicate'
+CONFLICT_OVERLAP = 'overlap'
+
+# schedule_patterns has one pattern for duplicates and two for overlaps, backup_jobs holds the BackupJobs having
+# those patterns with only the fields of SCHEDULE_CONFLICT_FIELDS loaded
+ScheduleConflict = namedtuple('ScheduleConflict', ['kind', 'source_key', 'schedule_patterns', 'backup_jobs'])
+SCHEDULE_CONFLICT_FIELDS = ('id', 'name', 'project_id', 'source_key', 'schedule_pattern')
+
+
+def _compiled_schedules(patterns, compiled, start, horizon_days):
+    # the fire days of each pattern are computed once per search; invalid patterns are left out
+    for pattern in patterns:
+        if pattern not in compiled:
+            try:
+                schedule = cron.schedule(pattern)
+                compiled[pattern] = (schedule, cron.fire_days(schedule, start, horizon_days))
+            except cron.CronError as e:
+                logger.warning("Skipping schedule {}: {}".format(pattern, e))
+                compiled[pattern] = None
+    return [(pattern, compiled[pattern]) for pattern in patterns if compiled[pattern] is not None]
+
+
+def _shared_sources(project_id, chunk_size):
+    """
+    (source key, BackupJob) pairs of the sources backed up by more than one BackupJob, ordered by source, pattern and
+    name. The instances are grouped through the (instance_id, backup_job) index of BackupJobInstance, so that a
+    BackupJob backing up several instances is compared with every job sharing one of them; the metadata pairs
+    through the source_key index
+    """
+    instances = BackupJobInstance.objects.order_by()
+    backup_jobs = BackupJob.objects.filter(source_key__startswith='metadata:').order_by()
+    if project_id is not None:
+        instances = instances.filter(backup_job__project_id=project_id)
+        backup_jobs = backup_jobs.filter(project_id=project_id)
+    shared_instances = list(instances.values('instance_id').annotate(jobs=Count('backup_job')).filter(jobs__gt=1)
+                            .order_by('instance_id').values_list('instance_id', flat=True))
+    job_fields = ['backup_job__' + field for field in SCHEDULE_CONFLICT_FIELDS]
+    for offset in range(0, len(shared_instances), chunk_size):
+        rows = instances.filter(instance_id__in=shared_instances[offset:offset + chunk_size]) \
+            .order_by('instance_id', 'backup_job__schedule_pattern', 'backup_job__name') \
+            .values_list('instance_id', *job_fields)
+        for values in rows:
+            yield 'instance:{}'.format(values[0]), BackupJob(**dict(zip(SCHEDULE_CONFLICT_FIELDS, values[1:])))
+
+    shared_metadata = list(backup_jobs.values('source_key').annotate(jobs=Count('id')).filter(jobs__gt=1)
+                           .order_by('source_key').values_list('source_key', flat=True))
+    for offset in range(0, len(shared_metadata), chunk_size):
+        rows = backup_jobs.filter(source_key__in=shared_metadata[offset:offset + chunk_size]) \
+            .order_by('source_key', 'schedule_pattern', 'name').values_list(*SCHEDULE_CONFLICT_FIELDS)
+        for values in rows:
+            backup_job = BackupJob(**dict(zip(SCHEDULE_CONFLICT_FIELDS, values)))
+            yield backup_job.source_key, backup_job
+
+
+def find_schedule_conflicts(project_id=None, window=None, horizon_days=None, start=None, chunk_size=500):
+    """
+    Find the BackupJobs backing up the same instance or metadata pair either with the same schedule_pattern
+    (duplicates) or with schedules firing within `window` minutes of each other (overlaps).
+
+    The jobs are grouped by the database, see _shared_sources, and only the ones of sources shared by more than one
+    job are loaded, a chunk of sources at a time. The schedules of a source are compared as bitmasks of fire times,
+    see cron.collide, and every distinct pattern is compiled once per search.
+
+    :param project_id: restrict the search to a project, None for all of them
+    :param window: minutes, CUSTOM_BACKUP_OVERLAP_WINDOW by default
+    :param horizon_days: number of days, starting from `start` (today by default), the fire times are compared on,
+        CUSTOM_BACKUP_OVERLAP_HORIZON_DAYS by default
+    :return: generator of ScheduleConflict, whose source_key is `instance:<id>` or `metadata:<key>=<value>`
+    """
+    if window is None:
+        window = getattr(settings, 'CUSTOM_BACKUP_OVERLAP_WINDOW', constants.DEFAULT_OVERLAP_WINDOW)
+    if horizon_days is None:
+        horizon_days = getattr(settings, 'CUSTOM_BACKUP_OVERLAP_HORIZON_DAYS', constants.DEFAULT_OVERLAP_HORIZON_DAYS)
+    # collide() compares the fire times of adjacent days only
+    window = min(window, cron.MINUTES_PER_DAY - 1)
+    start = start or timezone.now().date()
+
+    compiled = {}
+    for source_key, source_rows in groupby(_shared_sources(project_id, chunk_size), key=lambda row: row[0]):
+        source_jobs = (backup_job for _source_key, backup_job in source_rows)
+        by_pattern = OrderedDict((pattern, list(pattern_jobs)) for pattern, pattern_jobs in
+                                 groupby(source_jobs, key=lambda job: job.schedule_pattern))
+        for pattern, pattern_jobs in by_pattern.items():
+            if len(pattern_jobs) > 1:
+                yield ScheduleConflict(CONFLICT_DUPLICATE, source_key, (pattern, ), pattern_jobs)
+        schedules = _compiled_schedules(list(by_pattern.keys()), compiled, start, horizon_days)
+        for index, (first, (first_schedule, first_days)) in enumerate(schedules):
+            for second, (second_schedule, second_days) in schedules[index + 1:]:
+                if cron.collide(first_schedule, second_schedule, window, start, horizon_days,
+                                first_days, second_days):
+                    yield ScheduleConflict(CONFLICT_OVERLAP, source_key, (first, second),
+                                           by_pattern[first] + by_pattern[second])
 
 
 def create_backup_job(request, name, workflow_input, schedule_pattern, tenant_id, notification):
     """
-    NOTE: remind to use @transaction.atomic inside the caller
+    NOTE: remind to use @transaction.atomic inside the caller, the BackupJob and the outbox operation creating its
+    cron-trigger must be written together
     :return:
     """
-    # new_trigger = create_cron_trigger(request, name, workflow_input, schedule_pattern)
     try:
-        # logger.info("Creating new BackupJob associated with trigger: {}".format(new_trigger.id))
-        return BackupJob.objects.create(
+        backup_job = BackupJob.objects.create(
             name=name,
             workflow_input=dumps(workflow_input),
             schedule_pattern=schedule_pattern,
             creation_time=timezone.now(),
-            cron_trigger_id="43d345e0-fdfb-4639-8b78-cfcbc68846e0",
             project_id=tenant_id,
-            notification=notification
+            notification=notification,
+            shared_trigger=consolidated_triggers()
         )
+        if backup_job.shared_trigger:
+            enqueue_trigger_sync(backup_job.project_id, backup_job.schedule_pattern)
+        else:
+            enqueue_trigger_creation(backup_job)
+        return backup_job
     except IntegrityError as e:
         logger.error(e)
         raise
 
 
 def delete_backup_job(request, backup_job_id):
+    """
+    The BackupJob is deleted together with the enqueuing of its cron-trigger deletion, see enqueue_trigger_creation.
+    Only the BackupJobs of the project of the request can be deleted, see utils.request_project_id
+    """
     try:
         logger.info("Trying to delete BackupJob: {}".format(backup_job_id))
-        obj = get_or_none(BackupJob, id=backup_job_id)
+        project_id = request_project_id(request, JOBS_TABLE)
+        obj = get_or_none(BackupJob, id=backup_job_id, **({} if project_id is None else {'project_id': project_id}))
         if not obj:
             return False
-        delete_cron_trigger(request, obj.name)
-        obj.delete()
-    except (IntegrityError, MultipleObjectsReturned, APIException) as e:
+        with transaction.atomic():
+            enqueue_trigger_deletions([obj])
+            obj.delete()
+    except (IntegrityError, MultipleObjectsReturned) as e:
         logger.error("Failed to delete BackupJob with ID {}: {}".format(backup_job_id, e))
         return False
     else:
         return True
 
 
+def delete_backup_jobs(request, backup_job_ids):
+    """
+    Bulk version of delete_backup_job: the jobs are loaded with one query, the deletions of their cron-triggers are
+    enqueued with one INSERT and the rows are deleted with a single statement, all inside one transaction. The
+    Mistral calls are executed in parallel by the outbox worker.
+
+    :return: OrderedDict {backup_job_id: (name, error)}, following the order of backup_job_ids. error is None if
+        the BackupJob has been deleted, the failure reason otherwise; the BackupJobs of other projects do not exist
+    """
+    qs = backup_jobs_of_project(request_project_id(request, JOBS_TABLE))
+    jobs = dict((job.id, job)
+                for job in qs.filter(id__in=backup_job_ids)
+                .only('id', 'name', 'project_id', 'schedule_pattern', 'shared_trigger'))
+    with transaction.atomic():
+        enqueue_trigger_deletions(jobs.values())
+        BackupJob.objects.filter(id__in=list(jobs.keys())).delete()
+    logger.info("Deleted {} BackupJobs".format(len(jobs)))
+
+    report = OrderedDict()
+    for backup_job_id in backup_job_ids:
+        job = jobs.get(backup_job_id)
+        report[backup_job_id] = (job.name, None) if job else (None, "BackupJob does not exist")
+    return report
+
+
 def all_backup_jobs(as_list=False):
+    """
+    NOTE: this spans every tenant, prefer backup_jobs_of_project() unless the caller is an admin
+    """
     qs = BackupJob.objects.all()
     if as_list:
         return list(qs)
     return qs
 
 
+def backup_jobs_of_project(project_id, as_list=False):
+    """
+    :param project_id: when None the jobs of all tenants are returned, this must be allowed to admins only
+    """
+    qs = BackupJob.objects.all()
+    if project_id is not None:
+        qs = qs.filter(project_id=project_id)
+    if as_list:
+        return list(qs)
+    return qs
+
+
+def backup_job_name_exists(name, exclude_id=None):
+    """
+    BackupJob names are unique across all the projects, because they identify the Mistral cron-trigger, so this
+    check is not project scoped: it is a lookup on the unique index of the name column
+    """
+    qs = BackupJob.objects.filter(name=name)
+    if exclude_id:
+        qs = qs.exclude(id=exclude_id)
+    return qs.exists()
+
+
+# sort key exposed to the UI -> (model field, nullable). NULLs are the smallest value on every database, see paginate
+JOB_SUMMARY_SORT_KEYS = {
+    'name': ('name', False),
+    'schedule_pattern': ('schedule_pattern', False),
+    'project_id': ('project_id', False),
+    'notification': ('notification_name', True),
+    'creation_time': ('creation_time', False),
+    'update_time': ('update_time', True),
+    'next_run_at': ('next_run_at', True),
+}
+
+# compact rows of the index pages, holding only the columns of JobsTable and NotificationsTable: tuples built
+# from values_list() instead of model instances, see paginate(). The first field is always the primary key
+JobRow = namedtuple('JobRow', ['id', 'name', 'workflow_input_summary', 'schedule_pattern', 'project_id',
+                               'cron_trigger_id', 'trigger_state', 'next_run_at', 'creation_time', 'update_time'])
+NotificationRow = namedtuple('NotificationRow', ['id', 'name', 'sender_address', 'recipient_address', 'smtp_server',
+                                                 'openstack_url', 'creation_time', 'update_time'])
+
+NOTIFICATION_SORT_KEYS = {
+    'name': ('name', False),
+    'sender_address': ('sender_address', False),
+    'recipient_address': ('recipient_address', False),
+    'creation_time': ('creation_time', False),
+    'update_time': ('update_time', True),
+}
+
+# filter field exposed to the UI -> ORM lookup. Prefix matches (LIKE 'value%') are used instead of icontains so that
+# the predicates can be resolved with the indexes declared on the models
+JOB_SUMMARY_FILTERS = {
+    'name': 'name__istartswith',
+    'schedule_pattern': 'schedule_pattern',
+    'project_id': 'project_id',
+    # through the (instance_id, backup_job) index of BackupJobInstance, which lists the instances of every BackupJob:
+    # the instance_id column is NULL for the BackupJobs of several instances
+    'instance_id': 'backup_job__instances__instance_id',
+    'metadata_key': 'metadata_key',
+    'backup_type': 'backup_type',
+    'notification': 'notification_name__istartswith',
+    'creation_time': 'creation_time__range',
+    'update_time': 'update_time__range',
+}
+
+NOTIFICATION_FILTERS = {
+    'name': 'name__istartswith',
+    'sender_address': 'sender_address__istartswith',
+    'recipient_address': 'recipient_address__istartswith',
+    'smtp_server': 'smtp_server',
+    'creation_time': 'creation_time__range',
+    'update_time': 'update_time__range',
+}
+
+DATE_FORMAT = '%Y-%m-%d'
+DATE_RANGE_SEPARATOR = '..'
+
+
+def parse_date_range(value):
+    """
+    Convert the string typed inside the filter box into a [start, end) pair of aware datetimes.
+    Accepted formats are `YYYY-MM-DD` (that whole day) and `YYYY-MM-DD..YYYY-MM-DD` (both days included)
+
+    :raise ValueError: if the string does not match any of the formats above
+    """
+    first, _sep, last = value.strip().partition(DATE_RANGE_SEPARATOR)
+    start = datetime.strptime(first.strip(), DATE_FORMAT)
+    end = datetime.strptime(last.strip(), DATE_FORMAT) if last else start
+    tz = timezone.get_current_timezone()
+    return timezone.make_aware(start, tz), timezone.make_aware(end + timedelta(days=1) - timedelta.resolution, tz)
+
+
+def apply_filters(qs, filters, allowed_filters):
+    """
+    :param filters: dictionary {filter field: string typed by the user}. Unknown fields and empty values are ignored
+    :param allowed_filters: one of JOB_SUMMARY_FILTERS, NOTIFICATION_FILTERS
+    :return: the filtered QuerySet, or an empty one if a value cannot be parsed
+    """
+    for field, value in (filters or {}).items():
+        lookup = allowed_filters.get(field)
+        if not lookup or not value:
+            continue
+        if lookup.endswith('__range'):
+            try:
+                value = parse_date_range(value)
+            except ValueError as e:
+                logger.warning("Invalid date filter {}={}: {}".format(field, value, e))
+                return qs.none()
+        qs = qs.filter(**{lookup: value})
+    return qs
+
+
+def _after_cursor(sort_field, nullable, value, pk, descending):
+    """
+    Build the keyset predicate selecting the rows that follow (value, pk) in the (sort_field, pk) ordering, where the
+    NULLs of a nullable sort_field come first in ascending order and last in descending order
+    """
+    if descending:
+        if value is None:
+            return Q(**{sort_field + '__isnull': True, 'pk__lt': pk})
+        predicate = Q(**{sort_field + '__lt': value}) | Q(**{sort_field: value, 'pk__lt': pk})
+        if nullable:
+            predicate |= Q(**{sort_field + '__isnull': True})
+        return predicate
+    if value is None:
+        return Q(**{sort_field + '__isnull': True, 'pk__gt': pk}) | Q(**{sort_field + '__isnull': False})
+    return Q(**{sort_field + '__gt': value}) | Q(**{sort_field: value, 'pk__gt': pk})
+
+
+def paginate(qs, sort_keys, sort_key, sort_dir='desc', marker=None, reversed_order=False, page_size=None,
+             row_class=None):
+    """
+    Keyset pagination over (sort field, pk). The marker is the pk of a row: its sort value is read with a single
+    primary-key lookup and then used as cursor, so that the database walks the (sort field, pk) index instead of
+    counting and skipping rows, i.e. page N costs the same as page 1.
+
+    :param sort_keys: one of JOB_SUMMARY_SORT_KEYS, NOTIFICATION_SORT_KEYS
+    :param sort_dir: 'asc' or 'desc'
+    :param marker: pk of the last row of the previous page, or of the first row of the next page if reversed_order
+    :param reversed_order: True when the user navigates backwards (Horizon's prev_marker)
+    :param page_size: defaults to API_RESULT_PAGE_SIZE
+    :param row_class: namedtuple whose first field is the pk, e.g. JobRow: only its columns are read and the
+        objects are tuples instead of model instances
+    :return: tuple (objects, has_more_data, has_prev_data)
+    """
+    page_size = page_size or getattr(settings, 'API_RESULT_PAGE_SIZE', 20)
+    sort_field, nullable = sort_keys[sort_key]
+    # navigating backwards means reading the rows before the marker in the opposite order
+    descending = (sort_dir == 'desc') != reversed_order
+
+    cursor = None
+    if marker:
+        cursor = list(qs.model.objects.filter(pk=marker).values_list(sort_field, flat=True)[:1])
+        if not cursor:
+            logger.warning("Pagination marker {} not found, restarting from the first page".format(marker))
+    if cursor:
+        qs = qs.filter(_after_cursor(sort_field, nullable, cursor[0], marker, descending))
+    elif reversed_order:
+        descending = not descending
+
+    prefix = '-' if descending else ''
+    if nullable:
+        # the NULLs position is explicit, as _after_cursor expects, since its default depends on the database
+        order = F(sort_field).desc(nulls_last=True) if descending else F(sort_field).asc(nulls_first=True)
+        qs = qs.order_by(order, prefix + 'pk')
+    else:
+        qs = qs.order_by(prefix + sort_field, prefix + 'pk')
+
+    if row_class is not None:
+        qs = qs.values_list('pk', *row_class._fields[1:])
+    # one extra row tells whether another page exists, without issuing a COUNT
+    objects = list(qs[:page_size + 1])
+    if row_class is not None:
+        objects = [row_class._make(values) for values in objects]
+    has_extra_row = len(objects) > page_size
+    objects = objects[:page_size]
+
+    if cursor and reversed_order:
+        objects.reverse()
+        return objects, True, has_extra_row
+    return objects, has_extra_row, bool(cursor)
+
+
+def paginate_job_summaries(marker=None, reversed_order=False, page_size=None, filters=None,
+                           sort_key='creation_time', sort_dir='desc', project_id=None, as_rows=False):
+    """
+    The jobs index, paged over the read model: the rows hold everything JobsTable renders, including the last known
+    trigger_state, so a page costs one query. See attach_trigger_status for the check against Mistral
+    :param filters: dictionary {JOB_SUMMARY_FILTERS key: value}
+    :param project_id: scope of the listing, None means all tenants (admin only)
+    :param as_rows: return JobRow tuples instead of BackupJobSummary instances
+    :return: tuple (BackupJobSummary or JobRow list, has_more_data, has_prev_data), see paginate()
+    """
+    qs = BackupJobSummary.objects.all()
+    if project_id is not None:
+        qs = qs.filter(project_id=project_id)
+    qs = apply_filters(qs, filters, JOB_SUMMARY_FILTERS)
+    return paginate(qs, JOB_SUMMARY_SORT_KEYS, sort_key, sort_dir, marker, reversed_order, page_size,
+                    JobRow if as_rows else None)
+
+
+# a JobRow with the next execution time read from Mistral, see attach_trigger_status
+JobStatusRow = namedtuple('JobStatusRow', JobRow._fields + ('next_execution_time', ))
+
+
+def cron_triggers_of_project(project_id):
+    """
+    The cron-triggers of a project, listed with one paged call per CUSTOM_BACKUP_TRIGGER_CACHE_TTL and shared among
+    all the Horizon workers through the Django cache. Concurrent misses are coalesced, see cache.coalesced_get
+    :return: dictionary {trigger name: (trigger id, next execution time)}
+    """
+    def _load():
+        logger.info("Listing cron-triggers of project {}".format(project_id))
+        client = mistral_api.service_client(project_id)
+        return dict((trigger.name, (trigger.id, trigger.next_execution_time))
+                    for trigger in mistral_api.iter_triggers(client))
+
+    ttl = getattr(settings, 'CUSTOM_BACKUP_TRIGGER_CACHE_TTL', constants.DEFAULT_TRIGGER_CACHE_TTL)
+    return coalesced_get(make_key('cron_triggers', project_id), _load, ttl)
+
+
+def attach_trigger_status(rows):
+    """
+    Check the trigger_state of a page of the jobs index against Mistral, with one cached listing per project of the
+    page (see cron_triggers_of_project) joined in memory with the rows on cron_trigger_id, or on the trigger name
+    for the BackupJobs whose trigger id is not known yet. The rows with a change waiting inside the outbox stay
+    pending, and the ones of a project whose triggers cannot be listed keep the trigger_state of the read model.
+    :param rows: JobRow list, see paginate_job_summaries
+    :return: JobStatusRow list
+    """
+    triggers_of = {}
+    for project_id in set(row.project_id for row in rows):
+        try:
+            by_name = cron_triggers_of_project(project_id)
+        except Exception as e:
+            # the jobs index must be rendered even if Mistral is unreachable
+            logger.warning("Unable to list the cron-triggers of project {}: {}".format(project_id, e))
+            continue
+        by_id = dict((trigger_id, next_execution_time) for trigger_id, next_execution_time in by_name.values())
+        triggers_of[project_id] = (by_id, by_name)
+
+    status_rows = []
+    for row in rows:
+        next_execution_time = None
+        if row.project_id in triggers_of and row.trigger_state != constants.TRIGGER_STATE_PENDING:
+            by_id, by_name = triggers_of[row.project_id]
+            if row.cron_trigger_id in by_id:
+                found, next_execution_time = True, by_id[row.cron_trigger_id]
+            else:
+                trigger = by_name.get(constants.NAME_PREFIX.format(row.name))
+                found, next_execution_time = trigger is not None, trigger[1] if trigger else None
+            row = row._replace(trigger_state=constants.TRIGGER_STATE_ACTIVE if found
+                               else constants.TRIGGER_STATE_MISSING)
+        status_rows.append(JobStatusRow(*(row + (next_execution_time, ))))
+    return status_rows
+
+
 def get_backup_job(**kwargs):
+    """
+    cron_trigger_id is indexed, so get_backup_job(cron_trigger_id=..) maps a Mistral trigger back to its BackupJob
+    with one indexed lookup
+    """
     return get_or_none(BackupJob, **kwargs)
 
 
-def list_notifications(as_list=False):
+def _lookup_cache_ttl():
+    return getattr(settings, 'CUSTOM_BACKUP_LOOKUP_CACHE_TTL', constants.DEFAULT_LOOKUP_CACHE_TTL)
+
+
+def cached_backup_job(backup_job_id, project_id=None):
+    """
+    get_backup_job(id=backup_job_id) read through the cache, it is invalidated by every change of the BackupJob,
+    see signals.py. The notification is not part of the cached object, see cached_notification()
+    :param project_id: the project the BackupJob must belong to, None for any (admin only)
+    :return: BackupJob or None
+    """
+    if not backup_job_id:
+        return None
+    backup_job = versioned_get(('backup_job', backup_job_id), [object_scope(BackupJob, backup_job_id)],
+                               lambda: get_backup_job(id=backup_job_id), _lookup_cache_ttl())
+    if backup_job is not None and project_id is not None and backup_job.project_id != project_id:
+        logger.warning("BackupJob {} does not belong to project {}".format(backup_job_id, project_id))
+        return None
+    return backup_job
+
+
+# attribute of the HTTP request holding its identity map, see request_backup_job
+IDENTITY_MAP_ATTR = '_custom_backup_jobs'
+
+
+def request_backup_job(request, backup_job_id=None):
+    """
+    Per-request identity map of the BackupJobs: the update/clone workflows build one action per step, and each of
+    them, as well as handle(), needs the BackupJob of the URL. It is loaded once per request, together with its
+    notification, through the lookup cache (no query when it is warm), and its parsed workflow_input is stored in
+    the parsed_workflow_input attribute, which must be treated as read only. Every caller gets the same instance,
+    so the changes made by handle() are seen by all.
+
+    :param backup_job_id: by default the object_id of the request path, see utils.extract_object_id
+    :return: BackupJob or None, also when it belongs to another project, see utils.request_project_id
+    """
+    backup_job_id = backup_job_id or extract_object_id(request)
+    identity_map = getattr(request, IDENTITY_MAP_ATTR, None)
+    if identity_map is None:
+        identity_map = {}
+        setattr(request, IDENTITY_MAP_ATTR, identity_map)
+    if backup_job_id not in identity_map:
+        backup_job = cached_backup_job(backup_job_id, request_project_id(request, JOBS_TABLE))
+        if backup_job is not None:
+            backup_job.notification = cached_notification(backup_job.notification_id)
+            backup_job.parsed_workflow_input = loads(backup_job.workflow_input)
+        else:
+            logger.error("BackupJob {} does not exist".format(backup_job_id))
+        identity_map[backup_job_id] = backup_job
+    return identity_map[backup_job_id]
+
+
+def backup_jobs_with_workflow_input(workflow_input, project_id=None):
+    """
+    BackupJobs whose input is identical to workflow_input, whatever the order of its keys. It is a lookup on the
+    workflow_input_hash index
+    :param workflow_input: dictionary or its JSON representation
+    :param project_id: restrict the lookup to a project, None for all of them
+    :return: QuerySet
+    """
+    qs = BackupJob.objects.filter(workflow_input_hash=workflow_input_fingerprint(workflow_input))
+    if project_id is not None:
+        qs = qs.filter(project_id=project_id)
+    return qs
+
+
+def backup_jobs_of_instance(instance_id, project_id=None):
+    """
+    BackupJobs backing up an instance, alone or together with other ones: a lookup on the (instance_id, backup_job)
+    index of BackupJobInstance
+    :param project_id: restrict the lookup to a project, None for all of them
+    :return: QuerySet
+    """
+    qs = BackupJob.objects.filter(instances__instance_id=instance_id.strip().lower())
+    if project_id is not None:
+        qs = qs.filter(project_id=project_id)
+    return qs
+
+
+def backup_jobs_of_metadata(key, value=None, project_id=None):
+    """
+    BackupJobs backing up the instances with a metadata key, and value when given: a lookup on the
+    (metadata_key, metadata_value) index
+    :return: QuerySet
+    """
+    qs = backup_jobs_of_project(project_id).filter(metadata_key=key.strip())
+    if value is not None:
+        qs = qs.filter(metadata_value=value.strip())
+    return qs
+
+
+def backup_jobs_of_backup_type(backup_type, cinder_backup=None, project_id=None):
+    """
+    :param backup_type: one of constants.BACKUP_TYPE_CHOICES, e.g. constants.BACKUP_TYPE_FULL
+    :param cinder_backup: True for the Cinder backups, False for the Glance ones, None for both
+    :return: QuerySet
+    """
+    qs = backup_jobs_of_project(project_id).filter(backup_type=backup_type)
+    if cinder_backup is not None:
+        qs = qs.filter(cinder_backup=cinder_backup)
+    return qs
+
+
+def backup_jobs_by_retention(min_backups=None, min_snapshots=None, project_id=None):
+    """
+    BackupJobs keeping at least min_backups backups and/or at least min_snapshots snapshots, e.g.
+    backup_jobs_by_retention(min_snapshots=51) for the ones keeping more than 50 snapshots. Range scans of the
+    max_backups and max_snapshots indexes
+    :return: QuerySet
+    """
+    qs = backup_jobs_of_project(project_id)
+    if min_backups is not None:
+        qs = qs.filter(max_backups__gte=min_backups)
+    if min_snapshots is not None:
+        qs = qs.filter(max_snapshots__gte=min_snapshots)
+    return qs
+
+
+def backup_jobs_by_trigger_ids(cron_trigger_ids):
+    """
+    Bulk version of get_backup_job(cron_trigger_id=..), e.g. for a batch of Mistral execution events
+    :return: dictionary {cron_trigger_id: BackupJob}, the ids without BackupJob are missing
+    """
+    return dict((backup_job.cron_trigger_id, backup_job)
+                for backup_job in BackupJob.objects.filter(cron_trigger_id__in=list(cron_trigger_ids)))
+
+
+def set_cron_trigger_id(backup_job_id, cron_trigger_id):
+    """
+    Record the id of the trigger created by the outbox worker. It is a single UPDATE, so it does not overwrite the
+    changes made to the BackupJob in the meantime; it does nothing if the BackupJob has been deleted
+    """
+    updated = BackupJob.objects.filter(id=backup_job_id).update(cron_trigger_id=cron_trigger_id)
+    BackupJobSummary.objects.filter(backup_job_id=backup_job_id).update(cron_trigger_id=cron_trigger_id)
+    # update() does not send post_save
+    invalidate([object_scope(BackupJob, backup_job_id)])
+    return updated
+
+
+def upcoming_backup_jobs(project_id=None, minutes=None, now=None):
+    """
+    BackupJobs whose next run falls within the next `minutes`, in order of next run: a range scan of the
+    next_run_at index. The rows which advance_next_runs has not moved forward yet are missing
+    :param project_id: restrict the listing to a project, None for all of them
+    :param minutes: CUSTOM_BACKUP_UPCOMING_WINDOW by default
+    :return: QuerySet
+    """
+    if minutes is None:
+        minutes = getattr(settings, 'CUSTOM_BACKUP_UPCOMING_WINDOW', constants.DEFAULT_UPCOMING_WINDOW)
+    now = now or timezone.now()
+    return backup_jobs_of_project(project_id).filter(
+        next_run_at__gt=now, next_run_at__lte=now + timedelta(minutes=minutes)).order_by('next_run_at', 'id')
+
+
+def advance_next_runs(now=None, batch_size=constants.NEXT_RUN_BATCH_SIZE):
+    """
+    Move forward the next_run_at which have passed, walking the next_run_at index up to `now`: the rows not yet
+    due are never read. Every batch is updated with one UPDATE per distinct schedule_pattern; a row whose pattern
+    has changed in the meantime is skipped, save() has already recomputed it.
+    :return: number of BackupJobs advanced
+    """
+    now = now or timezone.now()
+    advanced = 0
+    cursor = None
+    while True:
+        qs = BackupJob.objects.filter(next_run_at__lte=now)
+        if cursor is not None:
+            qs = qs.filter(_after_cursor('next_run_at', False, cursor[0], cursor[1], False))
+        due = list(qs.order_by('next_run_at', 'id').values_list('next_run_at', 'id', 'schedule_pattern')[:batch_size])
+        if not due:
+            return advanced
+        cursor = due[-1][:2]
+        due.sort(key=lambda row: row[2])
+        for pattern, rows in groupby(due, key=lambda row: row[2]):
+            backup_job_ids = [backup_job_id for _at, backup_job_id, _pattern in rows]
+            next_run_at = next_run(pattern, now)
+            advanced += BackupJob.objects.filter(id__in=backup_job_ids, schedule_pattern=pattern,
+                                                 next_run_at__lte=now).update(next_run_at=next_run_at)
+            BackupJobSummary.objects.filter(backup_job_id__in=backup_job_ids, schedule_pattern=pattern,
+                                            next_run_at__lte=now).update(next_run_at=next_run_at)
+
+
+def list_notifications(as_list=False, project_id=None):
+    """
+    :param project_id: when given, only the notifications of that project and the shared ones (i.e. without
+        project) are returned. When None the notifications of all tenants are returned, admin only
+    """
     qs = Notification.objects.all()
+    if project_id is not None:
+        qs = qs.filter(Q(project_id=project_id) | Q(project_id__isnull=True))
     if as_list:
         return list(qs)
     return qs
 
 
-def create_notification(name, sender_address, recipient_address, smtp_server, openstack_url):
+def notification_choices(project_id):
+    """
+    (id, name) of the notifications a project can use, i.e. its own and the shared ones, sorted by name.
+    It is read through the cache and invalidated by every change of the notifications of the project or of the
+    shared ones, see signals.py
+    :return: list of tuples
+    """
+    def load():
+        return list(list_notifications(project_id=project_id).order_by('name').values_list('id', 'name'))
+    return versioned_get(('notification_choices', project_id),
+                         [notifications_scope(project_id), notifications_scope(None)], load, _lookup_cache_ttl())
+
+
+def cached_notification(notification_id, project_id=None, shared=True):
+    """
+    get_notification(id=notification_id) read through the cache, see notification_choices()
+    :param project_id: the notification must belong to the project or be shared, None for any (admin only)
+    :param shared: False when the notification is going to be modified: the shared ones (project_id NULL) are read
+        only, since the BackupJobs of other projects use them
+    :return: Notification or None
+    """
+    if not notification_id:
+        return None
+    notification = versioned_get(('notification', notification_id), [object_scope(Notification, notification_id)],
+                                 lambda: get_notification(id=notification_id), _lookup_cache_ttl())
+    allowed = (project_id, None) if shared else (project_id, )
+    if notification is not None and project_id is not None and notification.project_id not in allowed:
+        logger.warning("Notification {} does not belong to project {}".format(notification_id, project_id))
+        return None
+    return notification
+
+
+def paginate_notifications(marker=None, reversed_order=False, page_size=None, filters=None,
+                           sort_key='creation_time', sort_dir='desc', project_id=None, as_rows=False):
+    """
+    :param filters: dictionary {NOTIFICATION_FILTERS key: value}
+    :param project_id: scope of the listing, see list_notifications()
+    :param as_rows: return NotificationRow tuples instead of Notification instances
+    :return: tuple (notifications, has_more_data, has_prev_data), see paginate()
+    """
+    qs = apply_filters(list_notifications(project_id=project_id), filters, NOTIFICATION_FILTERS)
+    return paginate(qs, NOTIFICATION_SORT_KEYS, sort_key, sort_dir, marker, reversed_order, page_size,
+                    NotificationRow if as_rows else None)
+
+
+def create_notification(name, sender_address, recipient_address, smtp_server, openstack_url, project_id=None):
     try:
         return Notification.objects.create(
             name=name,
             sender_address=sender_address,
             recipient_address=recipient_address,
             smtp_server=smtp_server,
-            openstack_url=openstack_url
+            openstack_url=openstack_url,
+            project_id=project_id
         )
     except IntegrityError as e:
         logger.error(e)
@@ -163,20 +1174,30 @@ def get_notification(**kwargs):
     return get_or_none(Notification, **kwargs)
 
 
-def get_backup_jobs_of_notification(notification_id):
+def get_backup_jobs_of_notification(notification_id, project_id=None):
     """
     An empty queryset is generated to ensure that this method always returns a QuerySet
+    :param project_id: only the BackupJobs of the project, a shared notification is used by several of them
     """
     empty_qs = Notification.objects.none()
     notification_obj = get_notification(id=notification_id)
     if not notification_obj:
         return empty_qs
-    return notification_obj.backupjob_set.all()
+    qs = notification_obj.backupjob_set.all()
+    if project_id is not None:
+        qs = qs.filter(project_id=project_id)
+    return qs
 
 
-def delete_notification(notification_id):
+def delete_notification(notification_id, project_id=None):
+    """
+    :param project_id: the notification must belong to the project, None for any (admin only); the shared ones
+        are read only, see cached_notification
+    """
     from horizon.exceptions import NotFound
     notification_obj = get_notification(id=notification_id)
+    if notification_obj and project_id is not None and notification_obj.project_id != project_id:
+        notification_obj = None
     if not notification_obj:
         raise NotFound("Notification does not exists")
 
@@ -1,12 +1,13 @@
 import logging
-from json import loads as json_loads
 
+from django import shortcuts
 from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import ungettext_lazy
 
-from horizon import tables, exceptions
-from openstack_dashboard.dashboards.custom_backup.db_api import delete_backup_job
+from horizon import tables, exceptions, messages
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+from openstack_dashboard.dashboards.custom_backup.db_api import delete_backup_job, delete_backup_jobs
 
 
 logger = logging.getLogger(__name__)
@@ -36,6 +37,20 @@ class CloneBackupJob(tables.LinkAction):
     icon = "pencil"
 
 
+class ScheduleConflicts(tables.LinkAction):
+    name = "conflicts"
+    verbose_name = _("Schedule Conflicts")
+    url = "horizon:custom_backup:jobs:conflicts"
+    icon = "warning"
+
+
+class UpcomingBackupJobs(tables.LinkAction):
+    name = "upcoming"
+    verbose_name = _("Upcoming BackupJobs")
+    url = "horizon:custom_backup:jobs:upcoming"
+    icon = "clock-o"
+
+
 class DeleteBackupJob(tables.DeleteAction):
     @staticmethod
     def action_present(count):
@@ -57,6 +72,24 @@ class DeleteBackupJob(tables.DeleteAction):
         if not delete_backup_job(request, backup_job_id):
             logger.error("Failed to delete BackupJob {}".format(backup_job_id))
 
+    def handle(self, table, request, obj_ids):
+        """
+        Overrides BatchAction.handle, which calls delete() once per selected row, to delete all the selected
+        BackupJobs at once, see db_api.delete_backup_jobs
+        """
+        report = delete_backup_jobs(request, obj_ids)
+        deleted = [name for name, error in report.values() if error is None]
+        failed = ["{} ({})".format(name or backup_job_id, error)
+                  for backup_job_id, (name, error) in report.items() if error is not None]
+        if deleted:
+            messages.success(request, _("%(action)s: %(objs)s") % {
+                'action': self.action_past(len(deleted)), 'objs': ", ".join(deleted)})
+        if failed:
+            logger.error("Failed to delete BackupJobs: {}".format(", ".join(failed)))
+            messages.error(request, _("Unable to %(action)s: %(objs)s") % {
+                'action': self.action_present(len(failed)).lower(), 'objs': ", ".join(failed)})
+        return shortcuts.redirect(self.get_success_url(request))
+
 
 # todo: NOT USED: REMOVE ?
 def tags_to_string(workflow):
@@ -72,19 +105,36 @@ def cut(workflow, length=50):
         return inputs, False
 
 
+class BackupJobFilterAction(tables.FilterAction):
+    # server side: every filter is translated into an SQL predicate by db_api.apply_filters
+    filter_type = "server"
+    filter_choices = (
+        ('name', _("Name ="), True),
+        ('schedule_pattern', _("Schedule ="), True),
+        ('project_id', _("Project ID ="), True),
+        ('instance_id', _("Instance ID ="), True),
+        ('metadata_key', _("Metadata Key ="), True),
+        ('backup_type', _("Backup Type ="), True),
+        ('notification', _("Notification ="), True),
+        ('creation_time', _("Created (YYYY-MM-DD[..YYYY-MM-DD]) ="), True),
+        ('update_time', _("Modified (YYYY-MM-DD[..YYYY-MM-DD]) ="), True),
+    )
+
+
 class TriggerIdColumn(tables.Column):
+    # the detail url is reversed once per process, with a placeholder in place of the id, see get_link_url
+    ID_PLACEHOLDER = '00000000-0000-0000-0000-000000000000'
+    _detail_url = None
+
     def get_link_url(self, datum):
-        trigger_url = "horizon:custom_backup:jobs:detail"
-        return reverse(trigger_url, args=[datum.id])
+        if TriggerIdColumn._detail_url is None:
+            TriggerIdColumn._detail_url = reverse("horizon:custom_backup:jobs:detail", args=[self.ID_PLACEHOLDER])
+        return TriggerIdColumn._detail_url.replace(self.ID_PLACEHOLDER, datum.id)
 
 
 class JobsTable(tables.DataTable):
-
-    def _workflow_input(datum):
-        # this callable converts the json string to a string of type key1=value1, key2=value2, ...
-        raw_data = getattr(datum, 'workflow_input', '')
-        return ", ".join(["{}={}".format(k,v) for k, v in json_loads(raw_data).items()])
-
+    # the columns only read attributes, so the rows are either BackupJobSummary instances or the db_api.JobRow
+    # tuples of the index page
     id = TriggerIdColumn(
         "id",
         verbose_name=_("ID"),
@@ -95,16 +145,39 @@ class JobsTable(tables.DataTable):
         verbose_name=_("Backup Name")
     )
     workflow_input = tables.Column(
-        _workflow_input,
+        "workflow_input_summary",
         verbose_name=_("Workflow Input"),
     )
     schedule_pattern = tables.Column(
         "schedule_pattern",
         verbose_name=_("Schedule Pattern"),
     )
+    project_id = tables.Column(
+        "project_id",
+        verbose_name=_("Project ID"),
+    )
     cron_trigger_id = tables.Column(
         "cron_trigger_id",
         verbose_name=_('Cron Trigger Id'),
+        empty_value='-',
+    )
+    trigger_state = tables.Column(
+        "trigger_state",
+        verbose_name=_("Trigger Status"),
+        display_choices=constants.TRIGGER_STATE_CHOICES,
+        help_text=_("Read from Mistral, or as of the last change applied to it when Mistral cannot be reached"),
+    )
+    next_execution_time = tables.Column(
+        "next_execution_time",
+        verbose_name=_("Next Execution"),
+        empty_value='-',
+        help_text=_("Read from Mistral"),
+    )
+    next_run_at = tables.Column(
+        "next_run_at",
+        verbose_name=_("Next Run"),
+        empty_value='-',
+        help_text=_("Computed from the schedule pattern"),
     )
     creation_time = tables.Column(
         "creation_time",
@@ -121,9 +194,13 @@ class JobsTable(tables.DataTable):
     class Meta(object):
         name = "jobs"
         verbose_name = _("Jobs")
+        pagination_param = "marker"
+        prev_pagination_param = "prev_marker"
         table_actions = (
-            tables.FilterAction,
+            BackupJobFilterAction,
             CreateBackupJob,
+            ScheduleConflicts,
+            UpcomingBackupJobs,
             DeleteBackupJob
         )
         row_actions = (UpdateBackupJob, CloneBackupJob, DeleteBackupJob)
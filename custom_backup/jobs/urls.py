@@ -17,6 +17,10 @@ from openstack_dashboard.dashboards.custom_backup.jobs import views
 urlpatterns = [
     url(r'^$', views.IndexView.as_view(), name='index'),
     url(r'^create$', views.CreateView.as_view(), name='create'),
+    url(r'^instances$', views.InstanceSearchView.as_view(), name='instances'),
+    url(r'^conflicts$', views.ScheduleConflictsView.as_view(), name='conflicts'),
+    url(r'^upcoming$', views.UpcomingView.as_view(), name='upcoming'),
+    url(r'^stagger$', views.StaggerSuggestionView.as_view(), name='stagger'),
     url(r'^(?P<backup_job_id>[a-z0-9-]{36})/detail$', views.DetailView.as_view(), name='detail'),
     url(r'^(?P<backup_job_id>[a-z0-9-]{36})/update$', views.UpdateView.as_view(), name='update'),
     url(r'^(?P<backup_job_id>[a-z0-9-]{36})/clone$', views.CloneView.as_view(), name='clone'),
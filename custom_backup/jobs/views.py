@@ -1,13 +1,24 @@
 import logging
+from itertools import islice
+from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.core.urlresolvers import reverse_lazy
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
+from django.http import Http404, JsonResponse
 from django.views import generic
 from horizon import exceptions, workflows, tables
+from horizon.utils import functions as utils
 import tables as backup_tables
 import workflows as backup_workflows
+from openstack_dashboard.dashboards.custom_backup import cron
 from openstack_dashboard.dashboards.custom_backup.constants import constants
-from openstack_dashboard.dashboards.custom_backup.db_api import all_backup_jobs, get_backup_job
+from openstack_dashboard.dashboards.custom_backup.db_api import paginate_job_summaries, attach_trigger_status, \
+    request_backup_job, search_instances, find_schedule_conflicts, upcoming_backup_jobs, backup_job_trigger_name, \
+    JOB_SUMMARY_SORT_KEYS
+from openstack_dashboard.dashboards.custom_backup.schedule_load import suggest_schedule
+from openstack_dashboard.dashboards.custom_backup.utils import get_sort_params, get_all_tenants_param, \
+    get_server_filters, get_sort_query
 
 
 logger = logging.getLogger(__name__)
@@ -20,20 +31,82 @@ class BackupJobException(exceptions.HandledException):
 class IndexView(tables.DataTableView):
     table_class = backup_tables.JobsTable
     template_name = 'custom_backup/jobs/index.html'
+    # rendered as server-side sort links above the table, keys must belong to db_api.JOB_SUMMARY_SORT_KEYS
+    sort_choices = (
+        ('name', _("Backup Name")),
+        ('schedule_pattern', _("Schedule Pattern")),
+        ('project_id', _("Project ID")),
+        ('notification', _("Notification")),
+        ('creation_time', _("Creation Time")),
+        ('update_time', _("Modification Time")),
+        ('next_run_at', _("Next Run")),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(IndexView, self).__init__(*args, **kwargs)
+        self._more = False
+        self._prev = False
+        self._sort_key, self._sort_dir = None, None
+        self._all_tenants = False
+
+    def has_more_data(self, table):
+        return self._more
+
+    def has_prev_data(self, table):
+        return self._prev
+
+    def get_filters(self, filters=None, filters_map=None):
+        return get_server_filters(self.request, self.table, filters, filters_map)
 
     def get_data(self):
-        return all_backup_jobs(as_list=True)
+        marker = self.request.GET.get(backup_tables.JobsTable._meta.pagination_param, None)
+        prev_marker = self.request.GET.get(backup_tables.JobsTable._meta.prev_pagination_param, None)
+        reversed_order = prev_marker is not None
+        self._sort_key, self._sort_dir = get_sort_params(self.request, self.table.name, JOB_SUMMARY_SORT_KEYS)
+        self._all_tenants = get_all_tenants_param(self.request, self.table.name)
+        # the rows of the read model hold the trigger_state, checked against one cached Mistral listing per project
+        summaries, self._more, self._prev = paginate_job_summaries(
+            marker=prev_marker if reversed_order else marker,
+            reversed_order=reversed_order,
+            page_size=utils.get_page_size(self.request),
+            filters=self.get_filters(),
+            sort_key=self._sort_key,
+            sort_dir=self._sort_dir,
+            project_id=None if self._all_tenants else self.request.user.tenant_id,
+            as_rows=True
+        )
+        return attach_trigger_status(summaries)
+
+    def get_context_data(self, **kwargs):
+        context = super(IndexView, self).get_context_data(**kwargs)
+        context['sort_choices'] = self.sort_choices
+        context['sort_key'] = self._sort_key
+        context['sort_dir'] = self._sort_dir
+        context['sort_query'] = get_sort_query(self.request, self.table)
+        context['can_list_all_tenants'] = self.request.user.is_superuser
+        context['all_tenants'] = self._all_tenants
+        return context
 
 
 class CreateView(workflows.WorkflowView):
     workflow_class = backup_workflows.CreateBackupJobWorkflow
 
 
-class UpdateView(workflows.WorkflowView):
+class BackupJobWorkflowView(workflows.WorkflowView):
+    """
+    The BackupJob of the URL must belong to the project of the user, see db_api.request_backup_job
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request_backup_job(request, kwargs['backup_job_id']) is None:
+            raise Http404("BackupJob not found")
+        return super(BackupJobWorkflowView, self).dispatch(request, *args, **kwargs)
+
+
+class UpdateView(BackupJobWorkflowView):
     workflow_class = backup_workflows.UpdateBackupJob
 
 
-class CloneView(workflows.WorkflowView):
+class CloneView(BackupJobWorkflowView):
     workflow_class = backup_workflows.CloneBackupJob
 
 
@@ -43,11 +116,106 @@ class DetailView(generic.TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(DetailView, self).get_context_data(**kwargs)
-        backup_job = get_backup_job(id=kwargs['backup_job_id'])
+        backup_job = request_backup_job(self.request, kwargs['backup_job_id'])
+        if backup_job is None:
+            raise Http404("BackupJob not found")
         context['backup_job'] = backup_job
         context['list_url'] = reverse_lazy('horizon:custom_backup:jobs:index')
-        cron_trigger_name = constants.NAME_PREFIX.format(backup_job.name)
+        cron_trigger_name = backup_job_trigger_name(backup_job)
         context['cron_trigger_name'] = cron_trigger_name
         context['cron_trigger_details_url'] = reverse('horizon:mistral:cron_triggers:detail', args=[cron_trigger_name])
         context["custom_breadcrumb"] = ''
+        try:
+            context['next_fire_times'] = cron.next_fires(backup_job.schedule_pattern, timezone.now(),
+                                                         constants.NEXT_FIRE_TIMES_SHOWN)
+        except cron.CronError as e:
+            logger.error("Invalid schedule pattern of {}: {}".format(backup_job, e))
         return context
+
+
+class InstanceSearchView(generic.View):
+    """
+    AJAX endpoint of the instance picker of the BackupJob wizards: GET parameters `q` (part of the name) and
+    `marker` (id of the last instance already loaded), see db_api.search_instances
+    """
+    def get(self, request, *args, **kwargs):
+        try:
+            page = search_instances(request, query=request.GET.get('q', '').strip(),
+                                    marker=request.GET.get('marker') or None)
+        except Exception as e:
+            logger.error("Unable to list instances: {}".format(e))
+            return JsonResponse({'error': _("Unable to retrieve the instances")}, status=503)
+        return JsonResponse({
+            'results': [{'id': instance_id, 'text': name} for instance_id, name in page['instances']],
+            'more': page['more'],
+        })
+
+
+class ScheduleConflictsView(generic.TemplateView):
+    """
+    BackupJobs of the same instance or metadata pair with duplicated or overlapping schedules, in the scope of
+    the jobs index (current project or, for admins, all of them). At most a page of conflicts is shown, the
+    find_schedule_conflicts management command lists all of them
+    """
+    template_name = 'custom_backup/jobs/conflicts.html'
+    page_title = _("Schedule Conflicts")
+
+    def get_context_data(self, **kwargs):
+        context = super(ScheduleConflictsView, self).get_context_data(**kwargs)
+        all_tenants = get_all_tenants_param(self.request, backup_tables.JobsTable._meta.name)
+        page_size = utils.get_page_size(self.request)
+        conflicts = list(islice(
+            find_schedule_conflicts(project_id=None if all_tenants else self.request.user.tenant_id), page_size + 1))
+        context['conflicts'] = conflicts[:page_size]
+        context['truncated'] = len(conflicts) > page_size
+        context['list_url'] = reverse_lazy('horizon:custom_backup:jobs:index')
+        return context
+
+
+class UpcomingView(generic.TemplateView):
+    """
+    BackupJobs running within the next CUSTOM_BACKUP_UPCOMING_WINDOW minutes, in the scope of the jobs index,
+    read from the next_run_at index, see db_api.upcoming_backup_jobs. At most a page of them is shown
+    """
+    template_name = 'custom_backup/jobs/upcoming.html'
+    page_title = _("Upcoming BackupJobs")
+
+    def get_context_data(self, **kwargs):
+        context = super(UpcomingView, self).get_context_data(**kwargs)
+        all_tenants = get_all_tenants_param(self.request, backup_tables.JobsTable._meta.name)
+        page_size = utils.get_page_size(self.request)
+        backup_jobs = list(upcoming_backup_jobs(project_id=None if all_tenants else self.request.user.tenant_id)
+                           [:page_size + 1])
+        context['backup_jobs'] = backup_jobs[:page_size]
+        context['truncated'] = len(backup_jobs) > page_size
+        context['minutes'] = getattr(settings, 'CUSTOM_BACKUP_UPCOMING_WINDOW', constants.DEFAULT_UPCOMING_WINDOW)
+        context['list_url'] = reverse_lazy('horizon:custom_backup:jobs:index')
+        return context
+
+
+class StaggerSuggestionView(generic.View):
+    """
+    AJAX endpoint of the schedule step of the create wizard: GET parameters are the five schedule fields, the
+    response is the nearby schedule with the fewest backups starting together, see schedule_load.suggest_schedule,
+    or an empty object when the schedule cannot be moved
+    """
+    def get(self, request, *args, **kwargs):
+        try:
+            suggestion = suggest_schedule(cron.join_pattern(**dict(
+                (name, request.GET.get(name)) for name in cron.FIELD_NAMES)))
+        except cron.CronError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            logger.error("Unable to suggest a schedule: {}".format(e))
+            return JsonResponse({'error': _("Unable to suggest a schedule")}, status=503)
+        if suggestion is None:
+            return JsonResponse({})
+        fields = cron.split_pattern(suggestion.pattern)
+        return JsonResponse({
+            'pattern': suggestion.pattern,
+            'minute': fields['minute'],
+            'hour': fields['hour'],
+            'offset': suggestion.offset,
+            'peak': suggestion.peak,
+            'requested_peak': suggestion.requested_peak,
+        })
@@ -1,21 +1,81 @@
 import logging
-from json import loads, dumps
+from json import dumps
+from re import match as re_match
+from django.conf import settings
 from django.db import IntegrityError, transaction
 from django.core.urlresolvers import reverse
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from horizon import exceptions, workflows, forms, messages
-from openstack_dashboard.api.nova import server_list as nova_server_list
+from openstack_dashboard.dashboards.custom_backup import cron
 from openstack_dashboard.dashboards.custom_backup.constants import constants
-from openstack_dashboard.dashboards.custom_backup.db_api import create_backup_job, update_cron_trigger, \
-    get_backup_job, list_notifications, get_notification, all_backup_jobs
-from openstack_dashboard.dashboards.custom_backup.utils import cmp_dict, extract_object_id
+from openstack_dashboard.dashboards.custom_backup.db_api import create_backup_job, enqueue_trigger_update, \
+    request_backup_job, notification_choices, cached_notification, backup_job_name_exists, consolidated_triggers, \
+    instance_names
+from openstack_dashboard.dashboards.custom_backup.schedule_load import suggest_schedule
+from openstack_dashboard.dashboards.custom_backup.utils import extract_object_id, workflow_input_fingerprint, \
+    workflow_instances
 
 logger = logging.getLogger(__name__)
 
 
-# cmp_dict function is assigned to variable for expressiveness
-workflow_are_equal = cmp_dict
+def split_schedule_pattern(backup_job):
+    """
+    :return: dictionary {schedule field: expression} of the pattern of a BackupJob, empty if it is not valid
+    """
+    try:
+        return cron.split_pattern(backup_job.schedule_pattern)
+    except cron.CronError as e:
+        logger.error("Invalid schedule pattern of {}: {}".format(backup_job, e))
+        return {}
+
+
+def instances_input(instance_ids):
+    """
+    Workflow input keys of the instances backed up: `instance` alone for a single one, as before; `instances` and
+    `concurrency` for more of them, which a single execution backs up in parallel, CUSTOM_BACKUP_INSTANCE_CONCURRENCY
+    at a time
+    """
+    if len(instance_ids) < 2:
+        return {'instance': instance_ids[0] if instance_ids else None}
+    concurrency = getattr(settings, 'CUSTOM_BACKUP_INSTANCE_CONCURRENCY', constants.DEFAULT_INSTANCE_CONCURRENCY)
+    return {'instance': None, 'instances': list(instance_ids), 'concurrency': min(concurrency, len(instance_ids))}
+
+
+class InstanceIdsField(forms.MultipleChoiceField):
+    """
+    Instances selected in the picker: its options are loaded lazily from jobs:instances (see InstanceSearchView), so
+    the IDs are validated against the instances of `project_id`, the project of the BackupJob, both set with
+    `request` by the action. Cleaned to a sorted list without duplicates
+    """
+    default_error_messages = {
+        'invalid_choice': _("Select the instances of the project from the list"),
+        'too_many': _("Select at most %(max)s instances"),
+    }
+    request = None
+    project_id = None
+
+    def valid_value(self, value):
+        return re_match(r'^[a-z0-9-]{36}$', value) is not None
+
+    def validate(self, value):
+        super(InstanceIdsField, self).validate(value)
+        if self.request is None or not value:
+            return
+        # one lookup for all the submitted instances, see db_api.instance_names
+        names = instance_names(self.request, value, self.project_id)
+        for instance_id in value:
+            if instance_id not in names:
+                raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                                            params={'value': instance_id})
+
+    def clean(self, value):
+        instance_ids = sorted(set(super(InstanceIdsField, self).clean(value)))
+        max_instances = getattr(settings, 'CUSTOM_BACKUP_MAX_INSTANCES_PER_JOB',
+                                constants.DEFAULT_MAX_INSTANCES_PER_JOB)
+        if len(instance_ids) > max_instances:
+            raise forms.ValidationError(self.error_messages['too_many'] % {'max': max_instances})
+        return instance_ids
 
 
 #  TODO: it'd be nice to implement some kind of Model based Workflow.Action, to validate the fields easily
@@ -55,8 +115,8 @@ class NameAction(WorkflowActionBase):
     metadata_key = forms.CharField(max_length=constants.STRING_XXS, required=False)
     metadata_value = forms.CharField(max_length=constants.STRING_XXS, required=False)
     # NOTE: if instance field is renamed this change must also be reflected inside the template, because it's used
-    # to render the select menu
-    instance = forms.ChoiceField(required=False)
+    # to render the select menu. It holds the list of the instances selected
+    instance = InstanceIdsField(required=False)
     # this field is created/used inside template only to address ValidationError rendering: i.e. all validatior
     # error are appended to this field, so that are displayed in the same place.
     # IMPORTANT NOTE: if the name is changed then it also must be updated inside the custom_backup.css file,
@@ -68,21 +128,26 @@ class NameAction(WorkflowActionBase):
 
     # TODO to comment
     def perform_unique_check(self, field_name):
-        qs = all_backup_jobs().filter(**{field_name: self.cleaned_data.get(field_name)})
-        if not self._creation_state:
-            qs = qs.exclude(id=self.current_object_id)
-
-        if qs.exists():
+        exclude_id = None if self._creation_state else self.current_object_id
+        if backup_job_name_exists(self.cleaned_data.get(field_name), exclude_id=exclude_id):
             self.errors['error_field'] = _("Another BackupJob has this name. Please change this field")
 
+    def __init__(self, request, *args, **kwargs):
+        super(NameAction, self).__init__(request, *args, **kwargs)
+        self.fields['instance'].request = request
+        self.fields['instance'].project_id = request.user.tenant_id
+
     def clean(self):
         cleaned_data = super(NameAction, self).clean()
         if not cleaned_data["name"]:
             raise forms.ValidationError({'error_field': _("Name field is required")})
+        if 'instance' not in cleaned_data:
+            # the instances failed the validation of InstanceIdsField, its errors are shown with the other ones
+            raise forms.ValidationError({'error_field': self.errors['instance']})
         if (not cleaned_data["instance"] and not cleaned_data['metadata_value'] and not cleaned_data['metadata_key']) \
                 or (not cleaned_data['instance'] and not (cleaned_data['metadata_key'] and cleaned_data['metadata_value'])):
             raise forms.ValidationError({
-                'error_field': _("Source field is required. Provide a metadata key-value pair or select one instance")
+                'error_field': _("Source field is required. Provide a metadata key-value pair or select the instances")
             })
         elif cleaned_data["instance"] and cleaned_data['metadata_value'] and cleaned_data['metadata_key']:
             raise forms.ValidationError({
@@ -96,20 +161,6 @@ class NameAction(WorkflowActionBase):
         cleaned_data.pop('error_field')
         return cleaned_data
 
-    def __init__(self, request, *args, **kwargs):
-        super(NameAction, self).__init__(request, *args, **kwargs)
-        # server_list, _more_data = nova_server_list(request, search_opts={'all_tenants': True})
-        self.fields['instance'].choices = [
-            ('', ''),
-            (u'43d345e0-fdfb-4639-8b78-cfcbc68846e0', u'cento'),
-            (u'5a8e1eda-3d8b-46f6-aed3-e23a257a41ed', u'aba1b8fe-394f-4732-a876-f54f0d152eb2'),
-            (u'4f21ce60-6925-4841-8855-5742be1fd49b', u'win02'),
-            (u'3807a5a0-3a06-4c20-b3c1-2a2b122660c1', u'Development-Box'),
-            (u'6ef0a200-f0df-4453-9f8c-cc92a3cc9ac0', u'gerrit1'),
-            (u'13f3f6b3-b9a4-46b6-893e-fb6b8193ca71', u'lab-gateway')
-        ]
-
-
 
 class InputAction(workflows.Action):
     stop_instance = forms.BooleanField(required=False)
@@ -160,6 +211,16 @@ class ScheduleAction(workflows.Action):
         choices=tuple([(i, name[:3]) for i, name in constants.WEEKDAY_CHOICES]),
     )
 
+    def clean(self):
+        cleaned_data = super(ScheduleAction, self).clean()
+        try:
+            pattern = cron.join_pattern(**dict((name, cleaned_data.get(name)) for name in cron.FIELD_NAMES))
+        except cron.CronError as e:
+            raise forms.ValidationError(str(e))
+        if cron.next_fire(cron.schedule(pattern), timezone.now()) is None:
+            raise forms.ValidationError(_("The schedule never fires, e.g. February 30th"))
+        return cleaned_data
+
     class Meta(object):
         name = _("Cron schedule")
 
@@ -188,7 +249,7 @@ class CreateBackupNotificationAction(workflows.Action):
 
     def __init__(self, request, *args, **kwargs):
         super(CreateBackupNotificationAction, self).__init__(request, *args, **kwargs)
-        self.fields['notification'].choices = [('', '')] + [(notif.id, notif.name) for notif in list_notifications()]
+        self.fields['notification'].choices = [('', '')] + notification_choices(request.user.tenant_id)
 
     class Meta(object):
         name = _("Notification")
@@ -215,6 +276,21 @@ class CreateBackupJobWorkflow(workflows.Workflow):
     def get_success_url(self):
         return reverse('horizon:custom_backup:jobs:index')
 
+    def _staggered(self, schedule_pattern):
+        """
+        :return: the pattern suggested by schedule_load.suggest_schedule, the requested one if there is none
+        """
+        try:
+            suggestion = suggest_schedule(schedule_pattern)
+        except Exception as e:
+            logger.error("Unable to stagger the schedule {}: {}".format(schedule_pattern, e))
+            return schedule_pattern
+        if suggestion is None or suggestion.pattern == schedule_pattern:
+            return schedule_pattern
+        messages.info(self.request, _("Schedule moved from %(requested)s to %(pattern)s to spread the backups") % {
+            'requested': schedule_pattern, 'pattern': suggestion.pattern})
+        return suggestion.pattern
+
     def _fail_to_create(self):
         msg = _("Unable to create BackupJob")
         messages.error(self.request, msg)
@@ -229,19 +305,14 @@ class CreateBackupJobWorkflow(workflows.Workflow):
         if not self.is_valid():
             return False
 
-        schedule_pattern = "{} {} {} {} {}".format(
-            context['minute'] or '*',
-            context['hour'] or '*',
-            context['day'] or '*',
-            context['month'] or '*',
-            context['weekday'] or '*',
-        )
+        schedule_pattern = cron.join_pattern(**dict((name, context[name]) for name in cron.FIELD_NAMES))
+        if getattr(settings, 'CUSTOM_BACKUP_STAGGER_AUTO_APPLY', constants.DEFAULT_STAGGER_AUTO_APPLY):
+            schedule_pattern = self._staggered(schedule_pattern)
 
         workflow_input = {
             'instance_pause': context['pause_instance'],
             'instance_stop': context['stop_instance'],
             'pattern': "{0}_backup_{1}",
-            'instance': context['instance'] or None,
             'only_os': False,
             'cinder_backup': context['backup_mode'],
             'max_snapshots': context['max_snapshots'],
@@ -253,6 +324,7 @@ class CreateBackupJobWorkflow(workflows.Workflow):
                 'value': context['metadata_value']
                 } if context['metadata_key'] else None
         }
+        workflow_input.update(instances_input(context['instance']))
 
         try:
             new_backup = create_backup_job(
@@ -261,7 +333,7 @@ class CreateBackupJobWorkflow(workflows.Workflow):
                 workflow_input=workflow_input,
                 schedule_pattern=schedule_pattern,
                 tenant_id=self.request.user.tenant_id,
-                notification=get_notification(id=context.get('notification'))
+                notification=cached_notification(context.get('notification'), self.request.user.tenant_id)
             )
         except (IntegrityError, ValueError) as e:
             logger.error(e)
@@ -275,12 +347,19 @@ class UpdateNameAction(NameAction):
 
     def __init__(self, request, context, *args, **kwargs):
         super(UpdateNameAction, self).__init__(request, context, *args, **kwargs)
-        current_backup = get_backup_job(id=extract_object_id(request))
+        current_backup = request_backup_job(request)
         if not current_backup:
             raise exceptions.NotAvailable("Object not found")
         self.fields['name'].initial = current_backup.name
-        workflow_input = loads(current_backup.workflow_input)
-        self.fields['instance'].initial = workflow_input.get('instance')
+        workflow_input = current_backup.parsed_workflow_input
+        self.fields['instance'].initial = workflow_instances(workflow_input)
+        # an admin may edit the BackupJob of another project
+        self.fields['instance'].project_id = current_backup.project_id
+        if self.fields['instance'].initial:
+            # labels of the options already selected, the picker loads the others
+            names = instance_names(request, self.fields['instance'].initial, current_backup.project_id)
+            self.fields['instance'].choices = [(instance_id, names.get(instance_id, instance_id))
+                                               for instance_id in self.fields['instance'].initial]
         metadata = workflow_input.get('metadata')
         self.fields['metadata_key'].initial = metadata['key'] if metadata else ''
         self.fields['metadata_value'].initial = metadata['value'] if metadata else ''
@@ -297,10 +376,10 @@ class UpdateInputAction(InputAction):
 
     def __init__(self, request, context, *args, **kwargs):
         super(UpdateInputAction, self).__init__(request, context, *args, **kwargs)
-        current_backup = get_backup_job(id=extract_object_id(request))
+        current_backup = request_backup_job(request)
         if not current_backup:
             raise exceptions.NotAvailable("Object not found")
-        workflow_input = loads(current_backup.workflow_input)
+        workflow_input = current_backup.parsed_workflow_input
         self.fields['stop_instance'].initial = workflow_input['instance_stop']
         self.fields['pause_instance'].initial = workflow_input['instance_pause']
         self.fields['max_snapshots'].initial = int(workflow_input['max_snapshots']) if workflow_input['max_snapshots'] else 0
@@ -321,17 +400,13 @@ class UpdateScheduleAction(ScheduleAction):
     """"""
     def __init__(self, request, context, *args, **kwargs):
         super(UpdateScheduleAction, self).__init__(request, context, *args, **kwargs)
-        current_backup = get_backup_job(id=extract_object_id(request))
+        current_backup = request_backup_job(request)
         if not current_backup:
             # TODO to improve
             raise exceptions.NotAvailable("Object not found")
 
-        pattern_array = current_backup.schedule_pattern.split(' ')
-        self.fields['minute'].initial = pattern_array[0]
-        self.fields['hour'].initial = pattern_array[1]
-        self.fields['day'].initial = pattern_array[2]
-        self.fields['month'].initial = pattern_array[3]
-        self.fields['weekday'].initial = pattern_array[4]
+        for name, expr in split_schedule_pattern(current_backup).items():
+            self.fields[name].initial = expr
 
 
 class UpdateBackupScheduleStep(workflows.Step):
@@ -341,14 +416,15 @@ class UpdateBackupScheduleStep(workflows.Step):
 
 
 class UpdateBackupNotificationAction(workflows.Action):
-    notification = forms.CharField(max_length=constants.UUID_MAX_LEN, required=False)
+    # only the notifications of the project of the BackupJob, and the shared ones, are valid choices
+    notification = forms.ChoiceField(required=False)
 
     def __init__(self, request, *args, **kwargs):
         super(UpdateBackupNotificationAction, self).__init__(request, *args, **kwargs)
-        current_backup = get_backup_job(id=extract_object_id(request))
+        current_backup = request_backup_job(request)
         if not current_backup:
             raise exceptions.NotAvailable("Object not found")
-        self.fields['notification'].choices = [('', '')] + [(notif.id, notif.name) for notif in list_notifications()]
+        self.fields['notification'].choices = [('', '')] + notification_choices(current_backup.project_id)
         self.fields['notification'].initial = current_backup.notification.id if current_backup.notification else ''
 
     class Meta(object):
@@ -376,12 +452,7 @@ class UpdateBackupJob(workflows.Workflow):
     def get_initial(self):
         initial = dict()
         obj = self.context['current_backup_job']
-        schedule_pattern_array = obj.schedule_pattern.split(' ')
-        initial['minute'] = schedule_pattern_array[0]
-        initial['hour'] = schedule_pattern_array[1]
-        initial['day'] = schedule_pattern_array[2]
-        initial['month'] = schedule_pattern_array[3]
-        initial['weekday'] = schedule_pattern_array[4]
+        initial.update(split_schedule_pattern(obj))
         initial['workflow_input'] = obj.workflow_input
         initial['name'] = obj.name
         return initial
@@ -391,15 +462,12 @@ class UpdateBackupJob(workflows.Workflow):
 
     @transaction.atomic
     def handle(self, request, context):
-        current_backup_job = get_backup_job(id=extract_object_id(request))
-        new_schedule_pattern = "{} {} {} {} {}".format(
-            context['minute'], context['hour'], context['day'], context['month'], context['weekday'],
-        )
+        current_backup_job = request_backup_job(request)
+        new_schedule_pattern = cron.join_pattern(**dict((name, context[name]) for name in cron.FIELD_NAMES))
         new_workflow_input = {
             'instance_pause': context['pause_instance'],
             'instance_stop': context['stop_instance'],
             'pattern': "{0}_backup_{1}",
-            'instance': context['instance'] or None,
             'only_os': False,
             'cinder_backup': context['backup_mode'],
             'max_snapshots': context['max_snapshots'],
@@ -411,29 +479,39 @@ class UpdateBackupJob(workflows.Workflow):
                 'value': context['metadata_value']
                 } if context['metadata_key'] else None
         }
+        new_workflow_input.update(instances_input(context['instance']))
 
-        changed_data = current_backup_job.schedule_pattern != new_schedule_pattern
-        changed_data = changed_data or not workflow_are_equal(loads(current_backup_job.workflow_input), new_workflow_input)
-        changed_data = changed_data or current_backup_job.name != context.get('name')
         # if notification is not selected then it will be equal to the empty string and thus notification_value will
         # get the None value
         notification_value = context.get('notification') or None
-        changed_data = changed_data or (current_backup_job.notification != notification_value)
-        if not changed_data:
+        new_hash = workflow_input_fingerprint(new_workflow_input)
+        changed_fields = [field for field, changed in (
+            ('schedule_pattern', current_backup_job.schedule_pattern != new_schedule_pattern),
+            ('workflow_input', current_backup_job.workflow_input_hash != new_hash),
+            ('name', current_backup_job.name != context.get('name')),
+            ('notification', current_backup_job.notification_id != notification_value),
+        ) if changed]
+        if not changed_fields:
             return True
+        changed_trigger = changed_fields != ['notification']
 
-        new_trigger = update_cron_trigger(request=self.request,
-                                          current_backup_job=current_backup_job,
-                                          new_name=context.get('name'),
-                                          schedule_pattern=new_schedule_pattern,
-                                          workflow_input=new_workflow_input)
-        setattr(current_backup_job, 'cron_trigger_id', new_trigger.id)
+        old_name, old_schedule_pattern = current_backup_job.name, current_backup_job.schedule_pattern
+        was_shared = current_backup_job.shared_trigger
+        if changed_trigger:
+            current_backup_job.shared_trigger = consolidated_triggers()
+            changed_fields.append('shared_trigger')
         current_backup_job.workflow_input = dumps(new_workflow_input)
         current_backup_job.schedule_pattern = new_schedule_pattern
         current_backup_job.name = context.get('name')
-        current_backup_job.notification = get_notification(id=context.get('notification'))
+        current_backup_job.notification = cached_notification(context.get('notification'),
+                                                              current_backup_job.project_id)
         current_backup_job.update_time = timezone.now()
-        current_backup_job.save()
+        # a single UPDATE of the columns changed, the others keep the values concurrent edits may have written
+        current_backup_job.save(update_fields=changed_fields + ['update_time'])
+        # the cron-trigger is replaced by the outbox worker, only if the update affects it
+        if changed_trigger:
+            enqueue_trigger_update(current_backup_job, old_name, old_schedule_pattern, was_shared,
+                                   input_changed='workflow_input' in changed_fields)
         return True
 
 
@@ -442,14 +520,13 @@ class CloneBackupJobNameAction(WorkflowActionBase):
 
     def __init__(self, request, *args, **kwargs):
         super(CloneBackupJobNameAction, self).__init__(request, *args, **kwargs)
-        current_backup = get_backup_job(id=extract_object_id(request))
+        current_backup = request_backup_job(request)
         if not current_backup:
             raise exceptions.NotAvailable("Object not found")
         self.fields['name'].initial = constants.BACKUP_CLONE_DEFAULT_NAME_PATTERN.format(current_backup.name)
 
     def perform_unique_check(self, field_name):
-        qs = all_backup_jobs().filter(**{field_name: self.cleaned_data.get(field_name)})
-        if qs.exists():
+        if backup_job_name_exists(self.cleaned_data.get(field_name)):
             self.errors['error_field'] = _("Another BackupJob has this name. Please change this field")
 
 
@@ -475,15 +552,15 @@ class CloneBackupJob(workflows.Workflow):
         if not self.is_valid():
             return False
 
-        current_backup = get_backup_job(id=extract_object_id(request))
+        current_backup = request_backup_job(request)
         try:
             new_backup = create_backup_job(
                 request=request,
                 name=context.get('name'),
-                workflow_input=loads(current_backup.workflow_input),
+                workflow_input=current_backup.parsed_workflow_input,
                 schedule_pattern=current_backup.schedule_pattern,
                 tenant_id=self.request.user.tenant_id,
-                notification=current_backup.notification
+                notification=cached_notification(current_backup.notification_id, self.request.user.tenant_id)
             )
         except (IntegrityError, ValueError) as e:
             logger.error(e)
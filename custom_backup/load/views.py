@@ -0,0 +1,66 @@
+import logging
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from django.views import generic
+from openstack_dashboard.dashboards.custom_backup.schedule_load import load_profile
+from openstack_dashboard.dashboards.custom_backup.utils import get_all_tenants_param
+
+
+logger = logging.getLogger(__name__)
+
+
+# (key, label, days) of the periods; a day is shown minute by minute, a week hour by hour
+PERIODS = (
+    ('day', _("Next 24 hours"), 1),
+    ('week', _("Next 7 days"), 7),
+)
+# the scope is the one of the jobs index, i.e. the all_tenants parameter of the jobs table
+SCOPE_TABLE = 'jobs'
+# number of color steps of the heat map, see custom_backup.css
+HEAT_LEVELS = 5
+
+
+def heat_level(value, peak):
+    return 0 if not value else 1 + (HEAT_LEVELS - 2) * value // peak
+
+
+class IndexView(generic.TemplateView):
+    """
+    Heat map of the BackupJobs firing at each minute of the next day or week, to spot the minutes at which too
+    many backups start at once. The next 24 hours are shown as hours x minutes, the next 7 days as days x hours,
+    where every cell is the busiest minute of its hour
+    """
+    template_name = 'custom_backup/load/index.html'
+    page_title = _("Schedule Load")
+
+    def get_context_data(self, **kwargs):
+        context = super(IndexView, self).get_context_data(**kwargs)
+        period = self.request.GET.get('period')
+        period, _label, days = next((p for p in PERIODS if p[0] == period), PERIODS[0])
+        all_tenants = get_all_tenants_param(self.request, SCOPE_TABLE)
+        # the cron-triggers fire in UTC
+        start = timezone.now().replace(tzinfo=None) + timedelta(minutes=1)
+        profile = load_profile(start, days * 24 * 60, project_id=None if all_tenants else self.request.user.tenant_id)
+
+        # the histogram starts at `start`, not at the top of an hour nor at midnight: the rows and the columns are
+        # labelled with the times they begin at
+        if days == 1:
+            cells = profile.histogram.reshape(24, 60)
+            rows = [(start + timedelta(hours=hour)).strftime('%H:%M') for hour in range(24)]
+            columns = [(start + timedelta(minutes=minute)).strftime(':%M') for minute in range(60)]
+        else:
+            cells = profile.histogram.reshape(days, 24, 60).max(axis=2)
+            rows = [(start + timedelta(days=day)).strftime('%a %d') for day in range(days)]
+            columns = [(start + timedelta(hours=hour)).strftime('%H:%M') for hour in range(24)]
+        context['heat_map'] = [
+            (label, [(int(value), heat_level(int(value), profile.peak)) for value in row])
+            for label, row in zip(rows, cells)
+        ]
+        context['columns'] = columns
+        context['profile'] = profile
+        context['periods'] = [(key, label) for key, label, _days in PERIODS]
+        context['period'] = period
+        context['can_list_all_tenants'] = self.request.user.is_superuser
+        context['all_tenants'] = all_tenants
+        return context
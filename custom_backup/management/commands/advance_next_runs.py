@@ -0,0 +1,23 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from openstack_dashboard.dashboards.custom_backup.db_api import advance_next_runs
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Move forward the next run of the BackupJobs whose next run has passed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep advancing the next runs every INTERVAL seconds, instead of once")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            self.stdout.write("Advanced {} BackupJobs".format(advance_next_runs()))
+            if interval <= 0:
+                return
+            time.sleep(interval)
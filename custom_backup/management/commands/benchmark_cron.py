@@ -0,0 +1,59 @@
+import logging
+import timeit
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from openstack_dashboard.dashboards.custom_backup import cron
+
+
+logger = logging.getLogger(__name__)
+
+
+# from frequent to rare, the last one fires once every four years
+PATTERNS = ('*/15 * * * *', '0 2 * * *', '30 3 * * 1-5', '0 0 1 */3 *', '0 0 13 * 5', '0 12 29 2 *')
+
+
+def naive_next_fire(compiled, after):
+    """
+    Reference implementation: test one minute after the other
+    """
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    end = datetime(moment.year + cron.SEARCH_YEARS + 1, 1, 1, tzinfo=moment.tzinfo)
+    while moment < end:
+        if cron.fires_on(compiled, moment.date()) and compiled.hours & (1 << moment.hour) and \
+                compiled.minutes & (1 << moment.minute):
+            return moment
+        moment += timedelta(minutes=1)
+    return None
+
+
+def naive_next_fires(pattern, after, count):
+    compiled = cron.compile_pattern(pattern)
+    fires = []
+    while len(fires) < count:
+        after = naive_next_fire(compiled, after)
+        if after is None:
+            break
+        fires.append(after)
+    return fires
+
+
+class Command(BaseCommand):
+    help = "Compare the time cron.next_fires takes against a minute by minute scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10, help="Fire times computed per pattern")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per pattern, the best one is reported")
+
+    def handle(self, *args, **options):
+        after = datetime(2026, 1, 1)
+        count, repeat = options['count'], options['repeat']
+        self.stdout.write("{:<16} {:>12} {:>12} {:>8}".format("pattern", "compiled ms", "naive ms", "speedup"))
+        for pattern in PATTERNS:
+            expected = cron.next_fires(pattern, after, count)
+            if naive_next_fires(pattern, after, count) != expected:
+                self.stderr.write("Different fire times for {}".format(pattern))
+                continue
+            compiled = min(timeit.repeat(lambda: cron.next_fires(pattern, after, count), number=1, repeat=repeat))
+            naive = min(timeit.repeat(lambda: naive_next_fires(pattern, after, count), number=1, repeat=repeat))
+            self.stdout.write("{:<16} {:>12.3f} {:>12.1f} {:>7.0f}x".format(
+                pattern, compiled * 1000, naive * 1000, naive / compiled))
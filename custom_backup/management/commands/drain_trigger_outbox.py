@@ -0,0 +1,29 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from openstack_dashboard.dashboards.custom_backup import mistral_api, outbox
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Apply to Mistral the cron-trigger changes recorded inside the trigger outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep draining the outbox every INTERVAL seconds, instead of draining it once")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            applied = outbox.drain()
+            if applied is not None:
+                self.stdout.write("Applied {} trigger operations".format(applied))
+            for host, stats in sorted(mistral_api.guard_stats().items()):
+                if stats['state'] != mistral_api.CircuitBreaker.CLOSED or stats['rejected']:
+                    self.stderr.write("Mistral {}: circuit {state}, {failures} failures, {rejected} calls rejected"
+                                      .format(host, **stats))
+            if interval <= 0:
+                return
+            time.sleep(interval)
@@ -0,0 +1,29 @@
+import logging
+from django.core.management.base import BaseCommand
+from openstack_dashboard.dashboards.custom_backup.db_api import find_schedule_conflicts
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Report the BackupJobs backing up the same source with duplicated or overlapping schedules"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', default=None,
+                            help="Search a single project, instead of all of them")
+        parser.add_argument('--window', type=int, default=None,
+                            help="Minutes within which two fire times overlap (CUSTOM_BACKUP_OVERLAP_WINDOW)")
+        parser.add_argument('--horizon-days', type=int, default=None,
+                            help="Days, from today, the fire times are compared on "
+                                 "(CUSTOM_BACKUP_OVERLAP_HORIZON_DAYS)")
+
+    def handle(self, *args, **options):
+        found = 0
+        for conflict in find_schedule_conflicts(project_id=options['project'], window=options['window'],
+                                                horizon_days=options['horizon_days']):
+            found += 1
+            self.stdout.write("{}: {} [{}] {}".format(
+                conflict.kind, conflict.source_key, ' | '.join(conflict.schedule_patterns),
+                ', '.join('{} ({})'.format(job.name, job.id) for job in conflict.backup_jobs)))
+        self.stdout.write("Found {} schedule conflicts".format(found))
@@ -0,0 +1,45 @@
+import logging
+from django.core.management.base import BaseCommand
+from openstack_dashboard.dashboards.custom_backup import mistral_api, outbox
+from openstack_dashboard.dashboards.custom_backup.db_api import index_triggers, find_drifts, repair_drifts
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Find and repair the differences between the BackupJobs and their Mistral cron-triggers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', default=False,
+                            help="Only print the differences, without repairing them")
+        parser.add_argument('--project', default=None,
+                            help="Reconcile a single project, instead of all of them (requires the admin role)")
+        parser.add_argument('--page-size', type=int, default=1000,
+                            help="Number of cron-triggers fetched from Mistral per request")
+        parser.add_argument('--no-drain', action='store_true', default=False,
+                            help="Only enqueue the repairs, leaving them to drain_trigger_outbox")
+
+    def _print(self, drifts):
+        for drift in drifts:
+            self.stdout.write("{}: BackupJob {} trigger {}".format(
+                drift.kind, drift.backup_job.id if drift.backup_job else '-', drift.trigger_name or '-'))
+            yield drift
+
+    def handle(self, *args, **options):
+        project_id = options['project']
+        client = mistral_api.service_client(project_id)
+        trigger_index = index_triggers(
+            mistral_api.iter_triggers(client, page_size=options['page_size'], all_projects=project_id is None)
+        )
+        self.stdout.write("Fetched {} cron-triggers".format(len(trigger_index)))
+        drifts = self._print(find_drifts(trigger_index, project_id=project_id))
+
+        if options['dry_run']:
+            self.stdout.write("Found {} differences".format(sum(1 for _drift in drifts)))
+            return
+        counts = repair_drifts(drifts)
+        self.stdout.write(", ".join("{} {}".format(count, kind) for kind, count in counts.items()))
+        if not options['no_drain']:
+            while outbox.drain():
+                pass
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 10:37
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupJob',
+            fields=[
+                ('id', models.CharField(max_length=36, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('schedule_pattern', models.CharField(max_length=100)),
+                ('workflow_input', models.TextField()),
+                ('creation_time', models.DateTimeField(auto_now_add=True)),
+                ('update_time', models.DateTimeField(null=True)),
+                ('cron_trigger_id', models.CharField(max_length=36)),
+                ('enabled', models.BooleanField(default=True)),
+                ('project_id', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.CharField(max_length=36, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('sender_address', models.EmailField(max_length=200)),
+                ('recipient_address', models.EmailField(max_length=200)),
+                ('smtp_server', models.GenericIPAddressField(null=True)),
+                ('openstack_url', models.URLField()),
+                ('creation_time', models.DateTimeField(auto_now_add=True)),
+                ('update_time', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='notification',
+            unique_together=set([('name', 'sender_address', 'recipient_address')]),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='notification',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='custom_backup.Notification'),
+        ),
+    ]
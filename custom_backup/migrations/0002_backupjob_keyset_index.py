@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 10:37
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['creation_time', 'id'], name='backupjob_created_id_idx'),
+        ),
+    ]
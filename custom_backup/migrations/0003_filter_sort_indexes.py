@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 10:38
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0002_backupjob_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['update_time', 'id'], name='backupjob_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['schedule_pattern', 'id'], name='backupjob_schedule_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'creation_time', 'id'], name='backupjob_proj_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['creation_time', 'id'], name='notif_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['update_time', 'id'], name='notif_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['sender_address', 'id'], name='notif_sender_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient_address', 'id'], name='notif_recipient_id_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 10:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_project_id(apps, schema_editor):
+    # a Notification takes the project of its BackupJobs; the ones used by several projects, or by none, stay
+    # shared (project_id NULL), which every project can read but none can modify
+    Notification = apps.get_model('custom_backup', 'Notification')
+    BackupJob = apps.get_model('custom_backup', 'BackupJob')
+    projects = {}
+    for notification_id, project_id in BackupJob.objects.exclude(notification=None).exclude(project_id=None) \
+            .values_list('notification_id', 'project_id').distinct().iterator():
+        projects.setdefault(notification_id, set()).add(project_id)
+    for notification_id, project_ids in projects.items():
+        if len(project_ids) == 1:
+            Notification.objects.filter(id=notification_id).update(project_id=project_ids.pop())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0003_filter_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='project_id',
+            field=models.CharField(max_length=32, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'update_time', 'id'], name='backupjob_proj_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'schedule_pattern', 'id'], name='backupjob_proj_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'name'], name='backupjob_proj_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'notification'], name='backupjob_proj_notif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'enabled'], name='backupjob_proj_enabled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['project_id', 'creation_time', 'id'], name='notif_proj_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['project_id', 'name'], name='notif_proj_name_idx'),
+        ),
+        migrations.RunPython(fill_project_id, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 10:43
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0004_project_scope'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TriggerOperation',
+            fields=[
+                ('id', models.CharField(max_length=36, primary_key=True, serialize=False)),
+                ('backup_job_id', models.CharField(max_length=36)),
+                ('project_id', models.CharField(max_length=32)),
+                ('operation', models.CharField(choices=[('create', 'create'), ('delete', 'delete'), ('replace', 'replace')], max_length=10)),
+                ('trigger_name', models.CharField(max_length=400)),
+                ('old_trigger_name', models.CharField(max_length=400, null=True)),
+                ('workflow_input', models.TextField(null=True)),
+                ('schedule_pattern', models.CharField(max_length=100, null=True)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_time', models.DateTimeField()),
+                ('last_error', models.TextField(null=True)),
+                ('creation_time', models.DateTimeField(auto_now_add=True)),
+                ('update_time', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='triggeroperation',
+            index=models.Index(fields=['status', 'creation_time', 'id'], name='trigop_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='triggeroperation',
+            index=models.Index(fields=['backup_job_id', 'status'], name='trigop_job_status_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 10:46
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# value stored by db_api.create_backup_job while the trigger creation was disabled
+PLACEHOLDER_TRIGGER_ID = '43d345e0-fdfb-4639-8b78-cfcbc68846e0'
+
+
+def clear_placeholder(apps, schema_editor):
+    BackupJob = apps.get_model('custom_backup', 'BackupJob')
+    BackupJob.objects.filter(cron_trigger_id__in=[PLACEHOLDER_TRIGGER_ID, '']).update(cron_trigger_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0005_trigger_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backupjob',
+            name='cron_trigger_id',
+            field=models.CharField(db_index=True, max_length=36, null=True),
+        ),
+        migrations.RunPython(clear_placeholder, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 10:57
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from openstack_dashboard.dashboards.custom_backup.utils import canonical_json, workflow_input_fingerprint
+
+
+def fill_workflow_input_hash(apps, schema_editor):
+    # the historical model does not run BackupJob.save(), so the canonical input and its digest are written here
+    BackupJob = apps.get_model('custom_backup', 'BackupJob')
+    for backup_job_id, workflow_input in BackupJob.objects.values_list('id', 'workflow_input').iterator():
+        try:
+            workflow_input = canonical_json(workflow_input)
+        except ValueError:
+            pass
+        BackupJob.objects.filter(id=backup_job_id).update(
+            workflow_input=workflow_input, workflow_input_hash=workflow_input_fingerprint(workflow_input))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0006_cron_trigger_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupjob',
+            name='workflow_input_hash',
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'workflow_input_hash'], name='backupjob_proj_input_idx'),
+        ),
+        migrations.RunPython(fill_workflow_input_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 10:59
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from openstack_dashboard.dashboards.custom_backup.utils import workflow_source_key
+
+
+def fill_source_key(apps, schema_editor):
+    # the historical model does not run BackupJob.save()
+    BackupJob = apps.get_model('custom_backup', 'BackupJob')
+    for backup_job_id, workflow_input in BackupJob.objects.values_list('id', 'workflow_input').iterator():
+        BackupJob.objects.filter(id=backup_job_id).update(source_key=workflow_source_key(workflow_input))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0007_workflow_input_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupjob',
+            name='source_key',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['source_key', 'schedule_pattern'], name='backupjob_source_sched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'source_key', 'schedule_pattern'],
+                               name='backupjob_proj_source_idx'),
+        ),
+        migrations.RunPython(fill_source_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:09
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.utils import timezone
+from openstack_dashboard.dashboards.custom_backup.models.backup_job import next_run
+
+
+def fill_next_run_at(apps, schema_editor):
+    # the historical model does not run BackupJob.save(); one UPDATE per distinct pattern
+    BackupJob = apps.get_model('custom_backup', 'BackupJob')
+    now = timezone.now()
+    patterns = BackupJob.objects.order_by().values_list('schedule_pattern', flat=True).distinct()
+    for pattern in list(patterns):
+        BackupJob.objects.filter(schedule_pattern=pattern).update(next_run_at=next_run(pattern, now))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0008_source_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupjob',
+            name='next_run_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['next_run_at', 'id'], name='backupjob_next_run_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'next_run_at', 'id'], name='backupjob_proj_next_run_idx'),
+        ),
+        migrations.RunPython(fill_next_run_at, migrations.RunPython.noop),
+    ]
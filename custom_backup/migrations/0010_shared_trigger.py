@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:11
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0009_next_run_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupjob',
+            name='shared_trigger',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='triggeroperation',
+            name='operation',
+            field=models.CharField(choices=[('create', 'create'), ('delete', 'delete'), ('replace', 'replace'), ('sync', 'sync')], max_length=10),
+        ),
+    ]
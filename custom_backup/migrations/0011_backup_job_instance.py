@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:13
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from openstack_dashboard.dashboards.custom_backup.utils import workflow_instances
+
+
+def fill_instances(apps, schema_editor):
+    # the historical model does not run BackupJob.save()
+    BackupJob = apps.get_model('custom_backup', 'BackupJob')
+    BackupJobInstance = apps.get_model('custom_backup', 'BackupJobInstance')
+    rows = []
+    for backup_job_id, workflow_input in BackupJob.objects.values_list('id', 'workflow_input').iterator():
+        rows.extend(BackupJobInstance(backup_job_id=backup_job_id, instance_id=instance_id)
+                    for instance_id in workflow_instances(workflow_input))
+        if len(rows) >= 500:
+            BackupJobInstance.objects.bulk_create(rows)
+            rows = []
+    BackupJobInstance.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0010_shared_trigger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupJobInstance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('instance_id', models.CharField(max_length=36)),
+                ('backup_job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='instances', to='custom_backup.BackupJob')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='backupjobinstance',
+            unique_together=set([('instance_id', 'backup_job')]),
+        ),
+        migrations.RunPython(fill_instances, migrations.RunPython.noop),
+    ]
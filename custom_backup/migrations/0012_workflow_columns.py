@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:14
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from openstack_dashboard.dashboards.custom_backup.utils import workflow_columns
+
+CHUNK_SIZE = 500
+
+
+def fill_workflow_columns(apps, schema_editor):
+    # the historical model does not run BackupJob.save(). The rows are read CHUNK_SIZE at a time following the
+    # primary key, so that neither the memory used nor a single statement grows with the table
+    BackupJob = apps.get_model('custom_backup', 'BackupJob')
+    last_id = ''
+    while True:
+        chunk = list(BackupJob.objects.filter(id__gt=last_id).order_by('id')
+                     .values_list('id', 'workflow_input')[:CHUNK_SIZE])
+        if not chunk:
+            return
+        for backup_job_id, workflow_input in chunk:
+            BackupJob.objects.filter(id=backup_job_id).update(**workflow_columns(workflow_input))
+        last_id = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0011_backup_job_instance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupjob',
+            name='backup_type',
+            field=models.CharField(max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='cinder_backup',
+            field=models.NullBooleanField(),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='instance_id',
+            field=models.CharField(max_length=36, null=True),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='max_backups',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='max_snapshots',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='metadata_key',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='metadata_value',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        # before the indexes, which are then built once
+        migrations.RunPython(fill_workflow_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['instance_id'], name='backupjob_instance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'instance_id'], name='backupjob_proj_instance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['metadata_key', 'metadata_value'], name='backupjob_metadata_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'metadata_key', 'metadata_value'],
+                               name='backupjob_proj_metadata_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['backup_type', 'cinder_backup'], name='backupjob_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['project_id', 'backup_type', 'cinder_backup'], name='backupjob_proj_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['max_backups'], name='backupjob_max_backups_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjob',
+            index=models.Index(fields=['max_snapshots'], name='backupjob_max_snapshots_idx'),
+        ),
+    ]
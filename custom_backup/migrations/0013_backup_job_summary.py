@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:17
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from openstack_dashboard.dashboards.custom_backup.utils import workflow_input_summary
+
+CHUNK_SIZE = 500
+
+
+def fill_summaries(apps, schema_editor):
+    # one INSERT per CHUNK_SIZE BackupJobs, read following the primary key. The state of the existing triggers is
+    # not known without Mistral: linked ones are taken as active, the drift check corrects them
+    BackupJob = apps.get_model('custom_backup', 'BackupJob')
+    BackupJobSummary = apps.get_model('custom_backup', 'BackupJobSummary')
+    last_id = ''
+    while True:
+        chunk = list(BackupJob.objects.filter(id__gt=last_id).order_by('id').select_related('notification')
+                     [:CHUNK_SIZE])
+        if not chunk:
+            return
+        BackupJobSummary.objects.bulk_create([BackupJobSummary(
+            backup_job_id=backup_job.id,
+            name=backup_job.name,
+            project_id=backup_job.project_id,
+            schedule_pattern=backup_job.schedule_pattern,
+            workflow_input_summary=workflow_input_summary(backup_job.workflow_input),
+            notification_id=backup_job.notification_id,
+            notification_name=backup_job.notification.name if backup_job.notification_id else None,
+            trigger_state='active' if backup_job.cron_trigger_id else 'unknown',
+            cron_trigger_id=backup_job.cron_trigger_id,
+            next_run_at=backup_job.next_run_at,
+            instance_id=backup_job.instance_id,
+            metadata_key=backup_job.metadata_key,
+            backup_type=backup_job.backup_type,
+            creation_time=backup_job.creation_time,
+            update_time=backup_job.update_time,
+        ) for backup_job in chunk])
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0012_workflow_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupJobSummary',
+            fields=[
+                ('backup_job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='custom_backup.BackupJob')),
+                ('name', models.CharField(max_length=200)),
+                ('project_id', models.CharField(max_length=32)),
+                ('schedule_pattern', models.CharField(max_length=100)),
+                ('workflow_input_summary', models.TextField()),
+                ('notification_id', models.CharField(max_length=36, null=True)),
+                ('notification_name', models.CharField(max_length=200, null=True)),
+                ('trigger_state', models.CharField(default='pending', max_length=10)),
+                ('cron_trigger_id', models.CharField(max_length=36, null=True)),
+                ('next_run_at', models.DateTimeField(null=True)),
+                ('instance_id', models.CharField(max_length=36, null=True)),
+                ('metadata_key', models.CharField(max_length=50, null=True)),
+                ('backup_type', models.CharField(max_length=10, null=True)),
+                ('creation_time', models.DateTimeField()),
+                ('update_time', models.DateTimeField(null=True)),
+            ],
+        ),
+        # before the indexes, which are then built once
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['name', 'backup_job'], name='jobsum_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['schedule_pattern', 'backup_job'], name='jobsum_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['project_id', 'backup_job'], name='jobsum_project_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['notification_name', 'backup_job'], name='jobsum_notif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['creation_time', 'backup_job'], name='jobsum_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['update_time', 'backup_job'], name='jobsum_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['next_run_at', 'backup_job'], name='jobsum_next_run_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['project_id', 'name', 'backup_job'], name='jobsum_proj_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['project_id', 'schedule_pattern', 'backup_job'], name='jobsum_proj_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['project_id', 'notification_name', 'backup_job'], name='jobsum_proj_notif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['project_id', 'creation_time', 'backup_job'], name='jobsum_proj_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['project_id', 'update_time', 'backup_job'], name='jobsum_proj_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['project_id', 'next_run_at', 'backup_job'], name='jobsum_proj_next_run_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backupjobsummary',
+            index=models.Index(fields=['notification_id'], name='jobsum_notif_id_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:36
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_backup', '0013_backup_job_summary'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='backupjobsummary',
+            name='instance_id',
+        ),
+    ]
@@ -0,0 +1,348 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+import requests
+from django.conf import settings
+from six.moves.urllib.parse import urlparse
+from keystoneauth1 import session as ks_session
+from keystoneauth1.identity import v3
+from mistralclient.api import client as mistral_client
+from mistralclient.api.base import APIException
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+
+
+logger = logging.getLogger(__name__)
+
+
+SERVICE_TYPE = 'workflowv2'
+
+# process-wide pool of keep-alive HTTP connections shared by the cached clients, see service_client
+_http_session = None
+_http_session_lock = threading.Lock()
+# LRU cache {(auth url, username, project id): (client, keystone auth plugin)}
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+# {host: _Guard}, see _guard_for
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class MistralUnavailable(APIException):
+    """
+    Raised when a call to Mistral is not attempted (open circuit, full bulkhead) or does not complete (deadline,
+    connection error). It is an APIException, so the callers already handling the errors of mistralclient handle it
+    as well; error_message is meant to be shown to the user.
+    """
+    def __init__(self, error_message, error_code=503):
+        super(MistralUnavailable, self).__init__(error_code=error_code, error_message=error_message)
+
+
+class CircuitOpenError(MistralUnavailable):
+    pass
+
+
+class BulkheadFullError(MistralUnavailable):
+    pass
+
+
+class DeadlineExceededError(MistralUnavailable):
+    def __init__(self, error_message):
+        super(DeadlineExceededError, self).__init__(error_message, error_code=504)
+
+
+class CircuitBreaker(object):
+    """
+    After failure_threshold consecutive failures the circuit opens, and the calls fail immediately with
+    CircuitOpenError for reset_timeout seconds. Then one trial call is let through (half-open): its success closes
+    the circuit, its failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                logger.info("Circuit breaker of {} half-open, trying one call".format(self.name))
+                self.state = self.HALF_OPEN
+                return
+        raise CircuitOpenError("Mistral ({}) is unavailable, retry later".format(self.name))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Circuit breaker of {} closed".format(self.name))
+            self.state, self.failures, self.opened_at = self.CLOSED, 0, None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit breaker of {} open after {} failures".format(self.name, self.failures))
+                self.state, self.opened_at = self.OPEN, time.time()
+
+
+class Bulkhead(object):
+    """
+    Cap the number of threads of the process inside Mistral calls: the others wait at most `wait` seconds for a
+    slot, then fail with BulkheadFullError. A slow Mistral can thus hold at most `size` threads of a Horizon worker.
+    Implemented with a Condition, since Semaphore.acquire has no timeout on Python 2.
+    """
+    def __init__(self, name, size, wait):
+        self.name = name
+        self.size = size
+        self.wait = wait
+        self.in_flight = 0
+        self.rejected = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            deadline = time.time() + self.wait
+            while self.in_flight >= self.size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.rejected += 1
+                    logger.warning("Bulkhead of {} full ({} calls in flight), call rejected".format(
+                        self.name, self.in_flight))
+                    raise BulkheadFullError("Too many concurrent requests to Mistral ({}), retry later".format(
+                        self.name))
+                self._condition.wait(remaining)
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+
+class _Guard(object):
+    def __init__(self, host):
+        self.breaker = CircuitBreaker(
+            host,
+            _setting('CUSTOM_BACKUP_MISTRAL_BREAKER_THRESHOLD', constants.DEFAULT_MISTRAL_BREAKER_THRESHOLD),
+            _setting('CUSTOM_BACKUP_MISTRAL_BREAKER_RESET', constants.DEFAULT_MISTRAL_BREAKER_RESET),
+        )
+        self.bulkhead = Bulkhead(
+            host,
+            _setting('CUSTOM_BACKUP_MISTRAL_BULKHEAD_SIZE', constants.DEFAULT_MISTRAL_BULKHEAD_SIZE),
+            _setting('CUSTOM_BACKUP_MISTRAL_BULKHEAD_WAIT', constants.DEFAULT_MISTRAL_BULKHEAD_WAIT),
+        )
+
+
+def _guard_for(url):
+    host = urlparse(url).netloc
+    with _guards_lock:
+        if host not in _guards:
+            _guards[host] = _Guard(host)
+        return _guards[host]
+
+
+def guard_stats():
+    """
+    State of the breakers and bulkheads of the process, one entry per host, e.g. to be exported as metrics
+    :return: dictionary {host: {'state': .., 'failures': .., 'in_flight': .., 'rejected': ..}}
+    """
+    with _guards_lock:
+        return dict((host, {
+            'state': guard.breaker.state,
+            'failures': guard.breaker.failures,
+            'in_flight': guard.bulkhead.in_flight,
+            'rejected': guard.bulkhead.rejected,
+        }) for host, guard in _guards.items())
+
+
+class GuardedSession(requests.Session):
+    """
+    requests.Session used by every Mistral client (see service_client): each call gets a deadline
+    (CUSTOM_BACKUP_MISTRAL_TIMEOUT, unless the caller sets its own timeout) and goes through the bulkhead and the
+    circuit breaker of its host. Errors raised by requests and 5xx responses count as failures.
+    """
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = _setting('CUSTOM_BACKUP_MISTRAL_TIMEOUT', constants.DEFAULT_MISTRAL_TIMEOUT)
+        guard = _guard_for(url)
+        guard.bulkhead.acquire()
+        try:
+            guard.breaker.before_call()
+            try:
+                response = super(GuardedSession, self).request(method, url, **kwargs)
+            except requests.exceptions.Timeout as e:
+                guard.breaker.record_failure()
+                raise DeadlineExceededError("Mistral did not answer within {}s: {}".format(kwargs['timeout'], e))
+            except requests.exceptions.ConnectionError as e:
+                guard.breaker.record_failure()
+                raise MistralUnavailable("Unable to connect to Mistral: {}".format(e))
+            except Exception:
+                # any other error ends the call as well, else a half-open breaker would wait for its trial forever
+                guard.breaker.record_failure()
+                raise
+        finally:
+            guard.bulkhead.release()
+        if response.status_code >= 500:
+            guard.breaker.record_failure()
+        else:
+            guard.breaker.record_success()
+        return response
+
+
+def _shared_http_session():
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            pool_size = max(
+                _setting('CUSTOM_BACKUP_MISTRAL_CONCURRENCY', constants.DEFAULT_MISTRAL_CONCURRENCY),
+                _setting('CUSTOM_BACKUP_MISTRAL_BULKHEAD_SIZE', constants.DEFAULT_MISTRAL_BULKHEAD_SIZE),
+            )
+            _http_session = GuardedSession()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _http_session.mount('http://', adapter)
+            _http_session.mount('https://', adapter)
+        return _http_session
+
+
+def _expired(auth):
+    # the token is requested by the first call of the client; None until then
+    auth_ref = getattr(auth, 'auth_ref', None)
+    return auth_ref is not None and auth_ref.will_expire_soon(auth.MIN_TOKEN_LIFE_SECONDS)
+
+
+def _evict():
+    """Drop the clients whose token is expired, then the least recently used ones above the size limit"""
+    max_size = _setting('CUSTOM_BACKUP_MISTRAL_CLIENT_CACHE_SIZE', constants.DEFAULT_MISTRAL_CLIENT_CACHE_SIZE)
+    for key, (_client, auth) in list(_clients.items()):
+        if _expired(auth):
+            del _clients[key]
+    while len(_clients) > max_size:
+        _clients.popitem(last=False)
+
+
+def service_client(project_id=None):
+    """
+    Mistral client for the calls executed outside of an HTTP request (outbox, management commands), which cannot use
+    the token of the logged user. It is authenticated with the CUSTOM_BACKUP_MISTRAL_AUTH credentials and scoped to
+    project_id, so that cron-triggers keep living inside the project of their BackupJob: the service user needs a
+    role in every project having BackupJobs.
+    Without project_id the client is scoped to the project_id of CUSTOM_BACKUP_MISTRAL_AUTH, e.g. to list the
+    triggers of all the projects.
+
+    The clients are cached per process and project, so a drained chain reuses the Keystone token of the previous
+    one instead of authenticating again, and every client sends its requests through the same keep-alive connection
+    pool. A client is evicted when its token expires, or when the cache exceeds
+    CUSTOM_BACKUP_MISTRAL_CLIENT_CACHE_SIZE clients (least recently used first).
+    """
+    auth_settings = getattr(settings, 'CUSTOM_BACKUP_MISTRAL_AUTH', {})
+    auth_url = auth_settings.get('auth_url', getattr(settings, 'OPENSTACK_KEYSTONE_URL', None))
+    project_id = project_id or auth_settings.get('project_id')
+    key = (auth_url, auth_settings.get('username'), project_id)
+    with _clients_lock:
+        cached = _clients.pop(key, None)
+        if cached is not None and not _expired(cached[1]):
+            _clients[key] = cached
+            return cached[0]
+
+    auth = v3.Password(
+        auth_url=auth_url,
+        username=auth_settings.get('username'),
+        password=auth_settings.get('password'),
+        user_domain_name=auth_settings.get('user_domain_name', 'Default'),
+        project_id=project_id,
+    )
+    session = ks_session.Session(auth=auth, verify=not getattr(settings, 'OPENSTACK_SSL_NO_VERIFY', False),
+                                 session=_shared_http_session())
+    client = mistral_client.client(
+        session=session,
+        service_type=SERVICE_TYPE,
+        endpoint_type=getattr(settings, 'OPENSTACK_ENDPOINT_TYPE', constants.DEFAULT_ENDPOINT_TYPE),
+    )
+    with _clients_lock:
+        _clients[key] = (client, auth)
+        _evict()
+    return client
+
+
+def is_not_found(api_exception):
+    return getattr(api_exception, 'error_code', None) == 404
+
+
+def is_conflict(api_exception):
+    return getattr(api_exception, 'error_code', None) == 409
+
+
+def create_trigger(client, trigger_name, workflow_input, schedule_pattern, workflow_id=constants.DEFAULT_WORKFLOW_ID):
+    """
+    Idempotent creation: if a trigger with the same name already exists (e.g. a previous attempt created it, but
+    failed before recording the outcome) it is deleted and created again with the requested definition.
+    :param workflow_input: dictionary
+    """
+    try:
+        logger.info("Creating cron-trigger {}".format(trigger_name))
+        return client.cron_triggers.create(trigger_name, workflow_id,
+                                           workflow_input=workflow_input, pattern=schedule_pattern)
+    except APIException as e:
+        if not is_conflict(e):
+            raise
+    logger.info("Cron-trigger {} already exists, replacing it".format(trigger_name))
+    delete_trigger(client, trigger_name)
+    return client.cron_triggers.create(trigger_name, workflow_id,
+                                       workflow_input=workflow_input, pattern=schedule_pattern)
+
+
+def delete_trigger(client, trigger_name):
+    """
+    Idempotent deletion: a trigger which does not exist is considered deleted
+    :return: True if a trigger has been deleted, False if it did not exist
+    """
+    try:
+        logger.info("Deleting cron-trigger {}".format(trigger_name))
+        client.cron_triggers.delete(trigger_name)
+        return True
+    except APIException as e:
+        if not is_not_found(e):
+            raise
+        logger.info("Cron-trigger {} does not exist".format(trigger_name))
+        return False
+
+
+def iter_triggers(client, page_size=1000, all_projects=False):
+    """
+    Generator over the cron-triggers, fetched one page at a time with the marker/limit parameters of
+    CronTriggerManager.list. The pages are requested lazily, so only one page is kept in memory by this function.
+    The Pike client does not take those parameters: the triggers are then listed with a single call.
+    :param all_projects: list the triggers of every project, the user needs the admin role
+    """
+    filters = {'all_projects': True} if all_projects else {}
+    marker = ''
+    while True:
+        try:
+            page = client.cron_triggers.list(marker=marker, limit=page_size, sort_keys='created_at,id',
+                                             sort_dirs='asc,asc', **filters)
+        except TypeError:
+            if marker:
+                raise
+            logger.warning("The Mistral client cannot page the cron-triggers, listing them with a single call")
+            for trigger in client.cron_triggers.list():
+                yield trigger
+            return
+        for trigger in page:
+            yield trigger
+        if len(page) < page_size:
+            return
+        marker = page[-1].id
@@ -1,2 +1,8 @@
 from .backup_job import BackupJob
+from .backup_job_instance import BackupJobInstance
+from .backup_job_summary import BackupJobSummary
 from .notification import Notification
+from .trigger_operation import TriggerOperation
+
+# connect the receivers which invalidate the cached lookups, see db_api.notification_choices
+from openstack_dashboard.dashboards.custom_backup import signals  # noqa
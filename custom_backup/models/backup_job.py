@@ -1,6 +1,22 @@
 from uuid import uuid1
 from django.db import models
+from django.utils import timezone
+from openstack_dashboard.dashboards.custom_backup import cron
 from openstack_dashboard.dashboards.custom_backup.constants import constants
+from openstack_dashboard.dashboards.custom_backup.models.backup_job_instance import BackupJobInstance
+from openstack_dashboard.dashboards.custom_backup.utils import canonical_json, workflow_input_fingerprint, \
+    workflow_source_key, workflow_instances, workflow_columns, WORKFLOW_COLUMNS
+
+
+def next_run(schedule_pattern, after=None):
+    """
+    :param after: defaults to now
+    :return: the first fire time of the pattern after `after`, None if the pattern is invalid or never fires
+    """
+    try:
+        return cron.next_fire(cron.schedule(schedule_pattern), after or timezone.now())
+    except cron.CronError:
+        return None
 
 
 class BackupJob(models.Model):
@@ -8,18 +24,121 @@ class BackupJob(models.Model):
     name = models.CharField(max_length=constants.STRING_L, unique=True)
     schedule_pattern = models.CharField(max_length=constants.STRING_M)
     workflow_input = models.TextField()
+    # SHA-256 of the canonical workflow_input, computed by save(): the changes of the input are detected comparing
+    # digests and the BackupJobs with identical inputs are found through the index
+    workflow_input_hash = models.CharField(max_length=constants.SHA256_LEN, null=True, db_index=True)
+    # instance or metadata pair backed up, computed by save(), see utils.workflow_source_key. The BackupJobs of the
+    # same metadata pair are grouped through the index to find duplicated and overlapping schedules, the ones of the
+    # same instance through BackupJobInstance
+    source_key = models.CharField(max_length=constants.STRING_M, null=True)
+    # typed copies of the workflow_input values, computed by save(), see utils.workflow_columns. They are NULL when
+    # the input lacks the value; instance_id is NULL for the multi-instance BackupJobs, see BackupJobInstance
+    instance_id = models.CharField(max_length=constants.UUID_MAX_LEN, null=True)
+    metadata_key = models.CharField(max_length=constants.STRING_S, null=True)
+    metadata_value = models.CharField(max_length=constants.STRING_S, null=True)
+    backup_type = models.CharField(max_length=constants.STRING_XXS, null=True)
+    max_backups = models.IntegerField(null=True)
+    max_snapshots = models.IntegerField(null=True)
+    cinder_backup = models.NullBooleanField()
     creation_time = models.DateTimeField(auto_now_add=True)
     update_time = models.DateTimeField(null=True)
-    cron_trigger_id = models.CharField(max_length=constants.UUID_MAX_LEN)
+    # id of the Mistral cron-trigger, written by the outbox worker once the trigger has been created: NULL until then
+    cron_trigger_id = models.CharField(max_length=constants.UUID_MAX_LEN, null=True, db_index=True)
     enabled = models.BooleanField(default=True)
+    # the cron-trigger is the one shared by the BackupJobs of the project with the same schedule_pattern, see
+    # constants.TRIGGER_MODE_CONSOLIDATED; cron_trigger_id is then the id of the shared trigger
+    shared_trigger = models.BooleanField(default=False)
+    # next fire time of schedule_pattern, computed by save() when the pattern changes and moved forward by the
+    # advance_next_runs management command once it has passed: the upcoming BackupJobs are a range scan of the
+    # index instead of a parse of every pattern. NULL if the pattern never fires
+    next_run_at = models.DateTimeField(null=True)
     project_id = models.CharField(max_length=constants.PROJECT_ID_LEN)
     notification = models.ForeignKey("Notification", null=True)
 
+    class Meta:
+        # (sort field, id) are the keysets used to paginate the jobs index, see db_api.paginate. The name keyset is
+        # served by the unique index, the notification one by the foreign key index.
+        # Each keyset is indexed twice: prefixed by project_id for the project scoped listing, and alone for the
+        # admin all-tenants listing, so that the cost of a page never depends on the number of tenants
+        indexes = [
+            models.Index(fields=['creation_time', 'id'], name='backupjob_created_id_idx'),
+            models.Index(fields=['update_time', 'id'], name='backupjob_updated_id_idx'),
+            models.Index(fields=['schedule_pattern', 'id'], name='backupjob_schedule_id_idx'),
+            models.Index(fields=['project_id', 'creation_time', 'id'], name='backupjob_proj_created_idx'),
+            models.Index(fields=['project_id', 'update_time', 'id'], name='backupjob_proj_updated_idx'),
+            models.Index(fields=['project_id', 'schedule_pattern', 'id'], name='backupjob_proj_schedule_idx'),
+            models.Index(fields=['project_id', 'name'], name='backupjob_proj_name_idx'),
+            models.Index(fields=['project_id', 'notification'], name='backupjob_proj_notif_idx'),
+            models.Index(fields=['project_id', 'enabled'], name='backupjob_proj_enabled_idx'),
+            models.Index(fields=['project_id', 'workflow_input_hash'], name='backupjob_proj_input_idx'),
+            models.Index(fields=['source_key', 'schedule_pattern'], name='backupjob_source_sched_idx'),
+            models.Index(fields=['project_id', 'source_key', 'schedule_pattern'], name='backupjob_proj_source_idx'),
+            models.Index(fields=['next_run_at', 'id'], name='backupjob_next_run_id_idx'),
+            models.Index(fields=['project_id', 'next_run_at', 'id'], name='backupjob_proj_next_run_idx'),
+            models.Index(fields=['instance_id'], name='backupjob_instance_idx'),
+            models.Index(fields=['project_id', 'instance_id'], name='backupjob_proj_instance_idx'),
+            models.Index(fields=['metadata_key', 'metadata_value'], name='backupjob_metadata_idx'),
+            models.Index(fields=['project_id', 'metadata_key', 'metadata_value'], name='backupjob_proj_metadata_idx'),
+            models.Index(fields=['backup_type', 'cinder_backup'], name='backupjob_type_idx'),
+            models.Index(fields=['project_id', 'backup_type', 'cinder_backup'], name='backupjob_proj_type_idx'),
+            models.Index(fields=['max_backups'], name='backupjob_max_backups_idx'),
+            models.Index(fields=['max_snapshots'], name='backupjob_max_snapshots_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(BackupJob, cls).from_db(db, field_names, values)
+        # the pattern stored in the DB, to tell the signals whether a save changed it, see signals.py
+        instance.saved_schedule_pattern = instance.__dict__.get('schedule_pattern')
+        # the BackupJobInstance rows match this digest, see _save_instances
+        instance.saved_workflow_input_hash = instance.__dict__.get('workflow_input_hash')
+        return instance
+
+    def _save_instances(self):
+        # one SELECT, then only the rows of the instances added or removed are written
+        instance_ids = set(workflow_instances(self.workflow_input))
+        rows = BackupJobInstance.objects.using(self._state.db).filter(backup_job_id=self.id)
+        current = set(rows.values_list('instance_id', flat=True))
+        if current - instance_ids:
+            rows.filter(instance_id__in=list(current - instance_ids)).delete()
+        BackupJobInstance.objects.using(self._state.db).bulk_create(
+            [BackupJobInstance(backup_job_id=self.id, instance_id=instance_id)
+             for instance_id in sorted(instance_ids - current)])
+
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
+        """
+        With update_fields only the columns listed are written, together with the ones derived from them: the
+        digest and the typed columns of workflow_input, next_run_at of schedule_pattern
+        """
         if not self.id:
             self.id = str(uuid1())
-        super(BackupJob, self).save(force_insert=False, force_update=False, using=None, update_fields=None)
+        saved_input = update_fields is None or 'workflow_input' in update_fields
+        if saved_input:
+            try:
+                self.workflow_input = canonical_json(self.workflow_input)
+            except ValueError:
+                # stored as it is, the digest still tells it apart
+                pass
+            self.workflow_input_hash = workflow_input_fingerprint(self.workflow_input)
+            self.source_key = workflow_source_key(self.workflow_input)
+            for column, value in workflow_columns(self.workflow_input).items():
+                setattr(self, column, value)
+        now = timezone.now()
+        # a passed value comes from a copy loaded before advance_next_runs moved it forward
+        if (update_fields is None or 'schedule_pattern' in update_fields) and \
+                (self.next_run_at is None or self.next_run_at <= now or
+                 self.schedule_pattern != getattr(self, 'saved_schedule_pattern', None)):
+            self.next_run_at = next_run(self.schedule_pattern, now)
+            if update_fields is not None:
+                update_fields = set(update_fields) | {'next_run_at'}
+        if update_fields is not None and saved_input:
+            update_fields = set(update_fields) | {'workflow_input_hash', 'source_key'} | set(WORKFLOW_COLUMNS)
+        super(BackupJob, self).save(force_insert=force_insert, force_update=force_update, using=using,
+                                    update_fields=update_fields)
+        if saved_input and self.workflow_input_hash != getattr(self, 'saved_workflow_input_hash', None):
+            self._save_instances()
+            self.saved_workflow_input_hash = self.workflow_input_hash
 
     def __str__(self):
         return "BackupJob with id and name: {} : {}".format(self.id, self.name)
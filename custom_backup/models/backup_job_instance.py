@@ -0,0 +1,18 @@
+from django.db import models
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+
+
+class BackupJobInstance(models.Model):
+    """
+    Instance backed up by a BackupJob, one row per instance. The rows are kept in sync with the workflow_input by
+    BackupJob.save(), and the BackupJobs of an instance are found through the (instance_id, backup_job) index,
+    see db_api.backup_jobs_of_instance
+    """
+    backup_job = models.ForeignKey('BackupJob', related_name='instances', on_delete=models.CASCADE)
+    instance_id = models.CharField(max_length=constants.UUID_MAX_LEN)
+
+    class Meta:
+        unique_together = (('instance_id', 'backup_job'), )
+
+    def __str__(self):
+        return "Instance {} of BackupJob {}".format(self.instance_id, self.backup_job_id)
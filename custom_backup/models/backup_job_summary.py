@@ -0,0 +1,56 @@
+from django.db import models
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+
+
+class BackupJobSummary(models.Model):
+    """
+    Read model of the jobs index: one flat row per BackupJob, holding what JobsTable renders already computed, so
+    that a page is a single keyset scan of this table, without joins (the instance filter aside), JSON parsing nor
+    Mistral calls. It is written by the BackupJob and Notification signals, by the outbox (trigger_state) and by the
+    bulk updates of db_api, see signals.py and db_api.update_trigger_state
+    """
+    backup_job = models.OneToOneField('BackupJob', primary_key=True, related_name='summary',
+                                      on_delete=models.CASCADE)
+    name = models.CharField(max_length=constants.STRING_L)
+    project_id = models.CharField(max_length=constants.PROJECT_ID_LEN)
+    schedule_pattern = models.CharField(max_length=constants.STRING_M)
+    # `key1=value1, key2=value2, ..` of the workflow_input, see utils.workflow_input_summary
+    workflow_input_summary = models.TextField()
+    notification_id = models.CharField(max_length=constants.UUID_MAX_LEN, null=True)
+    notification_name = models.CharField(max_length=constants.STRING_L, null=True)
+    # one of constants.TRIGGER_STATE_CHOICES, as of the last outbox operation applied to the cron-trigger
+    trigger_state = models.CharField(max_length=constants.STRING_XXS, default=constants.TRIGGER_STATE_PENDING)
+    cron_trigger_id = models.CharField(max_length=constants.UUID_MAX_LEN, null=True)
+    next_run_at = models.DateTimeField(null=True)
+    # filters of the jobs index, see db_api.JOB_SUMMARY_FILTERS. The instances are matched through BackupJobInstance
+    metadata_key = models.CharField(max_length=constants.STRING_S, null=True)
+    backup_type = models.CharField(max_length=constants.STRING_XXS, null=True)
+    creation_time = models.DateTimeField()
+    update_time = models.DateTimeField(null=True)
+
+    class Meta:
+        # the keysets of the jobs index, see db_api.JOB_SUMMARY_SORT_KEYS, project scoped and for all tenants
+        indexes = [
+            models.Index(fields=['name', 'backup_job'], name='jobsum_name_idx'),
+            models.Index(fields=['schedule_pattern', 'backup_job'], name='jobsum_schedule_idx'),
+            models.Index(fields=['project_id', 'backup_job'], name='jobsum_project_idx'),
+            models.Index(fields=['notification_name', 'backup_job'], name='jobsum_notif_idx'),
+            models.Index(fields=['creation_time', 'backup_job'], name='jobsum_created_idx'),
+            models.Index(fields=['update_time', 'backup_job'], name='jobsum_updated_idx'),
+            models.Index(fields=['next_run_at', 'backup_job'], name='jobsum_next_run_idx'),
+            models.Index(fields=['project_id', 'name', 'backup_job'], name='jobsum_proj_name_idx'),
+            models.Index(fields=['project_id', 'schedule_pattern', 'backup_job'], name='jobsum_proj_schedule_idx'),
+            models.Index(fields=['project_id', 'notification_name', 'backup_job'], name='jobsum_proj_notif_idx'),
+            models.Index(fields=['project_id', 'creation_time', 'backup_job'], name='jobsum_proj_created_idx'),
+            models.Index(fields=['project_id', 'update_time', 'backup_job'], name='jobsum_proj_updated_idx'),
+            models.Index(fields=['project_id', 'next_run_at', 'backup_job'], name='jobsum_proj_next_run_idx'),
+            models.Index(fields=['notification_id'], name='jobsum_notif_id_idx'),
+        ]
+
+    @property
+    def id(self):
+        # the BackupJob id, JobsTable and its actions address the rows by it
+        return self.backup_job_id
+
+    def __str__(self):
+        return "BackupJobSummary of {}".format(self.backup_job_id)
@@ -12,15 +12,28 @@ class Notification(models.Model):
     openstack_url = models.URLField()
     creation_time = models.DateTimeField(auto_now_add=True)
     update_time = models.DateTimeField(null=True)
+    # notifications created before project scoping have no project and are shared among all projects
+    project_id = models.CharField(max_length=constants.PROJECT_ID_LEN, null=True)
 
     class Meta:
         unique_together = (('name', 'sender_address', 'recipient_address'), )
+        # keysets and filters of the notifications index, see db_api.paginate. Name lookups are served by the
+        # unique_together index
+        indexes = [
+            models.Index(fields=['creation_time', 'id'], name='notif_created_id_idx'),
+            models.Index(fields=['update_time', 'id'], name='notif_updated_id_idx'),
+            models.Index(fields=['sender_address', 'id'], name='notif_sender_id_idx'),
+            models.Index(fields=['recipient_address', 'id'], name='notif_recipient_id_idx'),
+            models.Index(fields=['project_id', 'creation_time', 'id'], name='notif_proj_created_idx'),
+            models.Index(fields=['project_id', 'name'], name='notif_proj_name_idx'),
+        ]
 
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
         if not self.id:
             self.id = str(uuid1())
-        super(Notification, self).save(force_insert=False, force_update=False, using=None, update_fields=None)
+        super(Notification, self).save(force_insert=force_insert, force_update=force_update, using=using,
+                                       update_fields=update_fields)
 
     def __str__(self):
         return "Notification: {} - {} - {}".format(self.name, self.sender_address, self.recipient_address)
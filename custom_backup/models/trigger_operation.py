@@ -0,0 +1,67 @@
+from uuid import uuid1
+from django.db import models
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+
+
+class TriggerOperation(models.Model):
+    """
+    Outbox of the Mistral cron-trigger changes. A row is written inside the same transaction as the BackupJob it
+    refers to, and it is applied later on by the drain_trigger_outbox management command, see outbox.py
+    """
+    OPERATION_CREATE = 'create'
+    OPERATION_DELETE = 'delete'
+    OPERATION_REPLACE = 'replace'
+    # rebuild a shared cron-trigger from the BackupJobs using it, or delete it when there are none left
+    OPERATION_SYNC = 'sync'
+    OPERATION_CHOICES = (
+        (OPERATION_CREATE, OPERATION_CREATE),
+        (OPERATION_DELETE, OPERATION_DELETE),
+        (OPERATION_REPLACE, OPERATION_REPLACE),
+        (OPERATION_SYNC, OPERATION_SYNC),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, STATUS_PENDING),
+        (STATUS_DONE, STATUS_DONE),
+        (STATUS_FAILED, STATUS_FAILED),
+    )
+
+    id = models.CharField(max_length=constants.UUID_MAX_LEN, primary_key=True)
+    # not a ForeignKey: a delete operation outlives its BackupJob. Sync operations hold the key of the shared
+    # trigger instead, see db_api.shared_trigger_key, so that they are chained per trigger
+    backup_job_id = models.CharField(max_length=constants.UUID_MAX_LEN)
+    project_id = models.CharField(max_length=constants.PROJECT_ID_LEN)
+    operation = models.CharField(max_length=constants.STRING_XXS, choices=OPERATION_CHOICES)
+    # the trigger to create, or to delete for delete operations
+    trigger_name = models.CharField(max_length=constants.STRING_XL)
+    # replace operations only: the trigger deleted before creating trigger_name
+    old_trigger_name = models.CharField(max_length=constants.STRING_XL, null=True)
+    # sync operations: filled by the outbox worker with the batch of the shared trigger before applying them
+    workflow_input = models.TextField(null=True)
+    schedule_pattern = models.CharField(max_length=constants.STRING_M, null=True)
+    status = models.CharField(max_length=constants.STRING_XXS, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_time = models.DateTimeField()
+    last_error = models.TextField(null=True)
+    creation_time = models.DateTimeField(auto_now_add=True)
+    update_time = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # the worker scans the pending operations in creation order
+            models.Index(fields=['status', 'creation_time', 'id'], name='trigop_status_created_idx'),
+            models.Index(fields=['backup_job_id', 'status'], name='trigop_job_status_idx'),
+        ]
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if not self.id:
+            self.id = str(uuid1())
+        super(TriggerOperation, self).save(force_insert=force_insert, force_update=force_update, using=using,
+                                           update_fields=update_fields)
+
+    def __str__(self):
+        return "TriggerOperation {} {} of BackupJob {}".format(self.operation, self.trigger_name, self.backup_job_id)
@@ -6,6 +6,7 @@ from django.utils.translation import ungettext_lazy
 
 from horizon import tables, exceptions
 from openstack_dashboard.dashboards.custom_backup.db_api import delete_notification
+from openstack_dashboard.dashboards.custom_backup.utils import request_project_id, NOTIFICATIONS_TABLE
 
 
 logger = logging.getLogger(__name__)
@@ -46,11 +47,24 @@ class DeleteNotification(tables.DeleteAction):
 
     def delete(self, request, notification_id):
         try:
-            delete_notification(notification_id)
+            delete_notification(notification_id, request_project_id(request, NOTIFICATIONS_TABLE))
         except (exceptions.HandledException, exceptions.NotFound) as e:
             logger.error("Failed to delete Notification with ID {}: {}".format(notification_id, e))
 
 
+class NotificationFilterAction(tables.FilterAction):
+    # server side: every filter is translated into an SQL predicate by db_api.apply_filters
+    filter_type = "server"
+    filter_choices = (
+        ('name', _("Name ="), True),
+        ('sender_address', _("Sender ="), True),
+        ('recipient_address', _("Recipient ="), True),
+        ('smtp_server', _("SMTP Server ="), True),
+        ('creation_time', _("Created (YYYY-MM-DD[..YYYY-MM-DD]) ="), True),
+        ('update_time', _("Modified (YYYY-MM-DD[..YYYY-MM-DD]) ="), True),
+    )
+
+
 class TriggerIdColumn(tables.Column):
     def get_link_url(self, datum):
         trigger_url = "horizon:custom_backup:notifications:detail"
@@ -58,6 +72,8 @@ class TriggerIdColumn(tables.Column):
 
 
 class NotificationsTable(tables.DataTable):
+    # the columns only read attributes, so the rows are either Notification instances or the db_api.NotificationRow
+    # tuples of the index page
 
     id = TriggerIdColumn(
         "id",
@@ -99,8 +115,10 @@ class NotificationsTable(tables.DataTable):
     class Meta(object):
         name = "notifications"
         verbose_name = _("Notifications")
+        pagination_param = "marker"
+        prev_pagination_param = "prev_marker"
         table_actions = (
-            tables.FilterAction,
+            NotificationFilterAction,
             CreateNotification,
             DeleteNotification
         )
@@ -10,22 +10,75 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from django.http import Http404
 from django.views import generic
 from horizon import workflows, tables
+from horizon.utils import functions as utils
 from django.core.urlresolvers import reverse_lazy
 from django.utils.translation import ugettext_lazy as _
-from openstack_dashboard.dashboards.custom_backup.db_api import list_notifications, \
-    get_notification, get_backup_jobs_of_notification
+from openstack_dashboard.dashboards.custom_backup.db_api import paginate_notifications, \
+    cached_notification, get_backup_jobs_of_notification, NOTIFICATION_SORT_KEYS
 from openstack_dashboard.dashboards.custom_backup.notifications import workflows as notification_workflows
 from openstack_dashboard.dashboards.custom_backup.notifications import tables as notification_table
+from openstack_dashboard.dashboards.custom_backup.utils import get_sort_params, get_all_tenants_param, \
+    get_server_filters, get_sort_query, request_project_id, NOTIFICATIONS_TABLE
 
 
 class IndexView(tables.DataTableView):
     table_class = notification_table.NotificationsTable
     template_name = 'custom_backup/notifications/index.html'
+    # rendered as server-side sort links above the table, keys must belong to db_api.NOTIFICATION_SORT_KEYS
+    sort_choices = (
+        ('name', _("Notification Name")),
+        ('sender_address', _("Sender address")),
+        ('recipient_address', _("Recipient address")),
+        ('creation_time', _("Creation Time")),
+        ('update_time', _("Modification Time")),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(IndexView, self).__init__(*args, **kwargs)
+        self._more = False
+        self._prev = False
+        self._sort_key, self._sort_dir = None, None
+        self._all_tenants = False
+
+    def has_more_data(self, table):
+        return self._more
+
+    def has_prev_data(self, table):
+        return self._prev
+
+    def get_filters(self, filters=None, filters_map=None):
+        return get_server_filters(self.request, self.table, filters, filters_map)
 
     def get_data(self):
-        return list_notifications(as_list=True)
+        marker = self.request.GET.get(notification_table.NotificationsTable._meta.pagination_param, None)
+        prev_marker = self.request.GET.get(notification_table.NotificationsTable._meta.prev_pagination_param, None)
+        reversed_order = prev_marker is not None
+        self._sort_key, self._sort_dir = get_sort_params(self.request, self.table.name, NOTIFICATION_SORT_KEYS)
+        self._all_tenants = get_all_tenants_param(self.request, self.table.name)
+        notifications, self._more, self._prev = paginate_notifications(
+            marker=prev_marker if reversed_order else marker,
+            reversed_order=reversed_order,
+            page_size=utils.get_page_size(self.request),
+            filters=self.get_filters(),
+            sort_key=self._sort_key,
+            sort_dir=self._sort_dir,
+            project_id=None if self._all_tenants else self.request.user.tenant_id,
+            as_rows=True
+        )
+        return notifications
+
+    def get_context_data(self, **kwargs):
+        context = super(IndexView, self).get_context_data(**kwargs)
+        context['sort_choices'] = self.sort_choices
+        context['sort_key'] = self._sort_key
+        context['sort_dir'] = self._sort_dir
+        context['sort_query'] = get_sort_query(self.request, self.table)
+        context['can_list_all_tenants'] = self.request.user.is_superuser
+        context['all_tenants'] = self._all_tenants
+        return context
 
 
 class CreateView(workflows.WorkflowView):
@@ -35,6 +88,12 @@ class CreateView(workflows.WorkflowView):
 class UpdateView(workflows.WorkflowView):
     workflow_class = notification_workflows.UpdateNotificationWorkflow
 
+    def dispatch(self, request, *args, **kwargs):
+        if cached_notification(kwargs['notification_id'], request_project_id(request, NOTIFICATIONS_TABLE),
+                               shared=False) is None:
+            raise Http404("Notification not found")
+        return super(UpdateView, self).dispatch(request, *args, **kwargs)
+
 
 class DetailView(generic.TemplateView):
     template_name = 'custom_backup/notifications/detail.html'
@@ -42,9 +101,12 @@ class DetailView(generic.TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(DetailView, self).get_context_data(**kwargs)
-        notification = get_notification(id=kwargs['notification_id'])
+        project_id = request_project_id(self.request, NOTIFICATIONS_TABLE)
+        notification = cached_notification(kwargs['notification_id'], project_id)
+        if notification is None:
+            raise Http404("Notification not found")
         context['notification'] = notification
-        context['backup_jobs'] = get_backup_jobs_of_notification(notification.id)
+        context['backup_jobs'] = get_backup_jobs_of_notification(notification.id, project_id)
         context['index_url'] = reverse_lazy('horizon:custom_backup:notifications:index')
         return context
 
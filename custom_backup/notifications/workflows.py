@@ -4,8 +4,10 @@ from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext_lazy as _
 from horizon import forms, workflows, messages
 from openstack_dashboard.dashboards.custom_backup.constants import constants
-from openstack_dashboard.dashboards.custom_backup.db_api import create_notification, get_notification
-from openstack_dashboard.dashboards.custom_backup.utils import cmp_dict, extract_object_id
+from openstack_dashboard.dashboards.custom_backup.db_api import create_notification, get_notification, \
+    cached_notification
+from openstack_dashboard.dashboards.custom_backup.utils import cmp_dict, extract_object_id, request_project_id, \
+    NOTIFICATIONS_TABLE
 
 
 logger = logging.getLogger(__name__)
@@ -64,7 +66,8 @@ class CreateNotificationWorkflow(workflows.Workflow):
                 sender_address=data.get('sender_address'),
                 recipient_address=data.get('recipient_address'),
                 smtp_server=data.get('smtp_server'),
-                openstack_url=data.get('openstack_url')
+                openstack_url=data.get('openstack_url'),
+                project_id=request.user.tenant_id
             )
         except (IntegrityError, ValueError) as e:
             logger.error(e)
@@ -77,7 +80,8 @@ class UpdateNotificationAction(CreateNotificationAction):
 
     def __init__(self, request, context, *args, **kwargs):
         super(UpdateNotificationAction, self).__init__(request, context, *args, **kwargs)
-        current_notification = get_notification(id=extract_object_id(request))
+        current_notification = cached_notification(extract_object_id(request),
+                                                   request_project_id(request, NOTIFICATIONS_TABLE), shared=False)
         for field_name, field in self.fields.items():
             field.required = False
             if hasattr(current_notification, field_name):
@@ -103,7 +107,8 @@ class UpdateNotificationWorkflow(workflows.Workflow):
 
     @property
     def get_object(self):
-        return get_notification(id=extract_object_id(self.request))
+        return cached_notification(extract_object_id(self.request),
+                                   request_project_id(self.request, NOTIFICATIONS_TABLE), shared=False)
 
     def data_has_changed(self):
         obj = self.get_object
@@ -143,5 +148,5 @@ class UpdateNotificationWorkflow(workflows.Workflow):
         o = self.get_object
         for f in changed_fields:
             setattr(o, f, self.context[f])
-        o.save()
+        o.save(update_fields=changed_fields)
         return True
@@ -0,0 +1,202 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from uuid import uuid4
+from json import loads, dumps
+from multiprocessing.pool import ThreadPool
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from openstack_dashboard.dashboards.custom_backup import mistral_api
+from openstack_dashboard.dashboards.custom_backup.cache import make_key
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+from openstack_dashboard.dashboards.custom_backup.db_api import set_cron_trigger_id, set_shared_trigger_id, \
+    shared_trigger_batch, update_trigger_state
+from openstack_dashboard.dashboards.custom_backup.models import TriggerOperation
+
+
+logger = logging.getLogger(__name__)
+
+
+DRAIN_LOCK_KEY = make_key('trigger_outbox', 'lock')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def backoff(attempts):
+    """
+    Exponential backoff: seconds to wait before the next attempt of an operation which has failed `attempts` times
+    """
+    base = _setting('CUSTOM_BACKUP_OUTBOX_BACKOFF_BASE', constants.DEFAULT_OUTBOX_BACKOFF_BASE)
+    cap = _setting('CUSTOM_BACKUP_OUTBOX_BACKOFF_MAX', constants.DEFAULT_OUTBOX_BACKOFF_MAX)
+    return min(cap, base * 2 ** max(0, attempts - 1))
+
+
+def apply_operation(client, operation):
+    """
+    Execute the cron-trigger change of an operation. Every step is idempotent (see mistral_api), so an operation
+    can be safely retried after a partial failure, e.g. a replace whose deletion succeeded but creation did not.
+    :return: the created trigger, None for delete operations
+    """
+    if operation.operation == TriggerOperation.OPERATION_SYNC:
+        # a cron-trigger cannot be modified: the shared one is deleted and created again with the new batch
+        batch = loads(operation.workflow_input)['backup_jobs']
+        mistral_api.delete_trigger(client, operation.trigger_name)
+        if not batch:
+            return None
+        workflow_id = _setting('CUSTOM_BACKUP_FANOUT_WORKFLOW_ID', constants.DEFAULT_FANOUT_WORKFLOW_ID)
+        return mistral_api.create_trigger(client, operation.trigger_name, {'backup_jobs': batch},
+                                          operation.schedule_pattern, workflow_id)
+    if operation.operation == TriggerOperation.OPERATION_DELETE:
+        mistral_api.delete_trigger(client, operation.trigger_name)
+        return None
+    if operation.operation == TriggerOperation.OPERATION_REPLACE and \
+            operation.old_trigger_name != operation.trigger_name:
+        mistral_api.delete_trigger(client, operation.old_trigger_name)
+    return mistral_api.create_trigger(client, operation.trigger_name, loads(operation.workflow_input),
+                                      operation.schedule_pattern)
+
+
+@transaction.atomic
+def _record_success(operation, trigger):
+    if trigger is not None and operation.operation == TriggerOperation.OPERATION_SYNC:
+        set_shared_trigger_id(operation.project_id, operation.schedule_pattern, trigger.id)
+    elif trigger is not None:
+        set_cron_trigger_id(operation.backup_job_id, trigger.id)
+    operation.status = TriggerOperation.STATUS_DONE
+    operation.attempts += 1
+    operation.last_error = None
+    operation.update_time = timezone.now()
+    operation.save(update_fields=['status', 'attempts', 'last_error', 'update_time'])
+    update_trigger_state(operation)
+
+
+def _record_failure(operation, error):
+    max_attempts = _setting('CUSTOM_BACKUP_OUTBOX_MAX_ATTEMPTS', constants.DEFAULT_OUTBOX_MAX_ATTEMPTS)
+    now = timezone.now()
+    operation.attempts += 1
+    operation.last_error = str(error) or error.__class__.__name__
+    operation.update_time = now
+    if operation.attempts >= max_attempts:
+        logger.error("Giving up {} after {} attempts: {}".format(operation, operation.attempts, operation.last_error))
+        operation.status = TriggerOperation.STATUS_FAILED
+    else:
+        operation.next_attempt_time = now + timedelta(seconds=backoff(operation.attempts))
+    operation.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_time', 'update_time'])
+    update_trigger_state(operation)
+
+
+def process_chain(operations, client_factory=mistral_api.service_client, deadline=None):
+    """
+    Apply, in order, the operations of one BackupJob. The chain stops at the first failure, so that a later
+    operation never overtakes an earlier one (e.g. a delete executed before the create it follows).
+    It only talks with Mistral, the outcomes are recorded by the caller: the threads of the pool do not touch the DB.
+    :param deadline: time.time() after which the chain is not started, it is left to the next drain
+    :return: list of (operation, created trigger or None, exception or None), one for each operation attempted
+    """
+    if deadline is not None and time.time() > deadline:
+        return []
+    outcomes = []
+    try:
+        client = client_factory(operations[0].project_id)
+    except Exception as e:
+        # the client could not be built, e.g. Keystone is unavailable
+        return [(operations[0], None, e)]
+    for operation in operations:
+        if getattr(operation, 'superseded', False):
+            outcomes.append((operation, None, None))
+            continue
+        try:
+            trigger = apply_operation(client, operation)
+        except Exception as e:
+            outcomes.append((operation, None, e))
+            break
+        outcomes.append((operation, trigger, None))
+    return outcomes
+
+
+def due_chains(now=None, limit=None):
+    """
+    Group the due operations by BackupJob, in creation order. The BackupJobs with a pending operation which is not
+    due yet, i.e. waiting for its next attempt, are left out in SQL, since their following operations depend on it:
+    the batch is made of due operations only, however many others are backing off.
+    """
+    now = now or timezone.now()
+    limit = limit or _setting('CUSTOM_BACKUP_OUTBOX_BATCH_SIZE', constants.DEFAULT_OUTBOX_BATCH_SIZE)
+    backing_off = TriggerOperation.objects.filter(status=TriggerOperation.STATUS_PENDING, next_attempt_time__gt=now) \
+        .values('backup_job_id')
+    due = TriggerOperation.objects.filter(status=TriggerOperation.STATUS_PENDING, next_attempt_time__lte=now) \
+        .exclude(backup_job_id__in=backing_off).order_by('creation_time', 'id')[:limit]
+    chains = OrderedDict()
+    for operation in due:
+        chains.setdefault(operation.backup_job_id, []).append(operation)
+    return list(chains.values())
+
+
+def coalesce_syncs(chains):
+    """
+    Load the batch of every shared trigger with a sync operation due. The sync operations of a shared trigger form
+    one chain and the batch is read once, at this time, so only the last operation of the chain calls Mistral: the
+    others are superseded, and recorded as done together with it. Runs before the pool, whose threads do not touch
+    the DB.
+    """
+    for chain in chains:
+        syncs = [operation for operation in chain if operation.operation == TriggerOperation.OPERATION_SYNC]
+        if not syncs:
+            continue
+        for operation in syncs[:-1]:
+            operation.superseded = True
+        last = syncs[-1]
+        last.workflow_input = dumps({'backup_jobs': shared_trigger_batch(last.project_id, last.schedule_pattern)})
+    return chains
+
+
+def drain(client_factory=mistral_api.service_client):
+    """
+    Apply the due operations of the outbox. The chains of different BackupJobs are independent, so they are
+    processed in parallel by a bounded pool of threads (CUSTOM_BACKUP_MISTRAL_CONCURRENCY). Only one drain runs at
+    a time among all the workers sharing the cache.
+
+    The lock lasts CUSTOM_BACKUP_OUTBOX_LOCK_TIMEOUT seconds and is renewed whenever a chain completes; the chains
+    not started within half of it are left to the next drain, so that the drain ends while it holds the lock.
+    :return: number of operations applied, None if another drain is running
+    """
+    lock_timeout = _setting('CUSTOM_BACKUP_OUTBOX_LOCK_TIMEOUT', constants.DEFAULT_OUTBOX_LOCK_TIMEOUT)
+    token = str(uuid4())
+    if not cache.add(DRAIN_LOCK_KEY, token, lock_timeout):
+        logger.info("Another drain of the trigger outbox is running")
+        return None
+    try:
+        chains = coalesce_syncs(due_chains())
+        if not chains:
+            return 0
+        deadline = time.time() + lock_timeout / 2.0
+        concurrency = _setting('CUSTOM_BACKUP_MISTRAL_CONCURRENCY', constants.DEFAULT_MISTRAL_CONCURRENCY)
+        pool = ThreadPool(processes=max(1, min(concurrency, len(chains))))
+        applied = 0
+        try:
+            # the outcomes are recorded as the chains complete, by this thread only
+            for outcomes in pool.imap_unordered(lambda chain: process_chain(chain, client_factory, deadline), chains):
+                if cache.get(DRAIN_LOCK_KEY) == token:
+                    cache.set(DRAIN_LOCK_KEY, token, lock_timeout)
+                for operation, trigger, error in outcomes:
+                    if error is None:
+                        _record_success(operation, trigger)
+                        applied += 1
+                    else:
+                        logger.warning("Failed {} (attempt {}): {}".format(operation, operation.attempts + 1, error))
+                        _record_failure(operation, error)
+        finally:
+            pool.close()
+            pool.join()
+        logger.info("Applied {} trigger operations".format(applied))
+        return applied
+    finally:
+        # the lock of another drain, if this one has outlived its own, is left alone
+        if cache.get(DRAIN_LOCK_KEY) == token:
+            cache.delete(DRAIN_LOCK_KEY)
+
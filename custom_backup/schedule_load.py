@@ -0,0 +1,237 @@
+"""
+Projected load of the BackupJobs: how many of them fire at each minute of the next hours or days.
+
+The schedules are expanded with NumPy over the distinct patterns, every one weighted by the number of BackupJobs
+using it, so the cost depends on the number of distinct patterns and not on the number of jobs.
+
+The occupancy of the next week, i.e. the histogram of all the BackupJobs, is cached and kept up to date by the
+BackupJob signals, so that the create wizard can suggest the least busy minute near the one chosen, see
+suggest_schedule().
+"""
+import logging
+from collections import namedtuple
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+from openstack_dashboard.dashboards.custom_backup import cron
+from openstack_dashboard.dashboards.custom_backup.cache import make_key
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+from openstack_dashboard.dashboards.custom_backup.models import BackupJob
+
+
+logger = logging.getLogger(__name__)
+
+
+# patterns expanded at once, bounds the memory used by fire_matrix to CHUNK_SIZE x minutes booleans per array
+CHUNK_SIZE = 256
+
+# histogram[i] is the number of BackupJobs firing at start + i minutes, peak_times are the minutes having the
+# peak value, at most PEAK_TIMES_SHOWN of them
+LoadProfile = namedtuple('LoadProfile', ['start', 'histogram', 'jobs', 'peak', 'peak_times'])
+PEAK_TIMES_SHOWN = 10
+
+
+def pattern_counts(project_id=None):
+    """
+    Number of BackupJobs of each schedule_pattern, grouped by the database on the schedule_pattern index
+    :param project_id: restrict the count to a project, None for all of them
+    :return: list of tuples (pattern, number of BackupJobs)
+    """
+    qs = BackupJob.objects.order_by()
+    if project_id is not None:
+        qs = qs.filter(project_id=project_id)
+    return list(qs.values('schedule_pattern').annotate(jobs=Count('id')).values_list('schedule_pattern', 'jobs'))
+
+
+def _bits(masks, size):
+    # (len(masks), size) boolean array, [i, j] is bit j of masks[i]
+    masks = np.array(masks, dtype=np.uint64)
+    return ((masks[:, np.newaxis] >> np.arange(size, dtype=np.uint64)) & np.uint64(1)).astype(bool)
+
+
+def timeline(start, minutes):
+    """
+    Calendar fields of each minute of the period, as arrays of `minutes` integers
+    :param start: naive UTC datetime, truncated to the minute
+    :return: tuple of arrays (minute, hour, day, month, weekday), weekday 0 is Sunday as in cron
+    """
+    times = np.datetime64(start.replace(second=0, microsecond=0), 'm') + np.arange(minutes)
+    epoch_minutes = times.astype(np.int64)
+    days = times.astype('datetime64[D]')
+    months = times.astype('datetime64[M]')
+    # 1970-01-01 was a Thursday
+    return (epoch_minutes % 60, epoch_minutes // 60 % 24, (days - months).astype(np.int64) + 1,
+            months.astype(np.int64) % 12 + 1, (days.astype(np.int64) + 4) % 7)
+
+
+def fire_matrix(schedules, fields):
+    """
+    :param schedules: list of cron.CronSchedule
+    :param fields: see timeline()
+    :return: (len(schedules), minutes) boolean array, [i, j] tells whether schedules[i] fires at minute j
+    """
+    minute, hour, day, month, weekday = fields
+    fires = _bits([s.minutes for s in schedules], 60)[:, minute]
+    fires &= _bits([s.hours for s in schedules], 24)[:, hour]
+    fires &= _bits([s.months for s in schedules], 13)[:, month]
+    day_match = _bits([s.days for s in schedules], 32)[:, day]
+    weekday_match = _bits([s.weekdays for s in schedules], 7)[:, weekday]
+    # cron: either the day or the weekday when both are restricted, both of them otherwise
+    either = np.array([s.day_restricted and s.weekday_restricted for s in schedules])[:, np.newaxis]
+    fires &= np.where(either, day_match | weekday_match, day_match & weekday_match)
+    return fires
+
+
+def load_histogram(counts, start, minutes):
+    """
+    :param counts: list of tuples (pattern, number of BackupJobs), see pattern_counts()
+    :return: array of `minutes` integers, the number of BackupJobs firing at each minute from start
+    """
+    fields = timeline(start, minutes)
+    histogram = np.zeros(minutes, dtype=np.int64)
+    valid = []
+    for pattern, jobs in counts:
+        try:
+            valid.append((cron.schedule(pattern), jobs))
+        except cron.CronError as e:
+            logger.warning("Skipping schedule {}: {}".format(pattern, e))
+    for offset in range(0, len(valid), CHUNK_SIZE):
+        chunk = valid[offset:offset + CHUNK_SIZE]
+        weights = np.array([jobs for _schedule, jobs in chunk], dtype=np.int64)
+        histogram += weights.dot(fire_matrix([schedule for schedule, _jobs in chunk], fields))
+    return histogram
+
+
+def load_profile(start, minutes, project_id=None):
+    """
+    :param start: naive UTC datetime
+    :param minutes: length of the period, e.g. 24 * 60
+    :return: LoadProfile
+    """
+    start = start.replace(second=0, microsecond=0)
+    counts = pattern_counts(project_id)
+    histogram = load_histogram(counts, start, minutes)
+    peak = int(histogram.max()) if minutes else 0
+    peak_times = [start + timedelta(minutes=int(i)) for i in np.flatnonzero(histogram == peak)[:PEAK_TIMES_SHOWN]] \
+        if peak else []
+    return LoadProfile(start, histogram, sum(jobs for _pattern, jobs in counts), peak, peak_times)
+
+
+OCCUPANCY_KEY = make_key('schedule_load', 'occupancy')
+OCCUPANCY_LOCK_KEY = make_key('schedule_load', 'occupancy', 'lock')
+OCCUPANCY_DAYS = 7
+
+# pattern is the suggested one, peak the BackupJobs which would start at its busiest minute, the new one included,
+# requested_peak the same for the requested pattern
+StaggerSuggestion = namedtuple('StaggerSuggestion', ['pattern', 'offset', 'peak', 'requested_peak'])
+
+
+def _occupancy_ttl():
+    return getattr(settings, 'CUSTOM_BACKUP_OCCUPANCY_TTL', constants.DEFAULT_OCCUPANCY_TTL)
+
+
+def occupancy():
+    """
+    Histogram of the fire times of all the BackupJobs, of every project since they share the storage, over the
+    OCCUPANCY_DAYS days from the current hour. It is cached for CUSTOM_BACKUP_OCCUPANCY_TTL seconds, then it is
+    rebuilt on a window starting later; in the meantime pattern_changed() keeps it up to date.
+    :return: dictionary {'start': datetime, 'expires': datetime, 'counts': {pattern: BackupJobs}, 'histogram': array}
+    """
+    entry = cache.get(OCCUPANCY_KEY)
+    if entry is not None:
+        return entry
+    now = timezone.now().replace(tzinfo=None)
+    start = now.replace(minute=0, second=0, microsecond=0)
+    counts = dict(pattern_counts())
+    entry = {
+        'start': start,
+        'expires': now + timedelta(seconds=_occupancy_ttl()),
+        'counts': counts,
+        'histogram': load_histogram(list(counts.items()), start, OCCUPANCY_DAYS * 24 * 60),
+    }
+    cache.set(OCCUPANCY_KEY, entry, _occupancy_ttl())
+    return entry
+
+
+def pattern_changed(old_pattern, new_pattern):
+    """
+    Move a BackupJob from old_pattern to new_pattern inside the cached occupancy: None stands for a created or a
+    deleted BackupJob. When another worker is updating the occupancy it is dropped instead, to be rebuilt.
+    """
+    if old_pattern == new_pattern or cache.get(OCCUPANCY_KEY) is None:
+        return
+    if not cache.add(OCCUPANCY_LOCK_KEY, 1, 10):
+        cache.delete(OCCUPANCY_KEY)
+        return
+    try:
+        entry = cache.get(OCCUPANCY_KEY)
+        if entry is None:
+            return
+        fields = timeline(entry['start'], len(entry['histogram']))
+        for pattern, delta in ((old_pattern, -1), (new_pattern, 1)):
+            if pattern is None:
+                continue
+            entry['counts'][pattern] = entry['counts'].get(pattern, 0) + delta
+            try:
+                entry['histogram'] += delta * fire_matrix([cron.schedule(pattern)], fields)[0]
+            except cron.CronError:
+                pass
+        ttl = int((entry['expires'] - timezone.now().replace(tzinfo=None)).total_seconds())
+        if ttl > 0:
+            cache.set(OCCUPANCY_KEY, entry, ttl)
+        else:
+            cache.delete(OCCUPANCY_KEY)
+    finally:
+        cache.delete(OCCUPANCY_LOCK_KEY)
+
+
+def _shifted_patterns(pattern, max_offset):
+    # (offset, pattern) of the patterns firing `offset` minutes after pattern, for every offset within max_offset;
+    # only a single minute can be shifted, and across hours only a single hour, without leaving the day
+    fields = cron.split_pattern(pattern)
+    if not fields['minute'].isdigit():
+        return []
+    minute = int(fields['minute'])
+    hour = int(fields['hour']) if fields['hour'].isdigit() else None
+    shifted = []
+    for offset in range(-max_offset, max_offset + 1):
+        if hour is None:
+            if not 0 <= minute + offset < 60:
+                continue
+            shifted.append((offset, cron.join_pattern(**dict(fields, minute=minute + offset))))
+        else:
+            hour_shift, new_minute = divmod(minute + offset, 60)
+            if not 0 <= hour + hour_shift < 24:
+                continue
+            shifted.append((offset, cron.join_pattern(**dict(fields, minute=new_minute, hour=hour + hour_shift))))
+    return shifted
+
+
+def suggest_schedule(pattern, max_offset=None):
+    """
+    Among the patterns firing up to max_offset minutes before or after `pattern`, find the one whose busiest fire
+    time has the fewest BackupJobs, see occupancy(); ties go to the fewest BackupJobs over all the fire times, then
+    to the nearest pattern.
+    :param max_offset: minutes, CUSTOM_BACKUP_STAGGER_RANGE by default
+    :return: StaggerSuggestion, None if the pattern cannot be shifted (its minute is not a single value)
+    :raise CronError: invalid pattern
+    """
+    if max_offset is None:
+        max_offset = getattr(settings, 'CUSTOM_BACKUP_STAGGER_RANGE', constants.DEFAULT_STAGGER_RANGE)
+    candidates = _shifted_patterns(pattern, max_offset)
+    if not candidates:
+        return None
+    entry = occupancy()
+    histogram = entry['histogram']
+    fires = fire_matrix([cron.schedule(candidate) for _offset, candidate in candidates],
+                        timeline(entry['start'], len(histogram)))
+    peaks = np.where(fires, histogram, 0).max(axis=1)
+    totals = fires.dot(histogram)
+    distances = np.abs([offset for offset, _candidate in candidates])
+    best = np.lexsort((distances, totals, peaks))[0]
+    requested = [offset for offset, _candidate in candidates].index(0)
+    return StaggerSuggestion(candidates[best][1], candidates[best][0], int(peaks[best]) + 1,
+                             int(peaks[requested]) + 1)
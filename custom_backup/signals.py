@@ -0,0 +1,135 @@
+import logging
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from openstack_dashboard.dashboards.custom_backup import schedule_load
+from openstack_dashboard.dashboards.custom_backup.cache import bump_version
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+from openstack_dashboard.dashboards.custom_backup.models import BackupJob, BackupJobSummary, Notification
+from openstack_dashboard.dashboards.custom_backup.utils import workflow_input_summary
+
+
+logger = logging.getLogger(__name__)
+
+
+# scope of the notifications without project, which are visible from every project
+SHARED_SCOPE = 'shared'
+
+
+def notifications_scope(project_id):
+    """
+    Version scope of the notification lists of a project, see db_api.notification_choices
+    """
+    return 'notifications', project_id or SHARED_SCOPE
+
+
+def object_scope(model, pk):
+    """
+    Version scope of a single object, see db_api.cached_notification and db_api.cached_backup_job
+    """
+    return model.__name__.lower(), pk
+
+
+def invalidate(scopes, using=None):
+    """
+    Bump the versions of the scopes now and again when the current transaction commits: a reader which runs
+    in between still sees the old rows and could cache them under the new version, the second bump drops them.
+    Outside of a transaction on_commit() runs the callback immediately.
+    """
+    def bump():
+        for scope in scopes:
+            bump_version(*scope)
+    bump()
+    transaction.on_commit(bump, using=using)
+
+
+@receiver(post_save, sender=Notification, dispatch_uid='custom_backup_notification_saved')
+@receiver(post_delete, sender=Notification, dispatch_uid='custom_backup_notification_deleted')
+def notification_changed(sender, instance, using=None, **kwargs):
+    invalidate([notifications_scope(instance.project_id), object_scope(Notification, instance.id)], using)
+
+
+@receiver(post_save, sender=BackupJob, dispatch_uid='custom_backup_backup_job_saved')
+@receiver(post_delete, sender=BackupJob, dispatch_uid='custom_backup_backup_job_deleted')
+def backup_job_changed(sender, instance, using=None, **kwargs):
+    invalidate([object_scope(BackupJob, instance.id)], using)
+
+
+@receiver(post_save, sender=BackupJob, dispatch_uid='custom_backup_backup_job_schedule_saved')
+def backup_job_schedule_saved(sender, instance, created, using=None, update_fields=None, **kwargs):
+    if update_fields is not None and 'schedule_pattern' not in update_fields:
+        return
+    old_pattern = None if created else getattr(instance, 'saved_schedule_pattern', None)
+    if not created and old_pattern is None:
+        # not loaded from the DB, e.g. built by hand: the previous pattern is unknown
+        transaction.on_commit(lambda: cache.delete(schedule_load.OCCUPANCY_KEY), using=using)
+    elif old_pattern != instance.schedule_pattern:
+        new_pattern = instance.schedule_pattern
+        transaction.on_commit(lambda: schedule_load.pattern_changed(old_pattern, new_pattern), using=using)
+    instance.saved_schedule_pattern = instance.schedule_pattern
+
+
+@receiver(post_delete, sender=BackupJob, dispatch_uid='custom_backup_backup_job_schedule_deleted')
+def backup_job_schedule_deleted(sender, instance, using=None, **kwargs):
+    old_pattern = instance.schedule_pattern
+    transaction.on_commit(lambda: schedule_load.pattern_changed(old_pattern, None), using=using)
+
+
+# BackupJob fields whose BackupJobSummary column has another name, see summary_fields
+SUMMARY_SOURCES = {
+    'workflow_input': ('workflow_input_summary', ),
+    'notification': ('notification_id', 'notification_name'),
+}
+
+
+def summary_fields(backup_job, update_fields=None):
+    """
+    BackupJobSummary columns copied from the BackupJob, trigger_state aside, see db_api.update_trigger_state
+    :param update_fields: the BackupJob fields saved, None for all of them: only the columns copied from them
+        are read, so that a partial save does not load the deferred fields nor the notification
+    """
+    getters = {
+        'name': lambda: backup_job.name,
+        'project_id': lambda: backup_job.project_id,
+        'schedule_pattern': lambda: backup_job.schedule_pattern,
+        'workflow_input_summary': lambda: workflow_input_summary(backup_job.workflow_input),
+        'notification_id': lambda: backup_job.notification_id,
+        'notification_name': lambda: backup_job.notification.name if backup_job.notification_id else None,
+        'cron_trigger_id': lambda: backup_job.cron_trigger_id,
+        'next_run_at': lambda: backup_job.next_run_at,
+        'metadata_key': lambda: backup_job.metadata_key,
+        'backup_type': lambda: backup_job.backup_type,
+        'creation_time': lambda: backup_job.creation_time,
+        'update_time': lambda: backup_job.update_time,
+    }
+    columns = set(getters)
+    if update_fields is not None:
+        columns = set(update_fields)
+        for field in update_fields:
+            columns.update(SUMMARY_SOURCES.get(field, ()))
+    return dict((column, getter()) for column, getter in getters.items() if column in columns)
+
+
+@receiver(post_save, sender=BackupJob, dispatch_uid='custom_backup_backup_job_summary_saved')
+def backup_job_summary_saved(sender, instance, created, using=None, update_fields=None, **kwargs):
+    # the summary is deleted together with the BackupJob, by the cascade of its one-to-one key
+    summaries = BackupJobSummary.objects.using(using)
+    if update_fields is not None:
+        fields = summary_fields(instance, update_fields)
+        if fields:
+            summaries.filter(backup_job_id=instance.id).update(**fields)
+        return
+    fields = summary_fields(instance)
+    if created:
+        summaries.create(backup_job_id=instance.id, **fields)
+    elif not summaries.filter(backup_job_id=instance.id).update(**fields):
+        summaries.create(backup_job_id=instance.id, trigger_state=constants.TRIGGER_STATE_UNKNOWN, **fields)
+
+
+@receiver(post_save, sender=Notification, dispatch_uid='custom_backup_notification_summary_saved')
+def notification_summary_saved(sender, instance, created, using=None, update_fields=None, **kwargs):
+    # a Notification linked to BackupJobs cannot be deleted, see db_api.delete_notification
+    if not created and (update_fields is None or 'name' in update_fields):
+        BackupJobSummary.objects.using(using).filter(notification_id=instance.id) \
+            .update(notification_name=instance.name)
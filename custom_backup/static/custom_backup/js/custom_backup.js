@@ -50,12 +50,137 @@ FieldWrapper.prototype.resetInput = function(val) {
     }
 }
 
+// The options of the instance select are not rendered by the server: they are loaded page by page from the
+// jobs:instances endpoint, filtered by the text typed inside the search input, the first time the select is shown
+class InstancePicker {
+    constructor(searchId, selectId, moreId) {
+        this._search = new FieldWrapper(searchId);
+        this._select = new FieldWrapper(selectId);
+        this._more = new FieldWrapper(moreId);
+        this._url = this._search.elem.getAttribute('data-url');
+        this._timer = null;
+        this._marker = null;
+        this._loaded = false;
+    }
+}
+
+InstancePicker.prototype.bind = function() {
+    let picker = this;
+    this._search.elem.oninput = function() {
+        clearTimeout(picker._timer);
+        picker._timer = setTimeout(function() { picker.load(false); }, 300);
+    };
+    this._more.onclick = function() {
+        picker.load(true);
+        return false;
+    };
+}
+InstancePicker.prototype.loadOnce = function() {
+    if (this._loaded) return;
+    this._loaded = true;
+    this.load(false);
+}
+InstancePicker.prototype.load = function(append) {
+    let picker = this;
+    let url = this._url + '?q=' + encodeURIComponent(this._search.val);
+    if (append && this._marker !== null) {
+        url += '&marker=' + encodeURIComponent(this._marker);
+    }
+    fetch(url, {credentials: 'same-origin'})
+        .then(function(response) { return response.json(); })
+        .then(function(page) { picker.render(page, append); })
+        .catch(function(error) { console.log("Error: unable to load the instances", error); });
+}
+InstancePicker.prototype.render = function(page, append) {
+    let select = this._select.elem;
+    let results = page.results || [];
+    if (! append) {
+        // a new search replaces the options, but the selected ones
+        for (let option of Array.from(select.options)) {
+            if (! option.selected) {
+                select.removeChild(option);
+            }
+        }
+    }
+    for (let instance of results) {
+        let option = Array.from(select.options).find(function(o) { return o.value === instance.id; });
+        if (option === undefined) {
+            option = document.createElement('option');
+            option.value = instance.id;
+            select.appendChild(option);
+        }
+        option.text = instance.text;
+    }
+    this._marker = results.length ? results[results.length - 1].id : null;
+    if (page.more) {
+        this._more.show();
+    } else {
+        this._more.hide();
+    }
+}
+
+// Asks the jobs:stagger endpoint for a nearby schedule with fewer backups starting at the same minute, every
+// time a field of the schedule step changes, and offers to apply it
+class StaggerAdvisor {
+    constructor(boxId) {
+        this._box = new FieldWrapper(boxId);
+        this._text = document.getElementById('stagger-text');
+        this._apply = document.getElementById('stagger-apply');
+        this._url = this._box.elem.getAttribute('data-url');
+        this._fields = ['minute', 'hour', 'day', 'month', 'weekday'];
+        this._suggestion = null;
+    }
+}
+
+StaggerAdvisor.prototype.bind = function() {
+    let advisor = this;
+    for (let name of this._fields) {
+        document.getElementById('id_' + name).onchange = function() { advisor.load(); };
+    }
+    this._apply.onclick = function() {
+        if (advisor._suggestion !== null) {
+            document.getElementById('id_minute').value = advisor._suggestion.minute;
+            document.getElementById('id_hour').value = advisor._suggestion.hour;
+            advisor._box.hide();
+        }
+        return false;
+    };
+}
+StaggerAdvisor.prototype.load = function() {
+    let advisor = this;
+    let query = this._fields.map(function(name) {
+        return name + '=' + encodeURIComponent(document.getElementById('id_' + name).value);
+    }).join('&');
+    fetch(this._url + '?' + query, {credentials: 'same-origin'})
+        .then(function(response) { return response.json(); })
+        .then(function(suggestion) { advisor.render(suggestion); })
+        .catch(function(error) { console.log("Error: unable to suggest a schedule", error); });
+}
+StaggerAdvisor.prototype.render = function(suggestion) {
+    if (! suggestion.pattern || suggestion.offset === 0) {
+        this._suggestion = null;
+        this._box.hide();
+        return;
+    }
+    this._suggestion = suggestion;
+    this._text.textContent = 'Up to ' + suggestion.requested_peak + ' backups would start together. Moving it to "' +
+        suggestion.pattern + '" lowers them to ' + suggestion.peak + '.';
+    this._box.show();
+}
+
 // TODO to rename
 function InputHandler() {
     let metadataBtn = new FieldWrapper('metadata-btn');
     let metadataRow = new FieldWrapper('metadata-row');
     let instanceBtn = new FieldWrapper('instance-btn');
     let instanceRow = new FieldWrapper('instance-row');
+    let instancePicker = new InstancePicker('instance-search', 'id_instance', 'instance-more');
+    instancePicker.bind();
+    if (instanceRow.isVisible) instancePicker.loadOnce();
+    // only the create wizard has the suggestion box
+    if (document.getElementById('stagger-suggestion') !== null) {
+        new StaggerAdvisor('stagger-suggestion').bind();
+    }
 
     metadataBtn.onclick = function(){
         if (metadataRow.isVisible) return;
@@ -66,6 +191,7 @@ function InputHandler() {
     instanceBtn.onclick = function(){
         if (instanceRow.isVisible) return;
         instanceRow.show();
+        instancePicker.loadOnce();
         metadataRow.hide();
 //        TODO: is it correct to reset the input after hiding the element
 //        metadataRow.resetInput();
@@ -1,4 +1,4 @@
-
+from openstack_dashboard.dashboards.custom_backup.models import BackupJob, Notification
 
 
 class MockNovaServerElement(object):
@@ -16,3 +16,42 @@ class MockTriggerObject(object):
     name = 'Email notification to admin'
 
 
+class FakeUser(object):
+    tenant_id = '10'
+
+
+class FakeRequest(object):
+    def __init__(self, tenant_id='10', is_superuser=False, GET=None):
+        self.user = FakeUser()
+        self.user.tenant_id = tenant_id
+        self.user.is_superuser = is_superuser
+        self.session = {}
+        self.GET = GET or {}
+
+
+class FakeTrigger(object):
+    def __init__(self, name, workflow_input='{}', pattern='* * * * *', project_id='10'):
+        self.id = name
+        self.name = name
+        self.pattern = pattern
+        self.workflow_input = workflow_input
+        self.project_id = project_id
+        self.next_execution_time = '2019-06-17 10:00:00'
+
+
+def create_notification(name, project_id=None, **kwargs):
+    """
+    A Notification of the given project, or shared by all the projects when project_id is None
+    """
+    fields = {'sender_address': 'sender@email.com', 'recipient_address': 'recipient@email.com',
+              'smtp_server': '1.1.1.1', 'openstack_url': 'http://website.com'}
+    fields.update(kwargs)
+    return Notification.objects.create(name=name, project_id=project_id, **fields)
+
+
+def create_job(name, workflow_input='{}', schedule_pattern='* * * * *', project_id='10', **kwargs):
+    """
+    A BackupJob saved straight into the database: unlike db_api.create_backup_job, no TriggerOperation is enqueued
+    """
+    return BackupJob.objects.create(name=name, workflow_input=workflow_input, schedule_pattern=schedule_pattern,
+                                    project_id=project_id, **kwargs)
@@ -1,6 +1,7 @@
 from json import dumps, loads
 from uuid import uuid1
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils import timezone
 from django.test import RequestFactory
 
@@ -8,8 +9,7 @@ from mock import patch, MagicMock
 from django.core.urlresolvers import reverse
 from openstack_dashboard.test.helpers import TestCase, APITestCase
 
-from openstack_dashboard.dashboards.custom_backup.models import BackupJob, Notification
-from openstack_dashboard.dashboards.custom_backup.tests import MockTriggerObject
+from openstack_dashboard.dashboards.custom_backup.models import BackupJob, Notification, TriggerOperation
 from openstack_dashboard.dashboards.custom_backup.jobs.tables import DeleteBackupJob
 from openstack_dashboard.dashboards.custom_backup.notifications.tables import DeleteNotification
 
@@ -36,66 +36,95 @@ class BackupWorkflowTestCase(TestCase):
             schedule_pattern="* * * * *",
             creation_time=timezone.now(),
             cron_trigger_id=str(uuid1()),
-            project_id=10,
+            project_id=self.tenant.id,
             notification=None
         )
 
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.create_cron_trigger', return_value=MockTriggerObject())
-    def test_backup_clone_unique_name_case(self, create_cron_trigger):
-        """"""
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
+    def test_backup_clone_unique_name_case(self, service_client):
+        """The cron-trigger is not created by the request, its creation is enqueued into the outbox"""
         self.client.post(
             reverse('horizon:custom_backup:jobs:clone', args=[self.backup_job.id]),
             data={'name': 'this is a clone'}
         )
-        create_cron_trigger.assert_called()
-        self.assertTrue(BackupJob.objects.filter(name='this is a clone').exists())
-
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.create_cron_trigger', return_value=MockTriggerObject())
-    def test_backup_clone_same_name_case(self, create_cron_trigger):
+        service_client.assert_not_called()
+        clone = BackupJob.objects.get(name='this is a clone')
+        operation = TriggerOperation.objects.get(backup_job_id=clone.id)
+        self.assertEqual((operation.operation, operation.trigger_name, operation.status),
+                         (TriggerOperation.OPERATION_CREATE, 'Cron Trigger for Backup this is a clone',
+                          TriggerOperation.STATUS_PENDING))
+
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
+    def test_backup_clone_same_name_case(self, service_client):
         """"""
         self.client.post(
             reverse('horizon:custom_backup:jobs:clone', args=[self.backup_job.id]),
             data={'name': 'New BackupJob'}
         )
-        create_cron_trigger.assert_not_called()
+        service_client.assert_not_called()
         self.assertEqual(BackupJob.objects.filter(name='New BackupJob').count(), 1)
+        self.assertFalse(TriggerOperation.objects.exists())
 
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.delete_cron_trigger', return_value=True)
-    def test_backup_delete(self, delete_cron_trigger):
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
+    def test_backup_delete(self, service_client):
         """
-        There is not need to mock Nova call, because no-one is made, instead by mocking the above method, we avoid
-        call to Mistral. Instead we keep connection to DB up
+        There is not need to mock Nova call, because no-one is made. Mistral is not called either: the deletion of
+        the cron-trigger is enqueued into the outbox
         """
         DeleteBackupJob().action(self.request, self.backup_job.id)
-        delete_cron_trigger.assert_called()
+        service_client.assert_not_called()
         self.assertRaises(BackupJob.DoesNotExist, self.backup_job.refresh_from_db)
+        operation = TriggerOperation.objects.get(backup_job_id=self.backup_job.id)
+        self.assertEqual((operation.operation, operation.trigger_name),
+                         (TriggerOperation.OPERATION_DELETE, 'Cron Trigger for Backup New BackupJob'))
+
+    @patch('openstack_dashboard.dashboards.custom_backup.jobs.views.search_instances',
+           return_value={'instances': [(str(uuid1()), 'web-1')], 'more': True})
+    def test_instance_search(self, search_instances):
+        response = self.client.get(reverse('horizon:custom_backup:jobs:instances'), {'q': ' web ', 'marker': ''})
+        search_instances.assert_called_once_with(response.wsgi_request, query='web', marker=None)
+        page = loads(response.content)
+        self.assertEqual([instance['text'] for instance in page['results']], ['web-1'])
+        self.assertTrue(page['more'])
 
 
 class NovaMockBackupWorkflowTestCase(APITestCase):
 
     def setUp(self):
         super(NovaMockBackupWorkflowTestCase, self).setUp()
+        # the picked instances are cached, see db_api.instance_names
+        cache.clear()
         self.servers_list = self.servers.list()
-        novaclient = self.stub_novaclient()
-        novaclient.servers = self.mox.CreateMockAnything()
-        novaclient.versions = self.mox.CreateMockAnything()
-        novaclient.versions.get_current().AndReturn("2.45")
-        novaclient.servers.list(True, {'all_tenants': True}).AndReturn(self.servers_list)
+        self.novaclient = self.stub_novaclient()
+        self.novaclient.servers = self.mox.CreateMockAnything()
+        self.novaclient.versions = self.mox.CreateMockAnything()
+        self.novaclient.versions.get_current().MultipleTimes().AndReturn("2.45")
+
+    def _expect_server_gets(self, servers):
+        # only the instances of the form are read, one by one
+        for server in servers:
+            self.novaclient.servers.get(server.id).AndReturn(server)
         self.mox.ReplayAll()
 
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.create_cron_trigger', return_value=MockTriggerObject())
-    def test_backup_create(self, create_cron_trigger):
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
+    def test_backup_create(self, service_client):
         """
         Perform an API call to a mocked Nova backend, while Mistral API are mocked, create a new object in the Database
         """
+        self._expect_server_gets(self.servers_list[:1])
         payload = {'name': 'integration backup', 'instance': self.servers_list[0].id}
         self.client.post(reverse('horizon:custom_backup:jobs:create'), data=payload)
+        service_client.assert_not_called()
         self.assertEqual(BackupJob.objects.count(), 1)
-        self.assertEqual(BackupJob.objects.first().name, 'integration backup')
-
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.delete_cron_trigger', return_value=True)
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.create_cron_trigger', return_value=MockTriggerObject())
-    def test_backup_update(self, cron_trigger, delete_cron_trigger):
+        backup_job = BackupJob.objects.first()
+        self.assertEqual(backup_job.name, 'integration backup')
+        operation = TriggerOperation.objects.get(backup_job_id=backup_job.id)
+        self.assertEqual((operation.operation, operation.trigger_name, operation.project_id),
+                         (TriggerOperation.OPERATION_CREATE, 'Cron Trigger for Backup integration backup',
+                          self.tenant.id))
+
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
+    def test_backup_update(self, service_client):
         notification = Notification.objects.create(**{
             'name': 'new_notification', 'sender_address': 'sender@email.com', 'recipient_address': 'recipient@email.com',
             'smtp_server': '1.1.1.1', 'openstack_url': 'http://website.com'
@@ -119,19 +148,24 @@ class NovaMockBackupWorkflowTestCase(APITestCase):
             schedule_pattern="* * * * *",
             creation_time=timezone.now(),
             cron_trigger_id=str(uuid1()),
-            project_id=10,
+            project_id=self.tenant.id,
             notification=None
         )
 
+        # the label of the selected instance, then the validation of the new one
+        self._expect_server_gets(self.servers_list[:2])
         workflow_before = loads(new_backup_job.workflow_input)
         self.client.post(
             reverse('horizon:custom_backup:jobs:update', args=[new_backup_job.id]),
             data={'name': new_backup_job.name ,'instance': self.servers_list[1].id, 'notification': notification.id}
         )
-        delete_cron_trigger.assert_called()
+        service_client.assert_not_called()
         new_backup_job.refresh_from_db()
         self.assertNotEqual(new_backup_job.workflow_input, workflow_before)
         self.assertEqual(new_backup_job.notification, notification)
+        operation = TriggerOperation.objects.get(backup_job_id=new_backup_job.id)
+        self.assertEqual(operation.operation, TriggerOperation.OPERATION_REPLACE)
+        self.assertEqual(operation.old_trigger_name, operation.trigger_name)
 
 
 class NotificationWorkflowTestCase(TestCase):
@@ -149,7 +183,7 @@ class NotificationWorkflowTestCase(TestCase):
         notification = Notification.objects.create(**{
             'name': 'new_notification', 'sender_address': 'sender@email.com',
             'recipient_address': 'recipient@email.com', 'smtp_server': '1.1.1.1',
-            'openstack_url': 'http://website.com'
+            'openstack_url': 'http://website.com', 'project_id': self.tenant.id
         })
         self.client.post(
             reverse('horizon:custom_backup:notifications:update', args=[notification.id]),
@@ -157,12 +191,26 @@ class NotificationWorkflowTestCase(TestCase):
         )
         self.assertTrue(Notification.objects.filter(name='modified name').exists())
 
+    def test_shared_notification_is_read_only(self):
+        notification = Notification.objects.create(**{
+            'name': 'shared_notification', 'sender_address': 'sender@email.com',
+            'recipient_address': 'recipient@email.com', 'smtp_server': '1.1.1.1',
+            'openstack_url': 'http://website.com'
+        })
+        response = self.client.post(
+            reverse('horizon:custom_backup:notifications:update', args=[notification.id]),
+            data={'name': 'modified name', 'recipient_address': 'intruder@email.com'}
+        )
+        self.assertEqual(response.status_code, 404)
+        notification.refresh_from_db()
+        self.assertEqual(notification.recipient_address, 'recipient@email.com')
+
     def test_notification_update_same_name(self):
         for i in range(2):
             Notification.objects.create(**{
                 'name': "new-notification-{}".format(i), 'sender_address': 'sender@email.com',
                 'recipient_address': 'recipient@email.com', 'smtp_server': '1.1.1.1',
-                'openstack_url': 'http://website.com'
+                'openstack_url': 'http://website.com', 'project_id': self.tenant.id
             })
 
         self.client.post(
@@ -197,7 +245,7 @@ class NotificationWorkflowTestCase(TestCase):
             schedule_pattern="* * * * *",
             creation_time=timezone.now(),
             cron_trigger_id=str(uuid1()),
-            project_id=10,
+            project_id=self.tenant.id,
             notification=notification
         )
         # import pdb;pdb.set_trace()
@@ -0,0 +1,18 @@
+from django.core.cache import cache
+from django.test import TestCase
+from mock import MagicMock
+from openstack_dashboard.dashboards.custom_backup.cache import coalesced_get
+
+
+class CoalescedGetTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follower_returns_stale_copy_while_leader_loads(self):
+        coalesced_get('key', lambda: 'old', ttl=60)
+        cache.delete('key')
+        cache.add('key:lock', 1)
+        loader = MagicMock(return_value='new')
+        self.assertEqual(coalesced_get('key', loader, ttl=60), 'old')
+        loader.assert_not_called()
@@ -0,0 +1,63 @@
+from datetime import date, datetime
+from unittest import TestCase
+
+from openstack_dashboard.dashboards.custom_backup import cron
+
+
+class CronTestCase(TestCase):
+
+    def test_compile_pattern(self):
+        schedule = cron.compile_pattern('1-10/3,30 */6 1 1-12/6 7')
+        self.assertEqual(schedule.minutes, (1 << 1) | (1 << 4) | (1 << 7) | (1 << 10) | (1 << 30))
+        self.assertEqual(schedule.hours, (1 << 0) | (1 << 6) | (1 << 12) | (1 << 18))
+        self.assertEqual(schedule.months, (1 << 1) | (1 << 7))
+        # Sunday is 0
+        self.assertEqual(schedule.weekdays, 1)
+        self.assertTrue(schedule.day_restricted and schedule.weekday_restricted)
+
+    def test_invalid_patterns(self):
+        for pattern in ('* * * *', '60 * * * *', '* * 0 * *', '5-1 * * * *', '*/0 * * * *', 'a * * * *', None):
+            self.assertRaises(cron.CronError, cron.compile_pattern, pattern)
+
+    def test_fires_on(self):
+        # 2026-01-01 is a Thursday
+        self.assertTrue(cron.fires_on(cron.compile_pattern('0 0 * * 4'), date(2026, 1, 1)))
+        self.assertFalse(cron.fires_on(cron.compile_pattern('0 0 2 * *'), date(2026, 1, 1)))
+        # day and weekday restricted: either matches
+        self.assertTrue(cron.fires_on(cron.compile_pattern('0 0 2 * 4'), date(2026, 1, 1)))
+        self.assertFalse(cron.fires_on(cron.compile_pattern('0 0 * 2 *'), date(2026, 1, 1)))
+
+    def test_collide(self):
+        start = date(2026, 1, 1)
+        compiled = cron.compile_pattern
+        self.assertTrue(cron.collide(compiled('0 0 * * *'), compiled('55 23 * * *'), 10, start, 7))
+        self.assertFalse(cron.collide(compiled('0 0 * * *'), compiled('45 23 * * *'), 10, start, 7))
+        self.assertFalse(cron.collide(compiled('0 0 * * 1'), compiled('55 23 * * 1'), 10, start, 7))
+        self.assertTrue(cron.collide(compiled('55 23 * * 1'), compiled('0 0 * * 2'), 10, start, 7))
+        # the 1st of a month is never a Wednesday in January 2026
+        self.assertFalse(cron.collide(compiled('0 2 1 * *'), compiled('5 2 * * 3'), 10, start, 30))
+
+    def test_next_fires(self):
+        after = datetime(2026, 1, 30, 23, 50, 30)
+        self.assertEqual(cron.next_fires('*/15 * * * *', after, 2), [datetime(2026, 1, 31, 0, 0),
+                                                                  datetime(2026, 1, 31, 0, 15)])
+        self.assertEqual(cron.next_fires('0 2 31 * *', after, 3), [datetime(2026, 1, 31, 2, 0),
+                                                                datetime(2026, 3, 31, 2, 0),
+                                                                datetime(2026, 5, 31, 2, 0)])
+        # the 13th or Fridays, not Fridays 13th
+        self.assertEqual(cron.next_fires('0 0 13 * 5', after, 3), [datetime(2026, 2, 6), datetime(2026, 2, 13),
+                                                                datetime(2026, 2, 20)])
+        # the 1st of the month or Mondays
+        self.assertEqual(cron.next_fires('30 8 1 * 1', after, 3), [datetime(2026, 2, 1, 8, 30),
+                                                                datetime(2026, 2, 2, 8, 30),
+                                                                datetime(2026, 2, 9, 8, 30)])
+        self.assertEqual(cron.next_fires('0 12 29 2 *', after, 1), [datetime(2028, 2, 29, 12, 0)])
+        self.assertEqual(cron.next_fires('0 0 30 2 *', after, 1), [])
+
+    def test_schedule_cache_and_fields(self):
+        self.assertIs(cron.schedule('0 2 * * *'), cron.schedule('0 2 * * *'))
+        self.assertEqual(cron.split_pattern('0 2 * * 1-5'),
+                         {'minute': '0', 'hour': '2', 'day': '*', 'month': '*', 'weekday': '1-5'})
+        self.assertEqual(cron.join_pattern(minute='0', hour='2', day=''), '0 2 * * *')
+        self.assertEqual(cron.join_pattern(minute=0, hour=0, day=None), '0 0 * * *')
+        self.assertRaises(cron.CronError, cron.join_pattern, minute='61')
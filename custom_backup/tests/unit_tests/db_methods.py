@@ -1,15 +1,23 @@
-from json import loads
+from importlib import import_module
+from datetime import timedelta
+from json import dumps
+from novaclient import exceptions as nova_exceptions
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
 from django.core.exceptions import MultipleObjectsReturned
 from mock import patch, MagicMock
-from mistralclient.api.base import APIException
-from openstack_dashboard.dashboards.custom_backup.db_api import Notification
-from openstack_dashboard.dashboards.custom_backup.db_api import create_cron_trigger, update_cron_trigger, \
-    delete_cron_trigger, get_backup_jobs_of_notification, delete_backup_job, delete_notification
-
-
-class FakeRequest(object):
-    """"""
+from openstack_dashboard.dashboards.custom_backup.db_api import BackupJob, Notification
+from openstack_dashboard.dashboards.custom_backup.db_api import get_backup_jobs_of_notification, delete_backup_job, \
+    delete_notification, paginate_notifications, parse_date_range, list_notifications, backup_job_name_exists, \
+    delete_backup_jobs, create_backup_job, enqueue_trigger_creation, find_drifts, index_triggers, repair_drifts, \
+    search_instances, instance_names, request_backup_job, notification_choices, cached_notification, \
+    cached_backup_job, set_cron_trigger_id, find_schedule_conflicts, paginate_job_summaries, NotificationRow, \
+    CONFLICT_DUPLICATE, CONFLICT_OVERLAP
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+from openstack_dashboard.dashboards.custom_backup.models import TriggerOperation, BackupJobSummary
+from openstack_dashboard.dashboards.custom_backup.tests import FakeUser, FakeRequest, FakeTrigger, \
+    create_notification, create_job
 
 
 class FakeBackUpJob(object):
@@ -30,83 +38,37 @@ class TriggerMethodsTestCase(TestCase):
 
     def setUp(self):
         self.request = FakeRequest()
-        self.default_cron_schedule = '* * * * *'
-        self.backup_job_name = 'test-trigger'
-
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.api.cron_trigger_create')
-    def test_create_cron_trigger_case_1(self, mocked_method):
-        expected_trigger_name = "Cron Trigger for Backup {}".format(self.backup_job_name)
-        create_cron_trigger(self.request, self.backup_job_name, {}, self.default_cron_schedule)
-        mocked_method.assert_called_with(
-            self.request,
-            expected_trigger_name,
-            'custom_instance_backup.custom_instance_backup',
-            {},
-            '',
-            self.default_cron_schedule,
-            None,
-            None
-        )
-
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.api.cron_trigger_delete')
-    def test_delete_cron_trigger_case_1(self, mocked_method):
-        delete_cron_trigger(self.request, self.backup_job_name)
-        mocked_method.assert_called_with(self.request, "Cron Trigger for Backup {}".format(self.backup_job_name))
-
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.delete_cron_trigger')
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.create_cron_trigger')
-    def test_update_cron_trigger_case_1(self, create_method, delete_method):
-        """
-        By mocking the delete_cron_trigger/create_cron_trigger methods we are implicitly mocking the mistral.api
-        methods
-        """
-        backup_job = FakeBackUpJob()
-        update_cron_trigger(self.request, backup_job, 'new-name')
-        delete_method.assert_called_with(self.request, backup_job.name)
-        create_method.assert_called_with(request=self.request,
-                                         name='new-name',
-                                         workflow_input=loads(backup_job.workflow_input),
-                                         schedule_pattern=backup_job.schedule_pattern)
-
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.delete_cron_trigger', return_value=False)
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.create_cron_trigger')
-    def test_update_cron_trigger_failure_case(self, create_method, delete_method):
-        """"""
-        backup_job = FakeBackUpJob()
-        update_cron_trigger(self.request, backup_job, 'new-name')
-        delete_method.assert_called_with(self.request, backup_job.name)
-        create_method.assert_not_called()
 
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.delete_cron_trigger')
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
     @patch('openstack_dashboard.dashboards.custom_backup.db_api.get_or_none', return_value=None)
-    def test_delete_backup_job_when_obj_not_found(self, get_or_none, delete_cron_trigger):
+    def test_delete_backup_job_when_obj_not_found(self, get_or_none, service_client):
         """
         Verify that no api call() is made when the BackupJob is not found
         """
         backup_job = FakeBackUpJob()
         delete_backup_job(self.request, backup_job)
         get_or_none.assert_called()
-        delete_cron_trigger.assert_not_called()
+        service_client.assert_not_called()
 
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.delete_cron_trigger')
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
     @patch('openstack_dashboard.dashboards.custom_backup.db_api.get_or_none', side_effect=MultipleObjectsReturned)
-    def test_exception_is_handled(self, get_or_none, delete_cron_trigger):
+    def test_exception_is_handled(self, get_or_none, service_client):
         delete_backup_job(self.request, FakeBackUpJob())
         get_or_none.assert_called()
-        delete_cron_trigger.assert_not_called()
+        service_client.assert_not_called()
 
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.delete_cron_trigger', side_effect=APIException)
-    @patch('openstack_dashboard.dashboards.custom_backup.db_api.get_or_none')
-    def test_cron_trigger_error_is_handled(self, get_or_none, delete_cron_trigger):
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
+    def test_delete_backup_job_enqueues_trigger_deletion(self, service_client):
         """
-        Spying the delete() method to assert that the execution stops before it
+        Mistral is not called inside the request anymore, the deletion of the trigger is left to the outbox
         """
-        obj = FakeBackUpJob()
-        mocked_backup_job = MagicMock(spec=obj, wraps=obj)
-        get_or_none.return_value = mocked_backup_job
-        delete_backup_job(self.request, mocked_backup_job)
-        get_or_none.assert_called()
-        mocked_backup_job.delete.assert_not_called()
+        backup_job = create_job('test-trigger')
+        self.assertTrue(delete_backup_job(self.request, backup_job.id))
+        service_client.assert_not_called()
+        self.assertFalse(BackupJob.objects.filter(id=backup_job.id).exists())
+        operation = TriggerOperation.objects.get(backup_job_id=backup_job.id)
+        self.assertEqual(operation.operation, TriggerOperation.OPERATION_DELETE)
+        self.assertEqual(operation.trigger_name, 'Cron Trigger for Backup test-trigger')
 
     @patch('openstack_dashboard.dashboards.custom_backup.db_api.get_notification', return_value=None)
     def test_get_backup_jobs_of_notification_empty_qs(self, get_notification):
@@ -128,3 +90,459 @@ class TriggerMethodsTestCase(TestCase):
         mocked_notification = MagicMock(spec_set=Notification)
         get_notification.return_value = mocked_notification
         self.assertRaises(HandledException, delete_notification, 'fake-id')
+
+
+class BackupJobPaginationTestCase(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        for i in range(5):
+            job = create_job('job-{}'.format(i))
+            # auto_now_add ignores the value passed to create(), hence the update()
+            BackupJobSummary.objects.filter(backup_job_id=job.id).update(creation_time=now - timedelta(minutes=i))
+        self.names = ['job-{}'.format(i) for i in range(5)]
+
+    def test_first_page(self):
+        jobs, has_more, has_prev = paginate_job_summaries(page_size=2)
+        self.assertEqual([j.name for j in jobs], self.names[:2])
+        self.assertTrue(has_more)
+        self.assertFalse(has_prev)
+
+    def test_next_and_last_page(self):
+        jobs, _more, _prev = paginate_job_summaries(page_size=2)
+        jobs, has_more, has_prev = paginate_job_summaries(marker=jobs[-1].id, page_size=2)
+        self.assertEqual([j.name for j in jobs], self.names[2:4])
+        self.assertTrue(has_more)
+        self.assertTrue(has_prev)
+        jobs, has_more, has_prev = paginate_job_summaries(marker=jobs[-1].id, page_size=2)
+        self.assertEqual([j.name for j in jobs], self.names[4:])
+        self.assertFalse(has_more)
+        self.assertTrue(has_prev)
+
+    def test_previous_page(self):
+        marker = BackupJob.objects.get(name='job-2').id
+        jobs, has_more, has_prev = paginate_job_summaries(marker=marker, reversed_order=True, page_size=2)
+        self.assertEqual([j.name for j in jobs], self.names[:2])
+        self.assertTrue(has_more)
+        self.assertFalse(has_prev)
+
+    def test_same_creation_time_is_disambiguated_by_id(self):
+        BackupJobSummary.objects.update(creation_time=timezone.now())
+        seen = []
+        marker = None
+        while True:
+            jobs, has_more, _prev = paginate_job_summaries(marker=marker, page_size=2)
+            seen.extend(j.id for j in jobs)
+            if not has_more:
+                break
+            marker = jobs[-1].id
+        self.assertEqual(sorted(seen), sorted(BackupJob.objects.values_list('id', flat=True)))
+
+    def test_unknown_marker_restarts_from_first_page(self):
+        jobs, _more, has_prev = paginate_job_summaries(marker='not-existing', page_size=2)
+        self.assertEqual([j.name for j in jobs], self.names[:2])
+        self.assertFalse(has_prev)
+
+    def test_project_scope(self):
+        BackupJobSummary.objects.filter(name='job-0').update(project_id='20')
+        jobs, _more, _prev = paginate_job_summaries(project_id='20')
+        self.assertEqual([j.name for j in jobs], ['job-0'])
+        jobs, _more, _prev = paginate_job_summaries(project_id=None)
+        self.assertEqual(len(jobs), 5)
+
+    def test_backup_job_name_exists(self):
+        job = BackupJob.objects.get(name='job-0')
+        self.assertTrue(backup_job_name_exists('job-0'))
+        self.assertFalse(backup_job_name_exists('job-0', exclude_id=job.id))
+
+    def test_filter_by_name_prefix(self):
+        jobs, has_more, _prev = paginate_job_summaries(filters={'name': 'JOB-3'})
+        self.assertEqual([j.name for j in jobs], ['job-3'])
+        self.assertFalse(has_more)
+
+    def test_unknown_filter_is_ignored(self):
+        jobs, _more, _prev = paginate_job_summaries(filters={'workflow_input': 'x'})
+        self.assertEqual(len(jobs), 5)
+
+    def test_invalid_date_filter_returns_nothing(self):
+        jobs, _more, _prev = paginate_job_summaries(filters={'creation_time': 'yesterday'})
+        self.assertEqual(jobs, [])
+
+    def test_sort_by_name_ascending_with_pages(self):
+        jobs, _more, _prev = paginate_job_summaries(page_size=3, sort_key='name', sort_dir='asc')
+        self.assertEqual([j.name for j in jobs], self.names[:3])
+        jobs, has_more, _prev = paginate_job_summaries(marker=jobs[-1].id, page_size=3, sort_key='name', sort_dir='asc')
+        self.assertEqual([j.name for j in jobs], self.names[3:])
+        self.assertFalse(has_more)
+
+    def test_sort_by_nullable_column_visits_every_row(self):
+        BackupJobSummary.objects.filter(name__in=['job-1', 'job-3']).update(update_time=timezone.now())
+        for sort_dir in ('asc', 'desc'):
+            seen, marker = [], None
+            while True:
+                jobs, has_more, _prev = paginate_job_summaries(marker=marker, page_size=2, sort_key='update_time',
+                                                               sort_dir=sort_dir)
+                seen.extend(j.name for j in jobs)
+                if not has_more:
+                    break
+                marker = jobs[-1].id
+            self.assertEqual(sorted(seen), self.names)
+            self.assertEqual(set(seen[:2] if sort_dir == 'desc' else seen[3:]), {'job-1', 'job-3'})
+
+    def test_previous_page_across_null_values(self):
+        BackupJobSummary.objects.filter(name__in=['job-1', 'job-3']).update(update_time=timezone.now())
+        for sort_dir in ('asc', 'desc'):
+            jobs, _more, _prev = paginate_job_summaries(sort_key='update_time', sort_dir=sort_dir)
+            order = [j.id for j in jobs]
+            self.assertEqual(len(order), 5)
+            for previous, marker in zip(order, order[1:]):
+                jobs, _more, _prev = paginate_job_summaries(marker=marker, reversed_order=True, page_size=1,
+                                                            sort_key='update_time', sort_dir=sort_dir)
+                self.assertEqual([j.id for j in jobs], [previous])
+
+
+class NotificationPaginationTestCase(TestCase):
+
+    def test_filter_and_sort(self):
+        for name in ('beta', 'alpha', 'alpine'):
+            create_notification(name)
+        notifications, has_more, has_prev = paginate_notifications(filters={'name': 'al'}, sort_key='name',
+                                                                    sort_dir='asc')
+        self.assertEqual([n.name for n in notifications], ['alpha', 'alpine'])
+        self.assertFalse(has_more)
+        self.assertFalse(has_prev)
+        rows, _more, _prev = paginate_notifications(filters={'name': 'al'}, sort_key='name', sort_dir='asc',
+                                                    as_rows=True)
+        self.assertEqual(rows, [NotificationRow(n.id, n.name, n.sender_address, n.recipient_address, n.smtp_server,
+                                                n.openstack_url, n.creation_time, n.update_time)
+                                for n in notifications])
+
+    def test_list_notifications_of_project_includes_shared(self):
+        for name, project_id in (('own', '10'), ('shared', None), ('other', '20')):
+            create_notification(name, project_id)
+        self.assertEqual(sorted(n.name for n in list_notifications(project_id='10')), ['own', 'shared'])
+        self.assertEqual(list_notifications().count(), 3)
+
+    def test_parse_date_range(self):
+        start, end = parse_date_range('2019-06-01..2019-06-02')
+        self.assertEqual((start.day, end.day), (1, 2))
+        self.assertRaises(ValueError, parse_date_range, '06/01/2019')
+
+
+class BulkDeleteTestCase(TestCase):
+
+    def setUp(self):
+        self.request = FakeRequest()
+        self.jobs = dict((name, create_job(name)) for name in ('ok', 'trigger-not-found', 'mistral-error'))
+
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
+    def test_delete_backup_jobs_report(self, service_client):
+        ids = [self.jobs['ok'].id, self.jobs['trigger-not-found'].id, 'missing-id']
+        report = delete_backup_jobs(self.request, ids)
+        service_client.assert_not_called()
+        self.assertEqual(list(report.keys()), ids)
+        self.assertEqual(report[ids[0]], ('ok', None))
+        self.assertEqual(report[ids[1]], ('trigger-not-found', None))
+        self.assertIsNotNone(report['missing-id'][1])
+        self.assertEqual(list(BackupJob.objects.values_list('name', flat=True)), ['mistral-error'])
+        self.assertEqual(
+            set(TriggerOperation.objects.filter(operation=TriggerOperation.OPERATION_DELETE)
+                .values_list('backup_job_id', flat=True)),
+            {ids[0], ids[1]}
+        )
+
+
+class ReconciliationTestCase(TestCase):
+
+    def setUp(self):
+        for name, pattern, cron_trigger_id in (('in-sync', '* * * * *', 'Cron Trigger for Backup in-sync'),
+                                               ('missing', '* * * * *', None),
+                                               ('stale', '0 1 * * *', 'Cron Trigger for Backup stale'),
+                                               ('renamed', '* * * * *', 'Cron Trigger for Backup old-name'),
+                                               ('untracked', '* * * * *', None)):
+            create_job(name, '{"b": 1, "a": 2}', pattern, cron_trigger_id=cron_trigger_id)
+        workflow_input = '{"a": 2, "b": 1}'
+        self.triggers = [
+            FakeTrigger('Cron Trigger for Backup in-sync', workflow_input),
+            FakeTrigger('Cron Trigger for Backup stale', workflow_input),
+            FakeTrigger('Cron Trigger for Backup old-name', workflow_input),
+            FakeTrigger('Cron Trigger for Backup untracked', workflow_input),
+            FakeTrigger('Cron Trigger for Backup deleted-job', workflow_input),
+            FakeTrigger('Not created by the dashboard'),
+        ]
+
+    def _drifts_of(self, project_id=None):
+        return dict(((d.backup_job.name if d.backup_job else d.trigger_name), d.kind)
+                    for d in find_drifts(index_triggers(self.triggers), project_id))
+
+    def _drifts(self):
+        return self._drifts_of()
+
+    def test_find_drifts(self):
+        self.assertEqual(self._drifts(), {
+            # its trigger_state was never set by the outbox
+            'in-sync': 'state',
+            'missing': 'missing',
+            'stale': 'stale',
+            'renamed': 'stale',
+            'untracked': 'untracked',
+            'Cron Trigger for Backup deleted-job': 'orphaned',
+        })
+
+    def test_pending_changes_are_skipped(self):
+        enqueue_trigger_creation(BackupJob.objects.get(name='missing'))
+        self.assertNotIn('missing', self._drifts())
+
+    def test_repair_drifts(self):
+        counts = repair_drifts(find_drifts(index_triggers(self.triggers)), batch_size=2)
+        self.assertEqual(dict(counts), {'missing': 1, 'stale': 2, 'untracked': 1, 'orphaned': 1, 'state': 1})
+        self.assertEqual(BackupJob.objects.get(name='untracked').cron_trigger_id,
+                         'Cron Trigger for Backup untracked')
+        self.assertEqual(dict(BackupJobSummary.objects.values_list('name', 'trigger_state')), {
+            'in-sync': constants.TRIGGER_STATE_ACTIVE, 'untracked': constants.TRIGGER_STATE_ACTIVE,
+            'missing': constants.TRIGGER_STATE_PENDING, 'stale': constants.TRIGGER_STATE_PENDING,
+            'renamed': constants.TRIGGER_STATE_PENDING,
+        })
+        # a trigger marked active is missing from Mistral
+        self.triggers = self.triggers[1:]
+        self.assertEqual(self._drifts().get('in-sync'), 'missing')
+        self.assertEqual(
+            sorted(TriggerOperation.objects.values_list('operation', 'trigger_name', 'old_trigger_name')),
+            [('create', 'Cron Trigger for Backup missing', None),
+             ('delete', 'Cron Trigger for Backup deleted-job', None),
+             ('replace', 'Cron Trigger for Backup renamed', 'Cron Trigger for Backup old-name'),
+             ('replace', 'Cron Trigger for Backup stale', 'Cron Trigger for Backup stale')]
+        )
+
+    def test_find_drifts_of_a_project(self):
+        create_job('other', project_id='20')
+        drifts = self._drifts_of('10')
+        self.assertNotIn('other', drifts)
+        self.assertEqual(drifts['missing'], 'missing')
+
+
+class InstanceSearchTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.request = FakeRequest()
+        self.request.user = FakeUser()
+
+    @patch('openstack_dashboard.dashboards.custom_backup.db_api.nova_server_list')
+    def test_search_is_paged_filtered_and_cached(self, nova_server_list):
+        server = MagicMock(id='server-id')
+        server.name = 'web.1'
+        nova_server_list.return_value = ([server], True)
+        page = search_instances(self.request, query='web.', marker='previous-id')
+        self.assertEqual(page, {'instances': [('server-id', 'web.1')], 'more': True})
+        nova_server_list.assert_called_once_with(
+            self.request, search_opts={'paginate': True, 'name': r'web\.', 'marker': 'previous-id'}, detailed=False)
+        search_instances(self.request, query='web.', marker='previous-id')
+        self.assertEqual(nova_server_list.call_count, 1)
+        # another page, another project
+        search_instances(self.request, query='web.')
+        self.request.user.tenant_id = '20'
+        search_instances(self.request, query='web.', marker='previous-id')
+        self.assertEqual(nova_server_list.call_count, 3)
+
+    @patch('openstack_dashboard.dashboards.custom_backup.db_api.nova_server_get')
+    def test_instance_names_of_the_project(self, nova_server_get):
+        servers = {}
+        for instance_id, name, tenant_id in (('a' * 36, 'web-1', '10'), ('b' * 36, 'web-2', '20')):
+            servers[instance_id] = MagicMock(id=instance_id, tenant_id=tenant_id)
+            servers[instance_id].name = name
+
+        def server_get(request, instance_id):
+            if instance_id not in servers:
+                raise nova_exceptions.NotFound()
+            return servers[instance_id]
+        nova_server_get.side_effect = server_get
+        instance_ids = ['a' * 36, 'b' * 36, 'c' * 36]
+        self.assertEqual(instance_names(self.request, instance_ids, '10'), {'a' * 36: 'web-1'})
+        # only the instances asked for are read, once: the project is the one of the BackupJob, not of the user
+        self.assertEqual(instance_names(self.request, instance_ids, '20'), {'b' * 36: 'web-2'})
+        self.assertEqual(sorted(c[0][1] for c in nova_server_get.call_args_list), instance_ids)
+        with self.settings(CUSTOM_BACKUP_NOVA_CONCURRENCY=1):
+            self.assertEqual(instance_names(self.request, ['a' * 36], '10'), {'a' * 36: 'web-1'})
+        self.assertEqual(nova_server_get.call_count, 3)
+
+
+class RequestIdentityMapTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        notification = create_notification('notification')
+        self.backup_job = create_job('job', '{"instance": "server"}', notification=notification)
+        self.request = FakeRequest()
+        self.request.path = '/custom_backup/{}/update'.format(self.backup_job.id)
+
+    def test_backup_job_is_loaded_once_per_request(self):
+        # the BackupJob and its notification
+        with self.assertNumQueries(2):
+            backup_job = request_backup_job(self.request)
+            self.assertIs(request_backup_job(self.request), backup_job)
+            self.assertIs(request_backup_job(self.request, self.backup_job.id), backup_job)
+            self.assertEqual(backup_job.notification.name, 'notification')
+        self.assertEqual(backup_job.parsed_workflow_input, {'instance': 'server'})
+        # another request, another identity map, served by the warm cache
+        other_request = FakeRequest()
+        other_request.path = self.request.path
+        with self.assertNumQueries(0):
+            other_backup_job = request_backup_job(other_request)
+            self.assertEqual(other_backup_job.notification.name, 'notification')
+        self.assertIsNot(other_backup_job, backup_job)
+
+    def test_missing_backup_job(self):
+        self.request.path = '/custom_backup/{}/update'.format('0' * 36)
+        with self.assertNumQueries(1):
+            self.assertIsNone(request_backup_job(self.request))
+            self.assertIsNone(request_backup_job(self.request))
+
+
+class LookupCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.own = create_notification('own', '10')
+        self.shared = create_notification('shared')
+        create_notification('other', '20')
+
+    def test_notification_choices(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(notification_choices('10'), [(self.own.id, 'own'), (self.shared.id, 'shared')])
+            self.assertEqual(notification_choices('10'), [(self.own.id, 'own'), (self.shared.id, 'shared')])
+        # a change of another project does not invalidate the choices
+        create_notification('another', '20')
+        with self.assertNumQueries(0):
+            notification_choices('10')
+        # the shared notifications are part of the choices of every project
+        self.shared.name = 'common'
+        self.shared.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(notification_choices('10'), [(self.shared.id, 'common'), (self.own.id, 'own')])
+        self.own.delete()
+        self.assertEqual(notification_choices('10'), [(self.shared.id, 'common')])
+
+    def test_cached_notification(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_notification(self.own.id).name, 'own')
+            self.assertEqual(cached_notification(self.own.id).name, 'own')
+            self.assertIsNone(cached_notification(''))
+        self.own.name = 'renamed'
+        self.own.save()
+        self.assertEqual(cached_notification(self.own.id).name, 'renamed')
+        own_id = self.own.id
+        self.own.delete()
+        with self.assertNumQueries(1):
+            self.assertIsNone(cached_notification(own_id))
+            self.assertIsNone(cached_notification(own_id))
+
+    def test_cached_backup_job(self):
+        backup_job = create_job('job')
+        with self.assertNumQueries(1):
+            self.assertIsNone(cached_backup_job(backup_job.id).cron_trigger_id)
+            self.assertIsNone(cached_backup_job(backup_job.id).cron_trigger_id)
+        # bulk updates do not send post_save
+        set_cron_trigger_id(backup_job.id, 'trigger-id')
+        self.assertEqual(cached_backup_job(backup_job.id).cron_trigger_id, 'trigger-id')
+        BackupJob.objects.filter(id=backup_job.id).delete()
+        self.assertIsNone(cached_backup_job(backup_job.id))
+
+    def test_lost_version(self):
+        notification_choices('10')
+        cache.clear()
+        self.own.name = 'renamed'
+        self.own.save()
+        self.assertEqual(notification_choices('10'), [(self.own.id, 'renamed'), (self.shared.id, 'shared')])
+
+
+class ScheduleConflictTestCase(TestCase):
+
+    def setUp(self):
+        jobs = (
+            ('job-1', '10', {'instance': 'A' * 36}, '0 2 * * *'),
+            ('job-2', '10', {'instance': 'a' * 36, 'max_snapshots': 3}, '0 2 * * *'),
+            ('job-3', '10', {'instance': 'a' * 36}, '10 2 * * *'),
+            ('job-4', '10', {'instance': 'a' * 36}, '0 14 * * *'),
+            ('job-5', '20', {'instance': None, 'metadata': {'key': 'k', 'value': 'v'}}, '55 23 * * 0'),
+            ('job-6', '20', {'instance': None, 'metadata': {'key': 'k', 'value': 'v'}}, '5 0 * * 1'),
+            ('job-7', '20', {'instance': None, 'metadata': {'key': 'k', 'value': 'other'}}, '55 23 * * 0'),
+        )
+        for name, project_id, workflow_input, pattern in jobs:
+            create_job(name, dumps(workflow_input), pattern, project_id)
+
+    def _conflicts(self, **kwargs):
+        return sorted((conflict.kind, conflict.source_key, conflict.schedule_patterns,
+                       sorted(job.name for job in conflict.backup_jobs))
+                      for conflict in find_schedule_conflicts(horizon_days=14, **kwargs))
+
+    def test_duplicates_and_overlaps(self):
+        self.assertEqual(self._conflicts(window=15), [
+            (CONFLICT_DUPLICATE, 'instance:' + 'a' * 36, ('0 2 * * *', ), ['job-1', 'job-2']),
+            (CONFLICT_OVERLAP, 'instance:' + 'a' * 36, ('0 2 * * *', '10 2 * * *'), ['job-1', 'job-2', 'job-3']),
+            # across midnight, from Sunday to Monday
+            (CONFLICT_OVERLAP, 'metadata:k=v', ('5 0 * * 1', '55 23 * * 0'), ['job-5', 'job-6']),
+        ])
+
+    def test_window_and_project(self):
+        self.assertEqual([conflict[0] for conflict in self._conflicts(window=5)], [CONFLICT_DUPLICATE])
+        self.assertEqual([conflict[1] for conflict in self._conflicts(window=15, project_id='20')], ['metadata:k=v'])
+
+    def test_job_of_several_instances(self):
+        create_job('job-8', dumps({'instance': None, 'instances': ['c' * 36, 'd' * 36]}), '0 3 * * *', '30')
+        create_job('job-9', dumps({'instance': 'd' * 36}), '0 3 * * *', '30')
+        self.assertEqual(self._conflicts(window=15, project_id='30'), [
+            (CONFLICT_DUPLICATE, 'instance:' + 'd' * 36, ('0 3 * * *', ), ['job-8', 'job-9']),
+        ])
+
+
+class CrossTenantTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.notification = create_notification('own', '10')
+        self.shared = create_notification('shared')
+        self.backup_job = create_backup_job(FakeRequest(), 'own', {'instance': 'a' * 36}, '0 1 * * *', '10',
+                                            self.notification)
+        self.intruder = FakeRequest(tenant_id='20')
+
+    def test_backup_job_of_another_project(self):
+        self.assertIsNone(request_backup_job(self.intruder, self.backup_job.id))
+        self.assertFalse(delete_backup_job(self.intruder, self.backup_job.id))
+        report = delete_backup_jobs(self.intruder, [self.backup_job.id])
+        self.assertEqual(report[self.backup_job.id], (None, "BackupJob does not exist"))
+        self.assertTrue(BackupJob.objects.filter(id=self.backup_job.id).exists())
+        self.assertEqual(request_backup_job(FakeRequest(), self.backup_job.id), self.backup_job)
+
+    def test_admin_browsing_all_tenants(self):
+        admin = FakeRequest(tenant_id='20', is_superuser=True)
+        self.assertIsNone(request_backup_job(admin, self.backup_job.id))
+        admin = FakeRequest(tenant_id='20', is_superuser=True, GET={'all_tenants': '1'})
+        self.assertEqual(request_backup_job(admin, self.backup_job.id), self.backup_job)
+
+    def test_notification_of_another_project(self):
+        from horizon.exceptions import NotFound
+        self.assertIsNone(cached_notification(self.notification.id, '20'))
+        self.assertEqual(cached_notification(self.shared.id, '20'), self.shared)
+        # the shared notifications are read only
+        self.assertIsNone(cached_notification(self.shared.id, '20', shared=False))
+        self.assertEqual(cached_notification(self.shared.id, None, shared=False), self.shared)
+        self.assertRaises(NotFound, delete_notification, self.shared.id, '20')
+        self.assertTrue(Notification.objects.filter(id=self.shared.id).exists())
+        self.assertEqual(cached_notification(self.notification.id, '10'), self.notification)
+        self.assertRaises(NotFound, delete_notification, self.notification.id, '20')
+        self.assertEqual(list(get_backup_jobs_of_notification(self.notification.id, '20')), [])
+        self.assertTrue(Notification.objects.filter(id=self.notification.id).exists())
+
+    def test_legacy_notifications_take_the_project_of_their_backup_jobs(self):
+        from django.apps import apps
+        fill_project_id = import_module('openstack_dashboard.dashboards.custom_backup.migrations.0004_project_scope') \
+            .fill_project_id
+        Notification.objects.update(project_id=None)
+        used_by_two = create_notification('two')
+        for project_id in ('10', '20'):
+            create_backup_job(FakeRequest(), 'two-' + project_id, {'instance': 'b' * 36}, '0 1 * * *', project_id,
+                              used_by_two)
+        fill_project_id(apps, None)
+        self.assertEqual(dict(Notification.objects.values_list('name', 'project_id')),
+                         {'own': '10', 'shared': None, 'two': None})
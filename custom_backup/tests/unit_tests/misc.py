@@ -1,6 +1,35 @@
 from unittest import TestCase, skip
+from django.http import QueryDict
 
-from openstack_dashboard.dashboards.custom_backup.utils import cmp_dict
+from openstack_dashboard.dashboards.custom_backup.utils import cmp_dict, workflow_instances, workflow_source_key, \
+    get_server_filters, get_sort_query
+
+
+class FakeFilterAction(object):
+    def get_param_name(self):
+        return 'jobs__filter__q'
+
+
+class FakeTable(object):
+    """
+    The server-side filter of horizon's DataTable, read from the session
+    """
+    def __init__(self, request):
+        self.request = request
+        self._meta = type('Meta', (object, ), {'_filter_action': FakeFilterAction(), 'pagination_param': 'marker',
+                                               'prev_pagination_param': 'prev_marker'})
+
+    def get_filter_field(self):
+        return self.request.session.get('jobs__filter__q_field', '')
+
+    def get_filter_string(self):
+        return self.request.session.get('jobs__filter__q', '')
+
+
+class FakeRequest(object):
+    def __init__(self, query_string=''):
+        self.GET = QueryDict(query_string)
+        self.session = {}
 
 
 class UtilsTestCase(TestCase):
@@ -71,6 +100,11 @@ class UtilsTestCase(TestCase):
              'metadata': None})
         )
 
+    def test_workflow_are_equal_case_11(self):
+        # nested keys only in dict2
+        self.assertFalse(cmp_dict({'metadata': {}}, {'metadata': {'key': 'k'}}))
+        self.assertFalse(cmp_dict({'a': 1}, {'a': 1, 'metadata': {'key': 'k'}}))
+
     """
     The following three tests aim at verify that once the variable gets True, will hold this value until the end of loop
     this boolean logic is used inside che workflow[create|update] handle() methods  
@@ -92,3 +126,31 @@ class UtilsTestCase(TestCase):
         for y in [False, False, False]:
             v = v or y
         self.assertTrue(v)
+
+    def test_workflow_instances(self):
+        a, b = 'a' * 36, 'b' * 36
+        self.assertEqual(workflow_instances({'instance': a.upper()}), [a])
+        self.assertEqual(workflow_instances('{"instance": null, "instances": ["%s", "%s", "%s"]}' % (b, a, b)), [a, b])
+        self.assertEqual(workflow_instances({'instance': None, 'metadata': {'key': 'k', 'value': 'v'}}), [])
+        self.assertEqual(workflow_source_key({'instance': None, 'instances': [a]}), 'instance:' + a)
+        self.assertEqual(workflow_source_key({'instances': [a, b]}), workflow_source_key({'instances': [b, a]}))
+        self.assertTrue(workflow_source_key({'instances': [a, b]}).startswith('instances:'))
+
+    def test_server_filters(self):
+        request = FakeRequest()
+        table = FakeTable(request)
+        self.assertEqual(get_server_filters(request, table), {})
+        request.session.update({'jobs__filter__q': ' job ', 'jobs__filter__q_field': 'name'})
+        self.assertEqual(get_server_filters(request, table, {'project_id': '10'}), {'project_id': '10', 'name': 'job'})
+        self.assertEqual(get_server_filters(request, table, filters_map={'name': {'jo': 'mapped'}}),
+                         {'name': 'mapped'})
+
+    def test_sort_links_keep_the_filter(self):
+        request = FakeRequest('all_tenants=1&sort_key=name&sort_dir=asc&marker=x')
+        request.session.update({'jobs__filter__q': 'job', 'jobs__filter__q_field': 'name'})
+        table = FakeTable(request)
+        self.assertEqual(QueryDict(get_sort_query(request, table)).dict(),
+                         {'all_tenants': '1', 'jobs__filter__q': 'job', 'jobs__filter__q_field': 'name'})
+        # the filter carried by a sort link replaces the one of the session
+        request = FakeRequest('jobs__filter__q=other&jobs__filter__q_field=schedule_pattern')
+        self.assertEqual(get_server_filters(request, FakeTable(request)), {'schedule_pattern': 'other'})
@@ -0,0 +1,124 @@
+from time import time
+import requests
+from django.test import TestCase
+from mock import patch, MagicMock
+from openstack_dashboard.dashboards.custom_backup import mistral_api
+from openstack_dashboard.dashboards.custom_backup.mistral_api import iter_triggers
+from openstack_dashboard.dashboards.custom_backup.tests import FakeTrigger
+
+
+class FakeAccess(object):
+    def __init__(self, expired=False):
+        self.expired = expired
+
+    def will_expire_soon(self, stale_duration):
+        return self.expired
+
+
+@patch('openstack_dashboard.dashboards.custom_backup.mistral_api.ks_session.Session')
+@patch('openstack_dashboard.dashboards.custom_backup.mistral_api.v3.Password',
+       side_effect=lambda **kwargs: MagicMock(auth_ref=None, **kwargs))
+@patch('openstack_dashboard.dashboards.custom_backup.mistral_api.mistral_client.client',
+       side_effect=lambda **kwargs: MagicMock())
+class MistralClientCacheTestCase(TestCase):
+
+    def setUp(self):
+        mistral_api._clients.clear()
+
+    def test_client_is_reused(self, client, password, session):
+        first = mistral_api.service_client('10')
+        self.assertIs(mistral_api.service_client('10'), first)
+        self.assertIsNot(mistral_api.service_client('20'), first)
+        self.assertEqual((client.call_count, password.call_count), (2, 2))
+        self.assertIs(session.call_args[1]['session'], mistral_api._shared_http_session())
+
+    def test_expired_token_is_evicted(self, client, password, session):
+        mistral_api.service_client('10')
+        auth = mistral_api._clients[list(mistral_api._clients)[0]][1]
+        auth.auth_ref = FakeAccess()
+        mistral_api.service_client('10')
+        self.assertEqual(client.call_count, 1)
+        auth.auth_ref = FakeAccess(expired=True)
+        mistral_api.service_client('10')
+        self.assertEqual(client.call_count, 2)
+
+    def test_cache_is_bounded(self, client, password, session):
+        with self.settings(CUSTOM_BACKUP_MISTRAL_CLIENT_CACHE_SIZE=2):
+            for project_id in ('p1', 'p2', 'p3'):
+                mistral_api.service_client(project_id)
+        self.assertEqual([key[2] for key in mistral_api._clients], ['p2', 'p3'])
+
+
+class MistralGuardTestCase(TestCase):
+
+    def setUp(self):
+        mistral_api._guards.clear()
+
+    def test_circuit_breaker(self):
+        breaker = mistral_api.CircuitBreaker('mistral', failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.OPEN)
+        self.assertRaises(mistral_api.CircuitOpenError, breaker.before_call)
+        breaker.opened_at -= 60
+        breaker.before_call()
+        self.assertEqual(breaker.state, breaker.HALF_OPEN)
+        # only one trial call at a time
+        self.assertRaises(mistral_api.CircuitOpenError, breaker.before_call)
+        breaker.record_success()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+
+    def test_bulkhead_rejects_when_full(self):
+        bulkhead = mistral_api.Bulkhead('mistral', size=1, wait=0)
+        bulkhead.acquire()
+        self.assertRaises(mistral_api.BulkheadFullError, bulkhead.acquire)
+        bulkhead.release()
+        bulkhead.acquire()
+        self.assertEqual((bulkhead.in_flight, bulkhead.rejected), (1, 1))
+
+    @patch('requests.Session.request', side_effect=requests.exceptions.ConnectTimeout)
+    def test_session_deadline_and_breaker(self, request):
+        session = mistral_api.GuardedSession()
+        with self.settings(CUSTOM_BACKUP_MISTRAL_BREAKER_THRESHOLD=2, CUSTOM_BACKUP_MISTRAL_TIMEOUT=3):
+            for _i in range(2):
+                self.assertRaises(mistral_api.DeadlineExceededError, session.get, 'http://mistral:8989/v2/cron_triggers')
+            self.assertRaises(mistral_api.CircuitOpenError, session.get, 'http://mistral:8989/v2/cron_triggers')
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual(request.call_args[1]['timeout'], 3)
+        self.assertEqual(mistral_api.guard_stats()['mistral:8989'],
+                         {'state': 'open', 'failures': 2, 'in_flight': 0, 'rejected': 0})
+
+    @patch('requests.Session.request', side_effect=requests.exceptions.InvalidURL)
+    def test_any_error_ends_the_trial_call(self, request):
+        session = mistral_api.GuardedSession()
+        breaker = mistral_api._guard_for('http://mistral:8989').breaker
+        breaker.state, breaker.opened_at = breaker.OPEN, time() - breaker.reset_timeout
+        self.assertRaises(requests.exceptions.InvalidURL, session.get, 'http://mistral:8989/v2/cron_triggers')
+        self.assertEqual(breaker.state, breaker.OPEN)
+        breaker.opened_at -= breaker.reset_timeout
+        request.side_effect = None
+        request.return_value = MagicMock(status_code=200)
+        session.get('http://mistral:8989/v2/cron_triggers')
+        self.assertEqual(breaker.state, breaker.CLOSED)
+
+
+class IterTriggersTestCase(TestCase):
+
+    def test_iter_triggers_pages(self):
+        client = MagicMock()
+        pages = [[FakeTrigger('t1'), FakeTrigger('t2')], [FakeTrigger('t3')]]
+        client.cron_triggers.list.side_effect = pages
+        self.assertEqual([t.name for t in iter_triggers(client, page_size=2)], ['t1', 't2', 't3'])
+        self.assertEqual(client.cron_triggers.list.call_args[1]['marker'], 't2')
+        self.assertEqual(client.cron_triggers.list.call_args[1]['limit'], 2)
+
+    def test_iter_triggers_without_pagination(self):
+        client = MagicMock()
+
+        def list_triggers(**kwargs):
+            if kwargs:
+                raise TypeError("list() got an unexpected keyword argument 'marker'")
+            return [FakeTrigger('t1'), FakeTrigger('t2'), FakeTrigger('t3')]
+        client.cron_triggers.list.side_effect = list_triggers
+        self.assertEqual([t.name for t in iter_triggers(client, page_size=2)], ['t1', 't2', 't3'])
@@ -0,0 +1,276 @@
+from datetime import timedelta
+from json import loads, dumps
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch, MagicMock
+from mistralclient.api.base import APIException
+from openstack_dashboard.dashboards.custom_backup.db_api import BackupJob, create_backup_job, delete_backup_jobs, enqueue_trigger_replacement, \
+    backup_jobs_with_workflow_input, advance_next_runs, upcoming_backup_jobs, backup_jobs_of_instance, \
+    backup_jobs_of_metadata, backup_jobs_of_backup_type, backup_jobs_by_retention, paginate_job_summaries, \
+    attach_trigger_status, JobRow
+from openstack_dashboard.dashboards.custom_backup.constants import constants
+from openstack_dashboard.dashboards.custom_backup.models import BackupJobInstance, BackupJobSummary
+from openstack_dashboard.dashboards.custom_backup.outbox import drain
+from openstack_dashboard.dashboards.custom_backup.utils import workflow_input_fingerprint
+from openstack_dashboard.dashboards.custom_backup.tests import FakeRequest, FakeTrigger, create_notification, create_job
+
+
+class WorkflowInputHashTestCase(TestCase):
+
+    def test_hash_is_computed_on_save(self):
+        backup_job = create_job('job', '{"b": 1,  "a": {"d": 2, "c": 3}}')
+        backup_job = BackupJob.objects.get(id=backup_job.id)
+        self.assertEqual(backup_job.workflow_input, '{"a":{"c":3,"d":2},"b":1}')
+        self.assertEqual(backup_job.workflow_input_hash, workflow_input_fingerprint({'b': 1, 'a': {'c': 3, 'd': 2}}))
+        backup_job.workflow_input = '{"b": 2}'
+        backup_job.save()
+        self.assertEqual(BackupJob.objects.get(id=backup_job.id).workflow_input_hash,
+                         workflow_input_fingerprint({'b': 2}))
+
+    def test_identical_inputs(self):
+        inputs = (('job-1', '10', '{"a": 1, "b": 2}'), ('job-2', '20', '{"b": 2, "a": 1}'), ('job-3', '10', '{"a": 2}'))
+        for name, project_id, workflow_input in inputs:
+            create_job(name, workflow_input, project_id=project_id)
+        self.assertEqual(sorted(backup_jobs_with_workflow_input({'b': 2, 'a': 1}).values_list('name', flat=True)),
+                         ['job-1', 'job-2'])
+        self.assertEqual(list(backup_jobs_with_workflow_input('{"a":1,"b":2}', '20').values_list('name', flat=True)),
+                         ['job-2'])
+
+
+class NextRunTestCase(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now().replace(second=0, microsecond=0)
+        for name, pattern in (('job-1', '* * * * *'), ('job-2', '*/10 * * * *'), ('job-3', '0 0 30 2 *')):
+            create_job(name, schedule_pattern=pattern)
+
+    def _next_runs(self):
+        return dict(BackupJob.objects.values_list('name', 'next_run_at'))
+
+    def test_computed_on_save(self):
+        next_runs = self._next_runs()
+        self.assertGreater(next_runs['job-1'], self.now)
+        self.assertLessEqual(next_runs['job-1'], self.now + timedelta(minutes=2))
+        self.assertEqual(next_runs['job-2'].minute % 10, 0)
+        self.assertIsNone(next_runs['job-3'])
+        backup_job = BackupJob.objects.get(name='job-2')
+        backup_job.schedule_pattern = '0 0 1 1 *'
+        backup_job.save()
+        self.assertEqual((self._next_runs()['job-2'].month, self._next_runs()['job-2'].day), (1, 1))
+
+    def test_advance_and_upcoming(self):
+        later = self.now + timedelta(minutes=30)
+        self.assertEqual(advance_next_runs(now=later, batch_size=1), 2)
+        next_runs = self._next_runs()
+        self.assertEqual(next_runs['job-1'], later + timedelta(minutes=1))
+        self.assertEqual(next_runs['job-2'], later + timedelta(minutes=10 - later.minute % 10))
+        self.assertEqual(advance_next_runs(now=later), 0)
+        self.assertEqual([job.name for job in upcoming_backup_jobs(minutes=10, now=later)], ['job-1', 'job-2'])
+        self.assertEqual(list(upcoming_backup_jobs(project_id='20', minutes=10, now=later)), [])
+
+    def test_sort_by_next_run(self):
+        jobs, _more, _prev = paginate_job_summaries(sort_key='next_run_at', sort_dir='asc', project_id='10')
+        self.assertEqual([job.name for job in jobs], ['job-3', 'job-1', 'job-2'])
+
+
+class MultiInstanceTestCase(TestCase):
+
+    def setUp(self):
+        self.a, self.b, self.c = 'a' * 36, 'b' * 36, 'c' * 36
+        self.backup_job = create_backup_job(FakeRequest(), 'multi', {'instance': None, 'instances': [self.a, self.b],
+                                                                     'concurrency': 2}, '0 1 * * *', '10', None)
+        create_backup_job(FakeRequest(), 'single', {'instance': self.b}, '0 2 * * *', '20', None)
+
+    def _instances(self, backup_job):
+        return sorted(BackupJobInstance.objects.filter(backup_job=backup_job).values_list('instance_id', flat=True))
+
+    def test_instances_are_indexed(self):
+        self.assertEqual(self._instances(self.backup_job), [self.a, self.b])
+        self.assertEqual(sorted(job.name for job in backup_jobs_of_instance(self.b)), ['multi', 'single'])
+        self.assertEqual([job.name for job in backup_jobs_of_instance(self.b.upper(), project_id='20')], ['single'])
+        self.assertEqual(list(backup_jobs_of_instance(self.c)), [])
+
+    def test_instances_follow_the_workflow_input(self):
+        backup_job = BackupJob.objects.get(name='multi')
+        backup_job.workflow_input = dumps({'instance': None, 'instances': [self.b, self.c], 'concurrency': 2})
+        backup_job.save()
+        self.assertEqual(self._instances(backup_job), [self.b, self.c])
+        with self.assertNumQueries(2):
+            # the input has not changed: the rows are not read again, only the BackupJobSummary is updated
+            backup_job.save()
+        delete_backup_jobs(FakeRequest(), [backup_job.id])
+        self.assertEqual(list(BackupJobInstance.objects.values_list('instance_id', flat=True)), [self.b])
+
+
+class WorkflowColumnsTestCase(TestCase):
+
+    def setUp(self):
+        jobs = (
+            ('job-1', '10', {'instance': 'A' * 36, 'backup_type': 'full', 'cinder_backup': True, 'max_backups': '60',
+                             'max_snapshots': 0}),
+            ('job-2', '10', {'instance': None, 'metadata': {'key': 'tier', 'value': 'gold'}, 'backup_type': 'incr',
+                             'cinder_backup': False, 'max_backups': 0, 'max_snapshots': 51}),
+            ('job-3', '20', {'instance': None, 'metadata': {'key': 'tier', 'value': 'silver'}, 'backup_type': 'full',
+                             'cinder_backup': False, 'max_backups': 3, 'max_snapshots': 3}),
+        )
+        for name, project_id, workflow_input in jobs:
+            create_backup_job(FakeRequest(), name, workflow_input, '0 1 * * *', project_id, None)
+
+    def _names(self, qs):
+        return sorted(qs.values_list('name', flat=True))
+
+    def test_columns_are_filled(self):
+        backup_job = BackupJob.objects.get(name='job-1')
+        self.assertEqual((backup_job.instance_id, backup_job.metadata_key, backup_job.backup_type,
+                          backup_job.cinder_backup, backup_job.max_backups, backup_job.max_snapshots),
+                         ('a' * 36, None, 'full', True, 60, 0))
+        backup_job.workflow_input = dumps({'instance': None, 'instances': ['a' * 36, 'b' * 36],
+                                           'backup_type': 'auto'})
+        backup_job.save()
+        backup_job.refresh_from_db()
+        self.assertEqual((backup_job.instance_id, backup_job.backup_type, backup_job.max_backups), (None, 'auto', None))
+
+    def test_query_helpers(self):
+        self.assertEqual(self._names(backup_jobs_of_metadata('tier')), ['job-2', 'job-3'])
+        self.assertEqual(self._names(backup_jobs_of_metadata('tier', 'gold')), ['job-2'])
+        self.assertEqual(self._names(backup_jobs_of_backup_type('full')), ['job-1', 'job-3'])
+        self.assertEqual(self._names(backup_jobs_of_backup_type('full', cinder_backup=False)), ['job-3'])
+        self.assertEqual(self._names(backup_jobs_of_backup_type('full', project_id='10')), ['job-1'])
+        self.assertEqual(self._names(backup_jobs_by_retention(min_snapshots=51)), ['job-2'])
+        self.assertEqual(self._names(backup_jobs_by_retention(min_backups=3, min_snapshots=3)), ['job-3'])
+        jobs, _more, _prev = paginate_job_summaries(filters={'instance_id': 'a' * 36})
+        self.assertEqual([job.name for job in jobs], ['job-1'])
+
+    def test_instance_filter_matches_the_jobs_of_several_instances(self):
+        create_backup_job(FakeRequest(), 'job-4', {'instance': None, 'instances': ['a' * 36, 'b' * 36]}, '0 1 * * *',
+                          '10', None)
+        jobs, _more, _prev = paginate_job_summaries(filters={'instance_id': 'a' * 36}, sort_key='name', sort_dir='asc')
+        self.assertEqual([job.name for job in jobs], ['job-1', 'job-4'])
+        summaries, _more, _prev = paginate_job_summaries(filters={'instance_id': 'b' * 36}, project_id='10')
+        self.assertEqual([summary.name for summary in summaries], ['job-4'])
+
+
+class BackupJobSummaryTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.notification = create_notification('ops')
+        self.backup_job = create_backup_job(FakeRequest(), 'summary', {'instance': 'a' * 36, 'backup_type': 'full'},
+                                            '0 1 * * *', '10', self.notification)
+        create_backup_job(FakeRequest(), 'other', {'instance': 'b' * 36}, '0 2 * * *', '20', None)
+        self.client = MagicMock()
+        self.client.cron_triggers.create.return_value = FakeTrigger('trigger-id')
+
+    def _summary(self):
+        return BackupJobSummary.objects.get(backup_job_id=self.backup_job.id)
+
+    def test_summary_follows_the_backup_job(self):
+        summary = self._summary()
+        self.assertEqual((summary.name, summary.project_id, summary.notification_name, summary.backup_type),
+                         ('summary', '10', 'ops', 'full'))
+        self.assertEqual(summary.workflow_input_summary, 'backup_type=full, instance={}'.format('a' * 36))
+        self.backup_job.name = 'renamed'
+        self.backup_job.save()
+        self.notification.name = 'operations'
+        self.notification.save()
+        summary = self._summary()
+        self.assertEqual((summary.name, summary.notification_name), ('renamed', 'operations'))
+        delete_backup_jobs(FakeRequest(), [self.backup_job.id])
+        self.assertFalse(BackupJobSummary.objects.filter(backup_job_id=self.backup_job.id).exists())
+
+    def test_trigger_state(self):
+        self.assertEqual(self._summary().trigger_state, constants.TRIGGER_STATE_PENDING)
+        drain(client_factory=lambda project_id: self.client)
+        summary = self._summary()
+        self.assertEqual((summary.trigger_state, summary.cron_trigger_id), (constants.TRIGGER_STATE_ACTIVE,
+                                                                            'trigger-id'))
+        enqueue_trigger_replacement(self.backup_job, 'Cron Trigger for Backup summary')
+        self.assertEqual(self._summary().trigger_state, constants.TRIGGER_STATE_PENDING)
+        self.client.cron_triggers.create.side_effect = APIException(500, 'unavailable')
+        with self.settings(CUSTOM_BACKUP_OUTBOX_MAX_ATTEMPTS=1):
+            drain(client_factory=lambda project_id: self.client)
+        self.assertEqual(self._summary().trigger_state, constants.TRIGGER_STATE_MISSING)
+
+    def test_pagination(self):
+        summaries, more, prev = paginate_job_summaries(sort_key='update_time', sort_dir='desc')
+        self.assertEqual(sorted(summary.id for summary in summaries),
+                         sorted(BackupJob.objects.values_list('id', flat=True)))
+        self.assertEqual((more, prev), (False, False))
+        summaries, _more, _prev = paginate_job_summaries(filters={'notification': 'OP'}, project_id='10')
+        self.assertEqual([summary.name for summary in summaries], ['summary'])
+        summaries, _more, _prev = paginate_job_summaries(page_size=1, sort_key='name', sort_dir='asc')
+        self.assertEqual([summary.name for summary in summaries], ['other'])
+        summaries, _more, _prev = paginate_job_summaries(marker=summaries[0].id, page_size=1, sort_key='name',
+                                                         sort_dir='asc')
+        self.assertEqual([summary.name for summary in summaries], ['summary'])
+
+    def test_rows(self):
+        rows, more, _prev = paginate_job_summaries(page_size=1, sort_key='name', sort_dir='desc', as_rows=True)
+        summary = self._summary()
+        self.assertEqual(rows, [JobRow(self.backup_job.id, 'summary', summary.workflow_input_summary, '0 1 * * *',
+                                       '10', None, constants.TRIGGER_STATE_PENDING, summary.next_run_at,
+                                       summary.creation_time, summary.update_time)])
+        self.assertTrue(more)
+        rows, more, prev = paginate_job_summaries(marker=rows[0].id, page_size=1, sort_key='name', sort_dir='desc',
+                                                  as_rows=True)
+        self.assertEqual(([row.name for row in rows], more, prev), (['other'], False, True))
+
+    def _row(self, name, cron_trigger_id, trigger_state, project_id='10'):
+        return JobRow(name, name, '', '0 1 * * *', project_id, cron_trigger_id, trigger_state, None, None, None)
+
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
+    def test_trigger_status(self, service_client):
+        service_client.return_value.cron_triggers.list.return_value = [FakeTrigger('trigger-id'),
+                                                                       FakeTrigger('Cron Trigger for Backup named')]
+        rows = [self._row('active', 'trigger-id', constants.TRIGGER_STATE_MISSING),
+                self._row('named', None, constants.TRIGGER_STATE_UNKNOWN),
+                self._row('missing', 'deleted-id', constants.TRIGGER_STATE_ACTIVE),
+                self._row('pending', None, constants.TRIGGER_STATE_PENDING)]
+        status_rows = attach_trigger_status(rows)
+        self.assertEqual([(row.name, row.trigger_state, row.next_execution_time) for row in status_rows],
+                         [('active', constants.TRIGGER_STATE_ACTIVE, '2019-06-17 10:00:00'),
+                          ('named', constants.TRIGGER_STATE_ACTIVE, '2019-06-17 10:00:00'),
+                          ('missing', constants.TRIGGER_STATE_MISSING, None),
+                          ('pending', constants.TRIGGER_STATE_PENDING, None)])
+        self.assertEqual(status_rows[0][:-1], rows[0]._replace(trigger_state=constants.TRIGGER_STATE_ACTIVE))
+        # one listing per project, then served from the cache
+        attach_trigger_status(rows + [self._row('other', None, constants.TRIGGER_STATE_ACTIVE, '20')])
+        self.assertEqual([call[0] for call in service_client.call_args_list], [('10', ), ('20', )])
+        self.assertEqual(service_client.return_value.cron_triggers.list.call_count, 2)
+
+    @patch('openstack_dashboard.dashboards.custom_backup.mistral_api.service_client')
+    def test_trigger_status_without_mistral(self, service_client):
+        service_client.return_value.cron_triggers.list.side_effect = APIException(503, 'unavailable')
+        rows = [self._row('active', 'trigger-id', constants.TRIGGER_STATE_ACTIVE)]
+        self.assertEqual([(row.trigger_state, row.next_execution_time) for row in attach_trigger_status(rows)],
+                         [(constants.TRIGGER_STATE_ACTIVE, None)])
+
+
+class PartialUpdateTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.notification = create_notification('ops')
+        self.backup_job = create_backup_job(FakeRequest(), 'partial', {'instance': 'a' * 36}, '0 1 * * *', '10', None)
+        self.other = create_backup_job(FakeRequest(), 'other', {'instance': 'b' * 36}, '0 1 * * *', '20', None)
+
+    def test_update_fields_are_honored(self):
+        # a concurrent edit of the input, which a full-row save of the stale copy would overwrite
+        BackupJob.objects.filter(id=self.backup_job.id).update(workflow_input=dumps({'instance': 'c' * 36}))
+        self.backup_job.name = 'renamed'
+        self.backup_job.save(update_fields=['name'])
+        backup_job = BackupJob.objects.get(id=self.backup_job.id)
+        self.assertEqual((backup_job.name, loads(backup_job.workflow_input)), ('renamed', {'instance': 'c' * 36}))
+        self.assertEqual(BackupJobSummary.objects.get(backup_job_id=backup_job.id).name, 'renamed')
+        backup_job.schedule_pattern = '0 2 * * *'
+        backup_job.workflow_input = dumps({'instance': 'd' * 36})
+        backup_job.save(update_fields=['schedule_pattern', 'workflow_input'])
+        backup_job = BackupJob.objects.get(id=self.backup_job.id)
+        self.assertEqual((backup_job.instance_id, backup_job.next_run_at.hour), ('d' * 36, 2))
+        self.assertEqual(list(BackupJobInstance.objects.filter(backup_job=backup_job)
+                              .values_list('instance_id', flat=True)), ['d' * 36])
+        with self.assertNumQueries(1):
+            # the name of the notification did not change: the summaries are not touched
+            self.notification.smtp_server = '2.2.2.2'
+            self.notification.save(update_fields=['smtp_server'])
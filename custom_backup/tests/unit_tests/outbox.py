@@ -0,0 +1,195 @@
+from time import time
+from json import loads, dumps
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch, MagicMock
+from mistralclient.api.base import APIException
+from openstack_dashboard.dashboards.custom_backup.db_api import BackupJob, create_backup_job, delete_backup_jobs, enqueue_trigger_replacement, \
+    enqueue_trigger_deletions, enqueue_trigger_update, get_backup_job, backup_jobs_by_trigger_ids, \
+    shared_trigger_key, find_drifts, index_triggers, repair_drifts
+from openstack_dashboard.dashboards.custom_backup.models import TriggerOperation
+from openstack_dashboard.dashboards.custom_backup.outbox import drain, process_chain, DRAIN_LOCK_KEY
+from openstack_dashboard.dashboards.custom_backup.tests import FakeRequest, FakeTrigger
+
+
+class TriggerOutboxTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.backup_job = create_backup_job(FakeRequest(), 'outbox', {'instance': 'server'}, '0 1 * * *', '10', None)
+        self.client = MagicMock()
+        self.client.cron_triggers.create.return_value = FakeTrigger('trigger-id')
+
+    def _drain(self):
+        return drain(client_factory=lambda project_id: self.client)
+
+    def test_creation_is_enqueued(self):
+        operation = TriggerOperation.objects.get(backup_job_id=self.backup_job.id)
+        self.assertEqual(operation.operation, TriggerOperation.OPERATION_CREATE)
+        self.assertEqual(operation.status, TriggerOperation.STATUS_PENDING)
+        self.assertEqual(loads(operation.workflow_input), {'instance': 'server'})
+        self.assertIsNone(self.backup_job.cron_trigger_id)
+
+    def test_trigger_id_is_recorded(self):
+        self._drain()
+        self.backup_job.refresh_from_db()
+        self.assertEqual(self.backup_job.cron_trigger_id, 'trigger-id')
+        self.assertEqual(get_backup_job(cron_trigger_id='trigger-id'), self.backup_job)
+        self.assertEqual(backup_jobs_by_trigger_ids(['trigger-id', 'unknown']), {'trigger-id': self.backup_job})
+
+    def test_operations_of_a_job_are_applied_in_order(self):
+        enqueue_trigger_replacement(self.backup_job, 'old-name')
+        self.assertEqual(self._drain(), 2)
+        self.assertEqual([c[0] for c in self.client.cron_triggers.method_calls], ['create', 'delete', 'create'])
+        self.assertFalse(TriggerOperation.objects.filter(status=TriggerOperation.STATUS_PENDING).exists())
+
+    def test_existing_trigger_is_replaced(self):
+        self.client.cron_triggers.create.side_effect = [APIException(409, 'conflict'), FakeTrigger('trigger-id')]
+        self.assertEqual(self._drain(), 1)
+        self.client.cron_triggers.delete.assert_called_once_with('Cron Trigger for Backup outbox')
+
+    def test_failure_is_retried_with_backoff(self):
+        enqueue_trigger_deletions([self.backup_job])
+        self.client.cron_triggers.create.side_effect = APIException(500, 'boom')
+        self.assertEqual(self._drain(), 0)
+        create, delete = TriggerOperation.objects.order_by('creation_time', 'id')
+        self.assertEqual(create.attempts, 1)
+        self.assertEqual(create.last_error, 'boom')
+        self.assertGreater(create.next_attempt_time, timezone.now())
+        # the deletion must wait for the creation it follows
+        self.assertEqual(delete.attempts, 0)
+        self.client.cron_triggers.delete.assert_not_called()
+        # not due yet
+        self.assertEqual(self._drain(), 0)
+        self.assertEqual(self.client.cron_triggers.create.call_count, 1)
+
+    @patch('openstack_dashboard.dashboards.custom_backup.outbox.backoff', return_value=0)
+    def test_operation_fails_after_max_attempts(self, backoff):
+        self.client.cron_triggers.create.side_effect = APIException(500, 'boom')
+        with self.settings(CUSTOM_BACKUP_OUTBOX_MAX_ATTEMPTS=2):
+            self._drain()
+            self._drain()
+        operation = TriggerOperation.objects.get()
+        self.assertEqual(operation.status, TriggerOperation.STATUS_FAILED)
+        self.assertEqual(operation.attempts, 2)
+
+    def test_single_drain_at_a_time(self):
+        cache.add(DRAIN_LOCK_KEY, 1)
+        self.assertIsNone(self._drain())
+        self.client.cron_triggers.create.assert_not_called()
+
+    def test_backing_off_operations_do_not_block_the_batch(self):
+        self.client.cron_triggers.create.side_effect = APIException(500, 'boom')
+        self._drain()
+        other = create_backup_job(FakeRequest(), 'other', {'instance': 'server'}, '0 2 * * *', '10', None)
+        self.client.cron_triggers.create.side_effect = None
+        with self.settings(CUSTOM_BACKUP_OUTBOX_BATCH_SIZE=1):
+            self.assertEqual(self._drain(), 1)
+        self.assertEqual(TriggerOperation.objects.get(backup_job_id=other.id).status, TriggerOperation.STATUS_DONE)
+
+    def test_lock_taken_over_is_not_released(self):
+        def create(*args, **kwargs):
+            # the lock has expired meanwhile and another drain holds it
+            cache.set(DRAIN_LOCK_KEY, 'other')
+            return FakeTrigger('trigger-id')
+        self.client.cron_triggers.create.side_effect = create
+        self.assertEqual(self._drain(), 1)
+        self.assertEqual(cache.get(DRAIN_LOCK_KEY), 'other')
+
+    def test_chains_past_the_deadline_are_left(self):
+        operations = list(TriggerOperation.objects.all())
+        self.assertEqual(process_chain(operations, lambda project_id: self.client, deadline=time() - 1), [])
+        self.client.cron_triggers.create.assert_not_called()
+
+
+class ConsolidatedTriggerTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = MagicMock()
+        self.client.cron_triggers.create.return_value = FakeTrigger('shared-id')
+        with self.settings(CUSTOM_BACKUP_TRIGGER_MODE='consolidated'):
+            self.backup_jobs = [create_backup_job(FakeRequest(), 'job-{}'.format(i), {'instance': str(i)}, '0 1 * * *',
+                                                  '10', None) for i in range(3)]
+
+    def _drain(self):
+        return drain(client_factory=lambda project_id: self.client)
+
+    def test_one_trigger_per_schedule(self):
+        key = shared_trigger_key('10', '0 1 * * *')
+        self.assertEqual(TriggerOperation.objects.filter(backup_job_id=key).count(), 3)
+        self.assertEqual(self._drain(), 3)
+        # the sync operations of the same trigger collapse into a single replacement
+        self.client.cron_triggers.delete.assert_called_once_with('Shared Cron Trigger for Backups 0 1 * * *')
+        self.client.cron_triggers.create.assert_called_once_with(
+            'Shared Cron Trigger for Backups 0 1 * * *', 'custom_instance_backup.custom_instance_backup_batch',
+            workflow_input={'backup_jobs': [loads(job.workflow_input) for job in
+                                            sorted(self.backup_jobs, key=lambda job: job.id)]},
+            pattern='0 1 * * *')
+        self.assertEqual(set(BackupJob.objects.values_list('cron_trigger_id', flat=True)), {'shared-id'})
+
+    def test_membership_changes(self):
+        self._drain()
+        self.client.reset_mock()
+        moved, deleted = self.backup_jobs[0], self.backup_jobs[1]
+        moved.schedule_pattern = '0 2 * * *'
+        moved.save()
+        enqueue_trigger_update(moved, moved.name, '0 1 * * *', True)
+        delete_backup_jobs(FakeRequest(), [deleted.id])
+        self.assertEqual(self._drain(), 3)
+        batches = dict((c[0][0], c[1]['workflow_input']['backup_jobs'])
+                       for c in self.client.cron_triggers.create.call_args_list)
+        self.assertEqual(batches, {
+            'Shared Cron Trigger for Backups 0 1 * * *': [{'instance': '2'}],
+            'Shared Cron Trigger for Backups 0 2 * * *': [{'instance': '0'}],
+        })
+        # the last BackupJob leaves: the shared trigger is deleted and not created again
+        self.client.reset_mock()
+        delete_backup_jobs(FakeRequest(), [self.backup_jobs[2].id])
+        self._drain()
+        self.client.cron_triggers.delete.assert_called_once_with('Shared Cron Trigger for Backups 0 1 * * *')
+        self.client.cron_triggers.create.assert_not_called()
+
+    def test_switch_to_per_job_trigger(self):
+        self._drain()
+        self.client.reset_mock()
+        backup_job = self.backup_jobs[0]
+        backup_job.shared_trigger = False
+        backup_job.save()
+        enqueue_trigger_update(backup_job, backup_job.name, backup_job.schedule_pattern, True)
+        self._drain()
+        self.assertEqual(sorted(c[0][0] for c in self.client.cron_triggers.create.call_args_list),
+                         ['Cron Trigger for Backup job-0', 'Shared Cron Trigger for Backups 0 1 * * *'])
+
+    def test_rename_keeps_the_shared_trigger(self):
+        self._drain()
+        backup_job = self.backup_jobs[0]
+        backup_job.name = 'renamed'
+        backup_job.save()
+        self.assertEqual(enqueue_trigger_update(backup_job, 'job-0', '0 1 * * *', True, input_changed=False), [])
+        self.assertFalse(TriggerOperation.objects.filter(status=TriggerOperation.STATUS_PENDING).exists())
+
+    def test_shared_trigger_drifts(self):
+        shared_name = 'Shared Cron Trigger for Backups 0 1 * * *'
+        TriggerOperation.objects.all().delete()
+        drifts = list(find_drifts(index_triggers([])))
+        self.assertEqual([(d.kind, d.backup_job.project_id, d.backup_job.schedule_pattern) for d in drifts],
+                         [('missing', '10', '0 1 * * *')])
+        self.assertEqual(dict(repair_drifts(drifts))['missing'], 1)
+        self._drain()
+        self.client.cron_triggers.create.assert_called_once()
+        # the trigger lost a BackupJob of its batch
+        trigger = FakeTrigger(shared_name, dumps({'backup_jobs': [{'instance': '0'}]}), '0 1 * * *')
+        self.assertEqual([d.kind for d in find_drifts(index_triggers([trigger]))], ['stale'])
+        batch = [loads(job.workflow_input) for job in sorted(self.backup_jobs, key=lambda job: job.id)]
+        trigger = FakeTrigger(shared_name, dumps({'backup_jobs': batch}), '0 1 * * *')
+        self.assertEqual([(d.kind, d.trigger_id) for d in find_drifts(index_triggers([trigger]))],
+                         [('untracked', shared_name)])
+        repair_drifts(find_drifts(index_triggers([trigger])))
+        self.assertEqual(set(BackupJob.objects.values_list('cron_trigger_id', flat=True)), {shared_name})
+        self.assertEqual(list(find_drifts(index_triggers([trigger]))), [])
+        # the shared trigger of another project is an orphan
+        other = FakeTrigger(shared_name, project_id='20')
+        self.assertEqual([(d.kind, d.project_id) for d in find_drifts(index_triggers([trigger, other]))],
+                         [('orphaned', '20')])
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from openstack_dashboard.dashboards.custom_backup import cron
+from openstack_dashboard.dashboards.custom_backup.models import BackupJob
+from openstack_dashboard.dashboards.custom_backup.schedule_load import load_histogram, load_profile, occupancy, \
+    pattern_changed, suggest_schedule, _shifted_patterns, OCCUPANCY_KEY
+from openstack_dashboard.dashboards.custom_backup.tests import create_job
+
+
+class ScheduleLoadTestCase(TestCase):
+
+    def test_load_profile(self):
+        for name, project_id, pattern in (('job-1', '10', '0 2 * * *'), ('job-2', '10', '0 2 * * *'),
+                                          ('job-3', '10', '*/30 * * * *'), ('job-4', '20', '0 2 * * *')):
+            create_job(name, schedule_pattern=pattern, project_id=project_id)
+        profile = load_profile(datetime(2026, 1, 1), 24 * 60, project_id='10')
+        self.assertEqual(profile.jobs, 3)
+        self.assertEqual((profile.peak, profile.peak_times), (3, [datetime(2026, 1, 1, 2, 0)]))
+        self.assertEqual(profile.histogram.sum(), 2 + 48)
+        self.assertEqual(load_profile(datetime(2026, 1, 1), 24 * 60).peak, 4)
+
+    def test_histogram_matches_next_fires(self):
+        start, minutes = datetime(2026, 2, 26, 22, 0), 7 * 24 * 60
+        for pattern in ('*/20 23,0 * * *', '0 0 1 * 5', '15 1-3 27-28 2 *', '0 12 * 3 0-1', '30 0 1 1-12/2 *'):
+            histogram = load_histogram([(pattern, 1)], start, minutes)
+            fires = cron.next_fires(pattern, start - timedelta(minutes=1), 100)
+            expected = [int((fire - start).total_seconds() // 60) for fire in fires
+                        if fire < start + timedelta(minutes=minutes)]
+            self.assertEqual(list(histogram.nonzero()[0]), expected, pattern)
+
+
+class StaggerSuggestionTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for i, pattern in enumerate(('0 2 * * *', '0 2 * * *', '0 2 * * *', '5 2 * * *')):
+            create_job('job-{}'.format(i), schedule_pattern=pattern, project_id=str(i % 2))
+
+    def test_suggest_schedule(self):
+        suggestion = suggest_schedule('0 2 * * *', max_offset=10)
+        self.assertEqual(suggestion.pattern, '59 1 * * *')
+        self.assertEqual((suggestion.offset, suggestion.peak, suggestion.requested_peak), (-1, 1, 4))
+        self.assertEqual(suggest_schedule('30 2 * * *', max_offset=10).offset, 0)
+        # the hours are a list, the minute cannot move into the previous one
+        self.assertEqual(suggest_schedule('0 */2 * * *', max_offset=10).pattern, '1 */2 * * *')
+        self.assertIsNone(suggest_schedule('*/5 * * * *'))
+
+    def test_shift_into_minute_and_hour_zero(self):
+        # 0 is a value, not an empty field: the candidates must not turn into hourly or every-minute patterns
+        self.assertIn((0, '0 2 * * *'), _shifted_patterns('0 2 * * *', 10))
+        self.assertIn((-5, '0 0 * * *'), _shifted_patterns('5 0 * * *', 10))
+        self.assertIn((0, '0 */2 * * *'), _shifted_patterns('0 */2 * * *', 10))
+        suggestion = suggest_schedule('5 0 * * *', max_offset=5)
+        self.assertEqual((suggestion.pattern, suggestion.offset, suggestion.peak), ('5 0 * * *', 0, 1))
+        self.assertEqual(suggest_schedule('0 2 * * *', max_offset=0).requested_peak, 4)
+
+    def test_pattern_changed(self):
+        occupancy()
+        BackupJob.objects.filter(schedule_pattern='5 2 * * *').update(schedule_pattern='30 3 * * *')
+        pattern_changed('5 2 * * *', '30 3 * * *')
+        create_job('job-new', schedule_pattern='*/15 * * * *')
+        pattern_changed(None, '*/15 * * * *')
+        updated = occupancy()
+        cache.delete(OCCUPANCY_KEY)
+        rebuilt = occupancy()
+        self.assertEqual(list(updated['histogram']), list(rebuilt['histogram']))
+        self.assertEqual(updated['counts']['5 2 * * *'], 0)
+        self.assertEqual(updated['counts']['*/15 * * * *'], 1)
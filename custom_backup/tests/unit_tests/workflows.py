@@ -18,7 +18,7 @@ class BackupWorkflowValidationTestCase(TestCase):
         super(BackupWorkflowValidationTestCase, self).setUp()
         self.fake_nova_server = MockNovaServerElement()
         self.patched_api_method = patch(
-            'openstack_dashboard.dashboards.custom_backup.jobs.workflows.nova_server_list',
+            'openstack_dashboard.dashboards.custom_backup.db_api.nova_server_list',
             return_value=([self.fake_nova_server], False)
         )
         self.patched_api_method.start()
@@ -1,5 +1,8 @@
 import logging
+from hashlib import sha256
+from json import loads, dumps
 from re import match as re_match
+from six import text_type
 
 
 logger = logging.getLogger(__name__)
@@ -19,11 +22,103 @@ def extract_object_id(http_request):
     return m.groupdict().get('object_id')
 
 
+def get_sort_params(http_request, table_name, sort_keys, default_key='creation_time', default_dir='desc'):
+    """
+    Read the server-side sort parameters of a table. They are sent as GET parameters by the sort links rendered
+    above the table and stored inside the session, so that the pagination links, which only carry the marker, keep
+    the same ordering.
+    :param table_name: used to namespace the session keys
+    :param sort_keys: the allowed keys, anything else falls back to the defaults
+    :return: tuple (sort_key, sort_dir)
+    """
+    key_param, dir_param = '{}_sort_key'.format(table_name), '{}_sort_dir'.format(table_name)
+    sort_key = http_request.GET.get('sort_key') or http_request.session.get(key_param, default_key)
+    sort_dir = http_request.GET.get('sort_dir') or http_request.session.get(dir_param, default_dir)
+    if sort_key not in sort_keys:
+        sort_key = default_key
+    if sort_dir not in ('asc', 'desc'):
+        sort_dir = default_dir
+    http_request.session[key_param] = sort_key
+    http_request.session[dir_param] = sort_dir
+    return sort_key, sort_dir
+
+
+def get_server_filters(http_request, table, filters=None, filters_map=None):
+    """
+    Same contract as horizon's DataTableView.get_filters: the server-side filter of the table is added to filters,
+    its value translated through filters_map. Horizon keeps the filter submitted by the filter form inside the
+    session; the one carried as GET parameters by the sort links (see get_sort_query) is stored there as well.
+    :return: dictionary {filter field: value}
+    """
+    filters = filters or {}
+    filters_map = filters_map or {}
+    filter_action = table._meta._filter_action
+    if filter_action is None:
+        return filters
+    param_name = filter_action.get_param_name()
+    if param_name in http_request.GET:
+        http_request.session[param_name] = http_request.GET[param_name]
+        http_request.session[param_name + '_field'] = http_request.GET.get(param_name + '_field')
+    filter_field = table.get_filter_field()
+    filter_string = table.get_filter_string().strip()
+    if filter_field and filter_string:
+        filters[filter_field] = filter_string
+        for key, value in filters_map.get(filter_field, {}).items():
+            if text_type(key) in filter_string.lower():
+                filters[filter_field] = value
+                break
+    return filters
+
+
+def get_sort_query(http_request, table):
+    """
+    Query string the sort links start with: the current GET parameters and the server-side filter of the table,
+    without the sort parameters and the pagination markers, since a new ordering starts from the first page
+    """
+    params = http_request.GET.copy()
+    for name in ('sort_key', 'sort_dir', table._meta.pagination_param, table._meta.prev_pagination_param):
+        params.pop(name, None)
+    filter_action = table._meta._filter_action
+    if filter_action is not None and table.get_filter_string():
+        params[filter_action.get_param_name()] = table.get_filter_string()
+        params[filter_action.get_param_name() + '_field'] = table.get_filter_field()
+    return params.urlencode()
+
+
+def get_all_tenants_param(http_request, table_name):
+    """
+    Admins can switch a listing from the current project to all the projects by means of the `all_tenants` GET
+    parameter, stored inside the session like the sort parameters. It is always False for non admin users
+    :return: True if the listing must span all the projects
+    """
+    if not getattr(http_request.user, 'is_superuser', False):
+        return False
+    param = '{}_all_tenants'.format(table_name)
+    if 'all_tenants' in http_request.GET:
+        http_request.session[param] = http_request.GET['all_tenants'] == '1'
+    return http_request.session.get(param, False)
+
+
+# table names namespacing the all_tenants switch of the jobs and notifications listings, see request_project_id
+JOBS_TABLE = 'jobs'
+NOTIFICATIONS_TABLE = 'notifications'
+
+
+def request_project_id(http_request, table_name):
+    """
+    Project the objects reached from a listing (details, update, clone, delete) must belong to
+    :param table_name: JOBS_TABLE or NOTIFICATIONS_TABLE
+    :return: the project of the user, None when an admin is browsing all the projects, see get_all_tenants_param
+    """
+    if get_all_tenants_param(http_request, table_name):
+        return None
+    return http_request.user.tenant_id
+
+
 def cmp_dict(dict1, dict2):
     """
-    Recursively compare two dictionaries. Being that we iterate over dict1 it is safe to use the parentheses
-    notation to access the value dict1[key], instead it is important to use the dict.get() method for dict2,
-    to avoid KeyError exceptions.
+    Recursively compare two dictionaries: they are equal when they have the same keys and, key by key, either
+    both values are dictionaries equal in turn or the values are equal.
 
     equal value is recomputed at each iteration using the AND operator because it guarantees that once it gets
     FALSE it will hold this value until the last iteration.
@@ -31,11 +126,130 @@ def cmp_dict(dict1, dict2):
     """
     if not (isinstance(dict1, dict) and isinstance(dict2, dict)):
         return False
+    if set(dict1.keys()) != set(dict2.keys()):
+        return False
 
     equal = True
     for k in dict1.keys():
-        if isinstance(dict1[k], dict) and isinstance(dict1[k], dict):
-            equal = equal and cmp_dict(dict1[k], dict2.get(k))
+        if isinstance(dict1[k], dict) and isinstance(dict2[k], dict):
+            equal = equal and cmp_dict(dict1[k], dict2[k])
         else:
-            equal = equal and (dict1[k] == dict2.get(k))
+            equal = equal and (dict1[k] == dict2[k])
     return equal
+
+
+def canonical_json(workflow_input):
+    """
+    JSON representation of a workflow input with sorted keys and without whitespace, so that equal inputs have
+    the same representation whatever the order of their keys
+    :param workflow_input: dictionary or its JSON representation
+    :raise ValueError: the JSON representation is not valid
+    """
+    if not isinstance(workflow_input, dict):
+        workflow_input = loads(workflow_input or '{}')
+    return dumps(workflow_input, sort_keys=True, separators=(',', ':'))
+
+
+def workflow_input_fingerprint(workflow_input):
+    """
+    Digest of a workflow input, which does not depend on the order of the keys nor on the JSON formatting, so that
+    the input of a BackupJob and the one of its cron-trigger can be compared without keeping both in memory.
+    It is stored by BackupJob.save() in the workflow_input_hash column.
+    :param workflow_input: dictionary or its JSON representation
+    :return: hex string
+    """
+    try:
+        canonical = canonical_json(workflow_input)
+    except ValueError:
+        canonical = dumps(workflow_input)
+    return sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _parsed(workflow_input):
+    if isinstance(workflow_input, dict):
+        return workflow_input
+    try:
+        return loads(workflow_input or '{}')
+    except ValueError:
+        return None
+
+
+def workflow_instances(workflow_input):
+    """
+    Instances backed up by a workflow input, either the single `instance` or the `instances` list of the
+    multi-instance BackupJobs
+    :param workflow_input: dictionary or its JSON representation
+    :return: sorted list of lower case ids, without duplicates
+    """
+    workflow_input = _parsed(workflow_input) or {}
+    instances = workflow_input.get('instances') or [workflow_input.get('instance')]
+    return sorted(set(instance.strip().lower() for instance in instances if instance and instance.strip()))
+
+
+def workflow_source_key(workflow_input):
+    """
+    What a workflow input backs up, normalized so that the BackupJobs of the same source have the same key:
+    `instance:<id>`, `instances:<digest of the sorted ids>` or `metadata:<key>=<value>`. It is stored by
+    BackupJob.save() in the source_key column.
+    :param workflow_input: dictionary or its JSON representation
+    :return: string, None when the input has no source
+    """
+    workflow_input = _parsed(workflow_input)
+    if workflow_input is None:
+        return None
+    instances = workflow_instances(workflow_input)
+    if len(instances) == 1:
+        return 'instance:{}'.format(instances[0])
+    if instances:
+        return 'instances:{}'.format(sha256(','.join(instances).encode('utf-8')).hexdigest())
+    metadata = workflow_input.get('metadata') or {}
+    if metadata.get('key'):
+        return u'metadata:{}={}'.format(metadata['key'].strip(), (metadata.get('value') or '').strip())
+    return None
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# BackupJob columns denormalized from the workflow_input, see workflow_columns
+WORKFLOW_COLUMNS = ('instance_id', 'metadata_key', 'metadata_value', 'backup_type', 'max_backups', 'max_snapshots',
+                    'cinder_backup')
+
+
+def workflow_columns(workflow_input):
+    """
+    Values of the typed columns of a BackupJob, extracted from its workflow input and stored by BackupJob.save(), so
+    that the BackupJobs can be selected by source or retention through an index instead of parsing every input.
+    instance_id is set for the single-instance BackupJobs only, see BackupJobInstance for the others
+    :param workflow_input: dictionary or its JSON representation
+    :return: dictionary {column: value}, with the keys of WORKFLOW_COLUMNS; the values are None when missing or
+        when the input is not valid JSON
+    """
+    workflow_input = _parsed(workflow_input) or {}
+    instances = workflow_instances(workflow_input)
+    metadata = workflow_input.get('metadata') or {}
+    cinder_backup = workflow_input.get('cinder_backup')
+    return {
+        'instance_id': instances[0] if len(instances) == 1 else None,
+        'metadata_key': (metadata.get('key') or '').strip() or None,
+        'metadata_value': (metadata.get('value') or '').strip() or None,
+        'backup_type': workflow_input.get('backup_type') or None,
+        'max_backups': _int_or_none(workflow_input.get('max_backups')),
+        'max_snapshots': _int_or_none(workflow_input.get('max_snapshots')),
+        'cinder_backup': None if cinder_backup is None else bool(cinder_backup),
+    }
+
+
+def workflow_input_summary(workflow_input):
+    """
+    `key1=value1, key2=value2, ..` rendering of a workflow input, shown by the jobs index and stored in
+    BackupJobSummary.workflow_input_summary
+    :param workflow_input: dictionary or its JSON representation
+    :return: string, empty when the input is not valid JSON
+    """
+    workflow_input = _parsed(workflow_input) or {}
+    return ", ".join(["{}={}".format(k, v) for k, v in sorted(workflow_input.items())])
@@ -911,3 +911,81 @@ ALLOWED_PRIVATE_SUBNET_CIDR = {'ipv4': [], 'ipv6': []}
 # Once the password expires keystone will deny the access and users must
 # contact an admin to change their password.
 #PASSWORD_EXPIRES_WARNING_THRESHOLD_DAYS = 0
+
+# Custom Backup dashboard.
+# Seconds the list of Mistral cron-triggers of a project is cached (in CACHES)
+# to check the trigger status column of the jobs index.
+#CUSTOM_BACKUP_TRIGGER_CACHE_TTL = 30
+# Maximum number of Mistral calls executed in parallel by bulk operations,
+# e.g. when several BackupJobs are deleted at once.
+#CUSTOM_BACKUP_MISTRAL_CONCURRENCY = 8
+# Credentials used by the drain_trigger_outbox management command to apply the
+# cron-trigger changes to Mistral. The user needs a role in every project
+# having BackupJobs, the client is scoped to the project of each BackupJob.
+#CUSTOM_BACKUP_MISTRAL_AUTH = {
+#    'auth_url': OPENSTACK_KEYSTONE_URL,
+#    'username': 'custom_backup',
+#    'password': 'secret',
+#    'user_domain_name': 'Default',
+#}
+# Retry policy of the trigger outbox: an operation is retried with exponential
+# backoff, starting from BACKOFF_BASE seconds up to BACKOFF_MAX seconds, and
+# marked as failed after MAX_ATTEMPTS attempts.
+#CUSTOM_BACKUP_OUTBOX_BACKOFF_BASE = 5
+#CUSTOM_BACKUP_OUTBOX_BACKOFF_MAX = 3600
+#CUSTOM_BACKUP_OUTBOX_MAX_ATTEMPTS = 10
+# With 'consolidated' the BackupJobs of a project sharing a schedule share one
+# cron-trigger, which runs FANOUT_WORKFLOW_ID with the input
+# {'backup_jobs': [<input of custom_instance_backup>, ...]}: the workflow must
+# run custom_instance_backup for each item. The mode applies to the BackupJobs
+# created or updated after the change.
+#CUSTOM_BACKUP_TRIGGER_MODE = 'per_job'
+#CUSTOM_BACKUP_FANOUT_WORKFLOW_ID = 'custom_instance_backup.custom_instance_backup_batch'
+# Mistral clients kept alive by every process, one per project: they are reused
+# by the outbox and the reconciliation until their Keystone token expires.
+#CUSTOM_BACKUP_MISTRAL_CLIENT_CACHE_SIZE = 64
+# Protection of the Horizon workers from a slow or unavailable Mistral: every
+# call waits at most TIMEOUT seconds; after BREAKER_THRESHOLD consecutive
+# failures the calls fail immediately for BREAKER_RESET seconds; at most
+# BULKHEAD_SIZE calls per process are in flight, the others wait up to
+# BULKHEAD_WAIT seconds for a free slot and then fail.
+#CUSTOM_BACKUP_MISTRAL_TIMEOUT = 10
+#CUSTOM_BACKUP_MISTRAL_BREAKER_THRESHOLD = 5
+#CUSTOM_BACKUP_MISTRAL_BREAKER_RESET = 30
+#CUSTOM_BACKUP_MISTRAL_BULKHEAD_SIZE = 10
+#CUSTOM_BACKUP_MISTRAL_BULKHEAD_WAIT = 0.5
+# Seconds a page of the instance picker of the BackupJob wizards, and the
+# project and name of a picked instance, are cached.
+#CUSTOM_BACKUP_INSTANCE_CACHE_TTL = 60
+# Maximum number of Nova calls executed in parallel to check the instances
+# picked in the BackupJob wizards.
+#CUSTOM_BACKUP_NOVA_CONCURRENCY = 8
+# Seconds the notifications and BackupJobs read by the wizards stay in CACHES.
+# The entries are invalidated as soon as the objects change, so it only bounds
+# the memory they use.
+#CUSTOM_BACKUP_LOOKUP_CACHE_TTL = 3600
+# BackupJobs backing up the same instance or metadata pair are reported as
+# overlapping when their schedules fire within WINDOW minutes of each other in
+# the next HORIZON_DAYS days (Schedule conflicts page, find_schedule_conflicts
+# management command).
+#CUSTOM_BACKUP_OVERLAP_WINDOW = 15
+#CUSTOM_BACKUP_OVERLAP_HORIZON_DAYS = 366
+# Compiled cron patterns kept in memory by every Horizon process.
+#CUSTOM_BACKUP_CRON_CACHE_SIZE = 1024
+# The create wizard suggests moving a new BackupJob up to STAGGER_RANGE minutes
+# from the chosen time, towards the minute with the fewest backups starting
+# (computed on the next week, rebuilt every OCCUPANCY_TTL seconds). With
+# STAGGER_AUTO_APPLY the suggestion is applied without asking.
+#CUSTOM_BACKUP_OCCUPANCY_TTL = 3600
+#CUSTOM_BACKUP_STAGGER_RANGE = 30
+#CUSTOM_BACKUP_STAGGER_AUTO_APPLY = False
+# Minutes ahead listed by the Upcoming BackupJobs page. The next run of every
+# BackupJob is stored and must be moved forward by running the
+# advance_next_runs management command periodically, e.g. every minute.
+#CUSTOM_BACKUP_UPCOMING_WINDOW = 60
+# A BackupJob can back up up to MAX_INSTANCES_PER_JOB instances. With more than
+# one, its workflow input carries {'instance': None, 'instances': [...],
+# 'concurrency': N} and the workflow backs up at most N of them at a time: the
+# workflow must declare these inputs (see README), set 1 until it does.
+#CUSTOM_BACKUP_MAX_INSTANCES_PER_JOB = 200
+#CUSTOM_BACKUP_INSTANCE_CONCURRENCY = 10
@@ -57,6 +57,7 @@ update_requirements() {
     echo "
 python-memcached==1.58
 mysqlclient==1.4.2
+numpy<1.17
 -e ../mistral-dashboard/
 " >> requirements.txt
 }